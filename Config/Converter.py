@@ -113,6 +113,38 @@ class TimeConverter(Converter):
             val = int(val)
         return val
 
+class SizeConverter(Converter):
+
+    def value(value, default_unit='B'):
+        return Param(value, (int, float, str), (SizeConverter, (default_unit,)))
+
+    def __init__(self, default_unit='B'):
+        self._unit = default_unit
+
+    def _get_unit_to_byte_multiplier(self, unit):
+        unit = unit.upper()
+        if unit in('B', 'BYTE', 'BYTES'):
+            return 1
+        if unit in('K', 'KB', 'KIB'):
+            return 1024
+        if unit in('M', 'MB', 'MIB'):
+            return 1024 * 1024
+        if unit in('G', 'GB', 'GIB'):
+            return 1024 * 1024 * 1024
+        raise ValueError('Invalid size unit: %s: (G=GiB,M=MiB,K=KiB,B=bytes)' % unit)
+
+    def convert(self, value, param):
+        if isinstance(value, (int, float)):
+            return int(value * self._get_unit_to_byte_multiplier(self._unit))
+
+        Converter.convert(self, value, param)
+        unit = re.sub(r'[0-9\.\s]', '', value) # remove digits, dot and spaces
+        if unit=='':
+            unit = self._unit
+
+        val = float(re.sub(r'[a-zA-Z]*$|\s', '', value)) # remove a-z and any spaces
+        return int(val * self._get_unit_to_byte_multiplier(unit))
+
 class ListConverter(Converter):
 
     def value(value, items, types=()):
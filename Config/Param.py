@@ -107,6 +107,9 @@ class Param(object):
         return 'name=%s %s %s types=%s' % (self.name, value, default, self.types)
 
     def prepare_value(self, value, any_type=False):
+        # null is allowed if None is in the list of types
+        if value==None and None in (self._types):
+            return value
         if any_type==False and not type(value) in (self._types):
             if not isinstance(value, int) or not float in (self.types):
                 raise TypeError('type %s not allowed: %s: %s' % (Type.name(value), self.types, self.name))
@@ -135,6 +138,8 @@ class Param(object):
 
         if isinstance(value, int) and float in (self.types):
             return True
+        if value==None:
+            return None in (self.types)
         return type(value) in (self.types)
 
     def validate_type(self, value):
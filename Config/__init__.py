@@ -6,7 +6,7 @@ from .Type import (type_str, type_name, typeof, Type)
 from .Path import (Path, Parts, Index)
 from .Struct import (StructType, DictType, RangeType, ListType)
 from .Param import (Param)
-from .Converter import (Converter, MarginConverter, TimeConverter, RangeConverter, ListConverter, IteratorConverter, EnumConverter, GeneratorConverter)
+from .Converter import (Converter, MarginConverter, TimeConverter, SizeConverter, RangeConverter, ListConverter, IteratorConverter, EnumConverter, GeneratorConverter)
 from .Base import (Base, ListBase, ItemBase, Root)
 from .Loader import (Loader, Merger)
 from .Writer import (Writer, YamlWriter, ObjectWriter, JsonWriter)
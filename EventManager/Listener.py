@@ -31,6 +31,18 @@ class Listener(object):
         except StopSleep:
             pass
 
+    # call handler for pending notifications without sleeping
+    #
+    # handler           callable with Notification object as argument
+    def poll(self, handler):
+        try:
+            notification = self.first()
+            while notification!=None:
+                handler(notification)
+                notification = self.next(notification)
+        except StopSleep:
+            pass
+
     # wait for a notification
     #
     # returns None after timeout or a Notification object
@@ -3,8 +3,8 @@
 #
 
 from SDL_Pi_INA3221.Calibration import Calibration as InaCalibration
-from SDL_Pi_INA3221 import INA3211_CONFIG
-from Config import (Type, Path, Param, DictType, TimeConverter, MarginConverter, RangeConverter, ListConverter, EnumConverter, Base, ListBase, ItemBase)
+from SDL_Pi_INA3221 import (INA3211_CONFIG, BUS_BACKEND, WAVEFORM)
+from Config import (Type, Path, Param, DictType, TimeConverter, SizeConverter, MarginConverter, RangeConverter, ListConverter, EnumConverter, Base, ListBase, ItemBase)
 from . import Enums
 from .Gui import Gui
 import socket
@@ -58,6 +58,9 @@ class Channel(ItemBase):
     voltage = (None, (float))
     color = (None, (str,))
     hline_color = (None, (str,))
+    # read bus and shunt voltage every nth read cycle, None for ina3221.vbus_read_divider and vshunt_read_divider
+    vbus_read_divider = (None, (int, None,))
+    vshunt_read_divider = (None, (int, None,))
 
     COLOR_AGGREGATED_POWER = 'red'
     COLOR_MAX_CURRENT = 'red'
@@ -76,6 +79,21 @@ class Channel(ItemBase):
             return self.hline_color
         return self.color
 
+# waveform of the channel for ina3221.bus_backend=SIMULATED
+class ChannelSimulation(Base):
+
+    voltage = (None, (float, int, None,))       # bus voltage in V, None for the channel voltage
+    current = 0.5                               # current in A
+    waveform = WAVEFORM.DC                      # DC, SINE, SQUARE, TRIANGLE or PULSE
+    amplitude = 0.0                             # amplitude of the current in A
+    period = TimeConverter.value(1)
+    duty = 0.5                                  # duty cycle for SQUARE and PULSE
+    noise = 0.002                               # current noise in A
+    voltage_noise = 0.005                       # bus voltage noise in V
+
+    def __init__(self, struct={}):
+        Base.__init__(self, struct)
+
 class YLimits(Base):
 
     def __init__(self):
@@ -102,6 +120,8 @@ class Plot(Base):
     idle_refresh_interval = TimeConverter.value(30000, 'ms')
     max_values = 8192
     max_time = TimeConverter.value(900)
+    # max. number of points per pixel of the plot width, 0 to plot all values
+    points_per_pixel = 2
 
     line_width = 3.5
     grid_line_width = 1.0
@@ -122,10 +142,15 @@ class Plot(Base):
     def __init__(self, struct):
         Base.__init__(self, struct)
 
+# values older than uncompressed_time are reduced to 2 values per interval of 2 * max_time / max_values
 class PlotCompression(Base):
 
     min_records = 64
     uncompressed_time = TimeConverter.value(60)
+    # MEAN, MIN_MAX, FIRST_LAST or LTTB for each quantity
+    voltage = Enums.DOWNSAMPLING_MODE.LTTB
+    current = Enums.DOWNSAMPLING_MODE.MIN_MAX
+    power = Enums.DOWNSAMPLING_MODE.MIN_MAX
 
     def __init__(self, struct={}):
         Base.__init__(self, struct)
@@ -163,11 +188,213 @@ class KeyBindings(Base):
 
 class Ina3221(Base):
 
+    MAX_DEVICES = 4
+    CHANNELS_PER_DEVICE = 3
+
     i2c_address = 0x040
+    # number of INA3221 at consecutive addresses starting with i2c_address
+    devices = RangeConverter.value(1, range(1, MAX_DEVICES + 1), (int,))
+    # SMBUS or I2C_RDWR to read all registers with a single ioctl()
+    bus_backend = BUS_BACKEND.SMBUS
+    # bus clock in Hz to simulate the transfer time with bus_backend=SIMULATED
+    simulation_i2c_clock = (100000, (int, None,))
     auto_mode_sensor_values_per_second = (0.0, (float, int, None,))
+    # INTERVAL or CONVERSION_READY to poll the conversion ready flag and read each conversion exactly once
+    sampling_mode = Enums.SAMPLING_MODE.INTERVAL
+    # CATCH_UP or SKIP deadlines after the sensor thread has been delayed in INTERVAL mode
+    overrun_policy = Enums.OVERRUN_POLICY.CATCH_UP
+    # max. number of missed deadlines to catch up, the schedule is restarted after longer delays
+    max_catch_up = (10, (int,))
+    # read bus and shunt voltage every nth read cycle. the last value is used for the other cycles
+    vbus_read_divider = RangeConverter.value(1, range(1, 1001), (int,))
+    vshunt_read_divider = RangeConverter.value(1, range(1, 1001), (int,))
     averaging_mode = INA3211_CONFIG.AVERAGING_MODE.x16
     vshunt_conversion_time = INA3211_CONFIG.VSHUNT_CONVERSION_TIME.time_1100_us
     vbus_conversion_time = INA3211_CONFIG.VBUS_CONVERSION_TIME.time_1100_us
+    # record all register transfers to a file, {config_dir} can be used
+    record_file = (None, (str,))
+    # replay a recording instead of reading the sensor
+    replay_file = (None, (str,))
+    # False to replay as fast as possible
+    replay_realtime = True
+
+    def __init__(self, struct={}):
+        Base.__init__(self, struct)
+
+    def _is_key_valid(self, name):
+        if not Path._is_key_valid(name):
+            return False
+        return not name.startswith('get_')
+
+    def get_i2c_addresses(self):
+        return [self.i2c_address + device for device in range(0, self.devices)]
+
+    def get_channel_count(self):
+        return self.devices * Ina3221.CHANNELS_PER_DEVICE
+
+    # returns a tuple of the vbus and vshunt read divider of the channel
+    def get_read_dividers(self, channel):
+        return (channel.vbus_read_divider or self.vbus_read_divider, channel.vshunt_read_divider or self.vshunt_read_divider)
+
+# CPU affinity and priority of the sensor thread (Linux only)
+class SensorThread(Base):
+
+    # CPU numbers for the sensor thread, e.g. 3 or "2,3". None to use all CPUs
+    cpu_affinity = (None, (int, str, None,))
+    # move all other threads to the remaining CPUs
+    isolate_cpu = True
+    # OTHER, FIFO or RR. FIFO and RR require root or CAP_SYS_NICE
+    policy = Enums.THREAD_POLICY.OTHER
+    # real-time priority for FIFO and RR
+    priority = RangeConverter.value(50, range(1, 100), (int,))
+    # nice level for OTHER, None to keep the nice level of the process
+    nice = (None, (int, None,))
+
+    def __init__(self, struct={}):
+        Base.__init__(self, struct)
+
+    def _is_key_valid(self, name):
+        if not Path._is_key_valid(name):
+            return False
+        return not name.startswith('get_')
+
+    # returns a set of CPU numbers or None
+    def get_cpu_affinity(self):
+        if self.cpu_affinity==None:
+            return None
+        if isinstance(self.cpu_affinity, int):
+            return set([self.cpu_affinity])
+        return set([int(cpu) for cpu in self.cpu_affinity.split(',') if cpu.strip()])
+
+# garbage collector settings to avoid pauses while reading the sensor
+class GarbageCollector(Base):
+
+    # move the objects created during startup to the permanent generation, they are not scanned by the collections
+    freeze = True
+    # thresholds of the generations 0, 1 and 2, None to keep the default
+    threshold0 = (None, (int, None,))
+    threshold1 = (None, (int, None,))
+    threshold2 = (None, (int, None,))
+    # disable the automatic collection and collect from the main thread
+    disable_automatic = False
+    # interval of the collections of generation 0 and 1 with disable_automatic
+    collect_interval = TimeConverter.value(5)
+    # interval of the full collections with disable_automatic
+    full_collect_interval = TimeConverter.value(300)
+
+    def __init__(self, struct={}):
+        Base.__init__(self, struct)
+
+# integration of the energy
+#
+# gaps are intervals between readings that are longer than 3 times the read interval, e.g. while the sensor is
+# reinitialized after errors
+class Energy(Base):
+
+    # SKIP, INTERPOLATE or HOLD
+    gap_policy = Enums.ENERGY_GAP_POLICY.INTERPOLATE
+    # longer gaps are not added and counted as missing time
+    max_gap = TimeConverter.value(10)
+
+    def __init__(self, struct={}):
+        Base.__init__(self, struct)
+
+# memory budget of the plot values and the sensor buffers
+#
+# if the memory usage is getting close to the budget, the values are compressed earlier, the resolution of the oldest
+# compressed values is reduced and finally the oldest values are removed
+class Retention(Base):
+
+    # 0 to disable
+    memory_budget = SizeConverter.value(32, 'M')
+
+    def __init__(self, struct={}):
+        Base.__init__(self, struct)
+
+# reading the sensor in a separate process (Linux only)
+#
+# the child process reads the sensor and converts the readings. the readings are passed to the main process through a
+# ring buffer in shared memory. the child process is restarted after read errors or if it stops responding
+class Acquisition(Base):
+
+    separate_process = False
+    # number of readings in the shared memory
+    buffer_size = RangeConverter.value(16384, range(1024, 1048577), (int,))
+    # restart the child process if it has not been responding for this time
+    watchdog_timeout = TimeConverter.value(5)
+    # time to wait before restarting the child process
+    restart_delay = TimeConverter.value(5)
+
+    def __init__(self, struct={}):
+        Base.__init__(self, struct)
+
+# software oversampling
+#
+# the sensor runs with the averaging mode and conversion times of this section and the readings are filtered and
+# decimated to the output intervals
+class Oversampling(Base):
+
+    enabled = False
+    # BOXCAR, CIC or FIR
+    filter = Enums.DECIMATION_FILTER.CIC
+    # number of cascaded boxcar filters for CIC
+    cic_order = RangeConverter.value(3, range(1, 7), (int,))
+    averaging_mode = INA3211_CONFIG.AVERAGING_MODE.x1
+    vshunt_conversion_time = INA3211_CONFIG.VSHUNT_CONVERSION_TIME.time_332_us
+    vbus_conversion_time = INA3211_CONFIG.VBUS_CONVERSION_TIME.time_332_us
+    # output interval for the averages published via MQTT and influxdb
+    interval = TimeConverter.value(1)
+    # output interval for the plot, 0 for interval
+    plot_interval = TimeConverter.value(0.1)
+
+    def __init__(self, struct={}):
+        Base.__init__(self, struct)
+
+# auto-tuning of the averaging mode and conversion times, see --auto-tune
+#
+# the combinations are measured from the highest to the lowest sample rate and the first one that meets the target
+# noise of all enabled channels is stored in file. the file is merged into the configuration when loading it
+class AutoTune(Base):
+
+    # noise of the current in mA (standard deviation)
+    target_current_noise = (1.0, (float, int, None,))
+    # noise of the bus voltage in mV, None to ignore
+    target_voltage_noise = (None, (float, int, None,))
+    # time to measure each combination
+    sweep_time = TimeConverter.value(1)
+    # min. number of conversions per combination, the sweep time is extended for slow combinations
+    min_samples = RangeConverter.value(20, range(3, 10001), (int,))
+    # combinations with a longer conversion cycle are not tested
+    max_interval = TimeConverter.value(0.25)
+    # None to print the result without storing it
+    file = ('{config_dir}/auto_tune.json', (str, None,))
+
+    def __init__(self, struct={}):
+        Base.__init__(self, struct)
+
+# burst capture of current transients
+#
+# the sensor runs at full rate (x1 averaging, 140us conversion time) and the readings are averaged in software for the
+# regular display, energy and database. a window around the trigger is stored with all readings
+class Capture(Base):
+
+    enabled = False
+    # CURRENT, DI_DT or CRITICAL_ALERT
+    trigger = Enums.CAPTURE_TRIGGER.CURRENT
+    # current in A for CURRENT and CRITICAL_ALERT
+    current_threshold = (1.0, (float, int))
+    # rate of change of the current in A/s for DI_DT
+    didt_threshold = (1000.0, (float, int))
+    # time before and after the trigger
+    pre_trigger = TimeConverter.value(0.05)
+    post_trigger = TimeConverter.value(0.2)
+    # min. time between two triggers
+    holdoff = TimeConverter.value(5)
+    # number of captures kept in the database
+    max_stored = (100, (int,))
+
+    # number of captures kept for the GUI
+    MAX_TRACES = 4
 
     def __init__(self, struct={}):
         Base.__init__(self, struct)
@@ -207,6 +434,7 @@ class Mqtt(Base):
 
     STATUS_TOPIC = '{topic_prefix}/{device_name}/{sensor_name}/status'
     CHANNEL_TOPIC = '{topic_prefix}/{device_name}/{sensor_name}/ch{channel}'
+    CAPTURE_TOPIC = '{topic_prefix}/{device_name}/{sensor_name}/capture'
 
     AUTO_DISCOVERY_TOPIC = '{auto_discovery_prefix}/sensor/{device_name}_{sensor_name}_ch{channel}_{entity}/config'
     MODEL = 'RPI.ina3221-power-monitor'
@@ -231,6 +459,9 @@ class Mqtt(Base):
     def get_status_topic(self):
         return self._format_topic(self.STATUS_TOPIC)
 
+    def get_capture_topic(self):
+        return self._format_topic(self.CAPTURE_TOPIC)
+
     def get_auto_discovery_topic(self, channel, entity):
         return self._format_topic(self.AUTO_DISCOVERY_TOPIC, channel=channel, entity=entity)
 
@@ -278,6 +509,10 @@ class Calibration(Base):
         # V = I * (R / Cvbus) == R = (Cvbus * V) / I
         return self._multipliers[for_unit] * (raw_value + self.vshunt_raw_offset)
 
+    # returns the raw shunt voltage for the given current in A
+    def get_shunt_from_current(self, current):
+        return current * self.shunt / (self.vshunt_multiplier * InaCalibration.RAW_VSHUNT_TO_MILLIVOLT) - self.vshunt_raw_offset
+
     # unit 'V' or 'mV'
     def get_vbus_voltage(self, raw_value, unit='V'):
         return self._multipliers[unit] * raw_value
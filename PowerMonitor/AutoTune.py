@@ -0,0 +1,196 @@
+#
+# Author: sascha_lammers@gmx.de
+#
+
+from .Sensor import (Sensor, add_simulated_device)
+import SDL_Pi_INA3221
+import numpy as np
+import json
+import time
+import os
+
+INA3211_CONFIG = SDL_Pi_INA3221.INA3211_CONFIG
+
+# noise and rate of a combination of averaging mode and conversion times
+class TuneResult(object):
+
+    # current_noise     noise of the current in mA for each enabled channel
+    # voltage_noise     noise of the bus voltage in mV for each enabled channel
+    # rate              conversion cycles per second
+    def __init__(self, avg, vbus, vshunt, current_noise, voltage_noise, samples, rate):
+        self.avg = avg
+        self.vbus = vbus
+        self.vshunt = vshunt
+        self.current_noise = current_noise
+        self.voltage_noise = voltage_noise
+        self.samples = samples
+        self.rate = rate
+
+    # returns True if all channels meet the target noise. None to ignore the target
+    def meets(self, current_noise, voltage_noise):
+        if current_noise!=None and max(self.current_noise.values())>current_noise:
+            return False
+        if voltage_noise!=None and max(self.voltage_noise.values())>voltage_noise:
+            return False
+        return True
+
+    def __str__(self):
+        return 'avg=%s vbus=%s vshunt=%s rate=%.1f/s samples=%u current_noise=%s voltage_noise=%s' % (self.avg.name, self.vbus.name, self.vshunt.name, self.rate, self.samples,
+            ' '.join(['%.3fmA' % noise for noise in self.current_noise.values()]), ' '.join(['%.3fmV' % noise for noise in self.voltage_noise.values()]))
+
+# measures the noise of the enabled channels for the combinations of averaging mode, bus and shunt conversion time and
+# selects the fastest one that meets the target noise
+#
+# the readings are taken with the conversion ready flag, each conversion is read once. the noise is the standard
+# deviation of the differences of consecutive readings divided by sqrt(2). changes of the load slower than the
+# conversion cycle do not add to the noise
+class AutoTune(object):
+
+    # min. interval for polling the conversion ready flag
+    POLL_INTERVAL = 0.0005
+
+    def __init__(self, logger, config):
+        self._logger = logger
+        self._config = config
+        self._devices = []
+        channels_per_device = config.ina3221.CHANNELS_PER_DEVICE
+        self._device_channels = []
+        for device in range(0, config.ina3221.devices):
+            offset = device * channels_per_device
+            self._device_channels.append([channel for channel in range(offset, offset + channels_per_device) if config.channels[channel].enabled])
+        self._active_channels = max([len(channels) for channels in self._device_channels])
+        for channel in config.channels.values():
+            channel.calibration._update_multipliers()
+
+    def debug(self, name, msg, *args):
+        self._logger.debug('[%s] %s' % (name, msg % args))
+
+    def info(self, name, msg, *args):
+        self._logger.info('[%s] %s' % (name, msg % args))
+
+    def error(self, name, msg, *args):
+        self._logger.error('[%s] %s' % (name, msg % args))
+
+    # returns a list of tuples (avg, vbus, vshunt, cycle time) ordered from the shortest to the longest cycle
+    #
+    # combinations below the min. read time of the energy integration are skipped
+    def get_candidates(self):
+        candidates = []
+        for avg in INA3211_CONFIG.AVERAGING_MODE:
+            for vbus in INA3211_CONFIG.VBUS_CONVERSION_TIME:
+                for vshunt in INA3211_CONFIG.VSHUNT_CONVERSION_TIME:
+                    if SDL_Pi_INA3221.INA3221.get_interval(avg, vbus, vshunt)<Sensor.ENERGY_MIN_READTIME:
+                        continue
+                    cycle_time = SDL_Pi_INA3221.INA3221.get_conversion_time(avg, vbus, vshunt) * self._active_channels
+                    if cycle_time<=self._config.auto_tune.max_interval:
+                        candidates.append((avg, vbus, vshunt, cycle_time))
+        # the current noise is more important than the bus voltage noise for equal cycle times
+        return sorted(candidates, key=lambda item: (item[3], -item[2]._value_))
+
+    def _create_bus(self):
+        ina3221 = self._config.ina3221
+        if ina3221.replay_file:
+            raise RuntimeError('auto-tuning requires a live or simulated sensor')
+        bus = SDL_Pi_INA3221.create_bus(ina3221.bus_backend, i2c_clock=ina3221.simulation_i2c_clock)
+        if ina3221.bus_backend==SDL_Pi_INA3221.BUS_BACKEND.SIMULATED:
+            for device, addr in enumerate(ina3221.get_i2c_addresses()):
+                add_simulated_device(self._config, bus, addr, device)
+        return bus
+
+    def _init_devices(self, bus, avg, vbus, vshunt):
+        channels_per_device = self._config.ina3221.CHANNELS_PER_DEVICE
+        for device, addr in enumerate(self._config.ina3221.get_i2c_addresses()):
+            if not self._device_channels[device]:
+                continue
+            bits = SDL_Pi_INA3221.INA3221.get_channel_bits([channel - device * channels_per_device for channel in self._device_channels[device]])
+            self._devices.append((device, SDL_Pi_INA3221.INA3221(addr=addr, channels=bits, avg=avg, vbus_ct=vbus, vshunt_ct=vshunt, shunt=1, bus=bus)))
+
+    # measure the noise of a single combination
+    def measure(self, avg, vbus, vshunt, cycle_time):
+        channels_per_device = self._config.ina3221.CHANNELS_PER_DEVICE
+        values = {}
+        for device, ina3221 in self._devices:
+            ina3221.settings(SDL_Pi_INA3221.INA3221.get_channel_bits(ina3221.get_enabled_channels()), avg, vbus, vshunt)
+            # clear the flag of the previous settings
+            ina3221.conversion_ready()
+            for channel in self._device_channels[device]:
+                values[channel] = []
+
+        duration = max(self._config.auto_tune.sweep_time, cycle_time * (self._config.auto_tune.min_samples + 1))
+        poll_interval = max(AutoTune.POLL_INTERVAL, cycle_time / 4)
+        start = time.monotonic()
+        end = start + duration
+        # the first conversion cycle has been started before the new settings were active
+        skip = set([device for device, ina3221 in self._devices])
+        while time.monotonic()<end:
+            for device, ina3221 in self._devices:
+                if not ina3221.conversion_ready():
+                    continue
+                if device in skip:
+                    skip.remove(device)
+                    continue
+                offset = device * channels_per_device
+                channels = self._device_channels[device]
+                for channel, (vbus_raw, vshunt_raw, ts) in zip(channels, ina3221.read_channels_raw([channel - offset for channel in channels])):
+                    values[channel].append((vbus_raw, vshunt_raw))
+            time.sleep(poll_interval)
+        elapsed = time.monotonic() - start
+
+        current_noise = {}
+        voltage_noise = {}
+        samples = min([len(items) for items in values.values()])
+        for channel, items in values.items():
+            calibration = self._config.channels[channel].calibration
+            if len(items)<3:
+                current_noise[channel] = np.inf
+                voltage_noise[channel] = np.inf
+                continue
+            items = np.array(items, dtype=np.float64)
+            current = calibration.get_current_from_shunt(items[:, 1], 'mA')
+            voltage = calibration.get_vbus_voltage(items[:, 0], 'V') * 1000.0
+            current_noise[channel] = float(np.std(np.diff(current)) / np.sqrt(2))
+            voltage_noise[channel] = float(np.std(np.diff(voltage)) / np.sqrt(2))
+        return TuneResult(avg, vbus, vshunt, current_noise, voltage_noise, samples, samples / elapsed)
+
+    # measure the candidates until one meets the target noise
+    #
+    # returns the TuneResult or None
+    def run(self):
+        auto_tune = self._config.auto_tune
+        if self._active_channels==0:
+            self.error(__name__, 'no channels enabled')
+            return None
+        candidates = self.get_candidates()
+        if not candidates:
+            self.error(__name__, 'no combination with a cycle time below max_interval=%.3fs', auto_tune.max_interval)
+            return None
+        self.info(__name__, 'testing up to %u combinations, target noise current=%smA voltage=%smV', len(candidates), auto_tune.target_current_noise, auto_tune.target_voltage_noise)
+        bus = self._create_bus()
+        try:
+            self._init_devices(bus, *candidates[0][0:3])
+            for avg, vbus, vshunt, cycle_time in candidates:
+                result = self.measure(avg, vbus, vshunt, cycle_time)
+                self.info(__name__, '%s', result)
+                if result.samples>=auto_tune.min_samples and result.meets(auto_tune.target_current_noise, auto_tune.target_voltage_noise):
+                    return result
+        finally:
+            bus.close()
+        self.error(__name__, 'no combination meets the target noise')
+        return None
+
+    # store the result in the auto-tune file, it overrides the settings of the configuration file
+    def store(self, result):
+        file = self._config.get_filename(self._config.auto_tune.file)
+        data = {
+            'ina3221': {
+                'auto_mode_sensor_values_per_second': 0,
+                'averaging_mode': result.avg.name,
+                'vbus_conversion_time': result.vbus.name,
+                'vshunt_conversion_time': result.vshunt.name
+            }
+        }
+        tmp_file = file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(data, f, indent=4)
+        os.replace(tmp_file, file)
+        self.info(__name__, 'stored settings in %s', file)
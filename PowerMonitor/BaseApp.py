@@ -4,6 +4,7 @@
 
 from . import PLOT_VISIBILITY, PLOT_PRIMARY_DISPLAY, SCHEDULER_PRIO, DISPLAY_ENERGY
 from .Animation import Animation
+from .GcMonitor import GcMonitor
 import EventManager
 import threading
 import time
@@ -12,6 +13,7 @@ import signal
 import sys
 import sched
 import enum
+import gc
 
 class Terminate:
     def __init__(self, event, terminate):
@@ -47,6 +49,9 @@ class BaseApp(object):
         # lock for creating threads
         self.thread_lock = threading.Lock()
 
+        self._gc_monitor = GcMonitor()
+        self._gc_full_collect_ts = 0
+
         self.start_time = time.monotonic()
         self.terminate = Terminate(self._event, threading.Event())
         AppConfig._terminate = self.terminate
@@ -176,6 +181,7 @@ class BaseApp(object):
             self.debug(__name__, 'ping main thread')
             self._scheduler.enter(60.0, SCHEDULER_PRIO.DEBUG_PING, ping)
         ping()
+        self._scheduler.enter(AppConfig.gc.collect_interval, SCHEDULER_PRIO.GC_COLLECT, self.gc_collect)
 
         try:
             while not self.terminate.is_set():
@@ -186,6 +192,36 @@ class BaseApp(object):
 
         self.thread_unregister(__name__)
 
+    # apply the garbage collector settings after the initialization of the app. the objects created so far are moved to
+    # the permanent generation
+    def gc_init(self):
+        config = AppConfig.gc
+        thresholds = list(gc.get_threshold())
+        for index, value in enumerate((config.threshold0, config.threshold1, config.threshold2)):
+            if value!=None:
+                thresholds[index] = value
+        gc.set_threshold(*thresholds)
+        if config.freeze:
+            gc.collect()
+            gc.freeze()
+        if config.disable_automatic:
+            gc.disable()
+        self._gc_full_collect_ts = time.monotonic()
+        self._gc_monitor.install()
+        self.info(__name__, 'gc thresholds %s, frozen objects %u, automatic collection %s', thresholds, gc.get_freeze_count(), gc.isenabled() and 'enabled' or 'disabled')
+
+    # collect from the main thread if the automatic collection is disabled and update the gc stats
+    def gc_collect(self):
+        config = AppConfig.gc
+        if not gc.isenabled():
+            if time.monotonic()>=self._gc_full_collect_ts + config.full_collect_interval:
+                self._gc_full_collect_ts = time.monotonic()
+                gc.collect(2)
+            else:
+                gc.collect(1)
+        self.stats.update(self._gc_monitor.get_stats())
+        self._scheduler.enter(config.collect_interval, SCHEDULER_PRIO.GC_COLLECT, self.gc_collect)
+
     def fork(self):
         try:
             pid = os.fork()
@@ -0,0 +1,142 @@
+#
+# Author: sascha_lammers@gmx.de
+#
+
+from .RingBuffer import RingBuffer
+from .Enums import CAPTURE_TRIGGER
+import numpy as np
+
+# readings around a trigger event
+class CaptureTrace(object):
+
+    TYPES = {'U': 0, 'I': 1, 'P': 2}
+
+    # trigger       CAPTURE_TRIGGER
+    # channel       channel number that triggered the capture
+    # t             time of the trigger
+    # values        rows of time followed by U, I and P of each channel
+    def __init__(self, trigger, channel, t, values):
+        self.trigger = trigger
+        self.channel = channel
+        self.t = t
+        self.values = values
+
+    def __len__(self):
+        return len(self.values)
+
+    # time relative to the trigger
+    def get_time(self):
+        return self.values[:, 0] - self.t
+
+    # type          'U', 'I' or 'P'
+    def get_values(self, channel, type):
+        return self.values[:, 1 + channel * 3 + CaptureTrace.TYPES[type]]
+
+    @property
+    def duration(self):
+        if len(self.values)==0:
+            return 0
+        return float(self.values[-1, 0] - self.values[0, 0])
+
+    @property
+    def peak_current(self):
+        current = self.get_values(self.channel, 'I')
+        if len(current)==0:
+            return 0
+        return float(current[np.argmax(np.abs(current))])
+
+# keeps the readings of the last pre_trigger + post_trigger seconds and returns a CaptureTrace once the post trigger
+# time has passed
+#
+# the trigger condition is checked for blocks of readings, the latency of the capture is post_trigger + the time of a
+# block
+class BurstCapture(object):
+
+    # trigger           CAPTURE_TRIGGER
+    # threshold         current in A or the rate of change in A/s for CAPTURE_TRIGGER.DI_DT
+    # pre_trigger       time before the trigger in seconds
+    # post_trigger      time after the trigger in seconds
+    # holdoff           min. time between two triggers
+    # channels          number of channels
+    # capacity          number of readings to keep, must cover pre_trigger, post_trigger and a block
+    def __init__(self, trigger, threshold, pre_trigger, post_trigger, holdoff, channels, capacity):
+        self._trigger = trigger
+        self._threshold = threshold
+        self._pre_trigger = pre_trigger
+        self._post_trigger = post_trigger
+        self._holdoff = holdoff
+        self._channels = channels
+        self._buffer = RingBuffer(capacity, 1 + channels * 3)
+        self.clear()
+
+    @property
+    def trigger(self):
+        return self._trigger
+
+    @property
+    def pending(self):
+        return self._pending!=None
+
+    # allocated bytes of the buffer
+    @property
+    def nbytes(self):
+        return self._buffer.nbytes
+
+    def clear(self):
+        self._buffer.clear()
+        self._pending = None
+        self._holdoff_end = None
+        self._last = None
+
+    # add readings and check the trigger condition
+    #
+    # t             time (n)
+    # loadvoltage   load voltage, current and power (n x channels)
+    # current
+    # power
+    # alerts        list of channels with the critical alert flag set since the last call
+    #
+    # returns a CaptureTrace or None
+    def add(self, t, loadvoltage, current, power, alerts=None):
+        if len(t)==0:
+            return None
+        self._buffer.extend(np.column_stack((t, np.stack((loadvoltage, current, power), axis=2).reshape(len(t), -1))))
+        if self._pending==None:
+            hits = self._get_hits(t, current, alerts)
+            if self._holdoff_end!=None:
+                hits &= (t>=self._holdoff_end)[:, None]
+            rows = np.flatnonzero(hits.any(axis=1))
+            if len(rows):
+                row = rows[0]
+                self._pending = (self._trigger, int(np.argmax(hits[row])), float(t[row]))
+        self._last = (t[-1], current[-1].copy())
+        return self._complete(t[-1])
+
+    # returns a boolean array (n x channels) of the readings that meet the trigger condition
+    def _get_hits(self, t, current, alerts):
+        if self._trigger==CAPTURE_TRIGGER.CURRENT:
+            return np.abs(current)>=self._threshold
+        if self._trigger==CAPTURE_TRIGGER.DI_DT:
+            # the difference to the last reading of the previous block. the first reading has no predecessor
+            last_t, last_current = self._last!=None and self._last or (t[0], current[0])
+            dt = np.diff(np.concatenate(([last_t], t)))
+            di = np.diff(np.vstack((last_current, current)), axis=0)
+            return np.abs(di) / np.where(dt>0, dt, np.inf)[:, None]>=self._threshold
+        # the flag does not tell when the limit was exceeded. the readings may have missed a short transient and the
+        # highest reading of the channel is used as trigger time
+        hits = np.zeros(current.shape, dtype=bool)
+        for channel in (alerts or ()):
+            hits[np.argmax(np.abs(current[:, channel])), channel] = True
+        return hits
+
+    def _complete(self, last_ts):
+        if self._pending==None:
+            return None
+        trigger, channel, ts = self._pending
+        if last_ts<ts + self._post_trigger:
+            return None
+        self._pending = None
+        self._holdoff_end = ts + self._holdoff
+        values = self._buffer.tail(self._buffer.capacity)
+        values = values[(values[:, 0]>=ts - self._pre_trigger) & (values[:, 0]<=ts + self._post_trigger)]
+        return CaptureTrace(trigger, channel, ts, values)
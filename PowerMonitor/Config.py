@@ -19,10 +19,11 @@ class Config:
     def load(self, file, output=None):
 
         loader = Loader('app', AppConfig.App(DictType({
-            'channels': AppConfig.ChannelList(RangeType(range(0, 3), AppConfig.Channel, DictType({
+            'channels': AppConfig.ChannelList(RangeType(range(0, AppConfig.Ina3221.MAX_DEVICES * AppConfig.Ina3221.CHANNELS_PER_DEVICE), AppConfig.Channel, DictType({
                 'name': Param(lambda path: ('Channel %u' % (path.index + 1))),
                 'y_limits': AppConfig.YLimits(),
-                'calibration': AppConfig.Calibration()
+                'calibration': AppConfig.Calibration(),
+                'simulation': AppConfig.ChannelSimulation()
             }))),
             'plot': AppConfig.Plot(DictType({
                 'compression': AppConfig.PlotCompression()
@@ -33,6 +34,14 @@ class Config:
             'mqtt': AppConfig.Mqtt(),
             'influxdb': AppConfig.Influxdb(),
             'ina3221': AppConfig.Ina3221(),
+            'sensor_thread': AppConfig.SensorThread(),
+            'acquisition': AppConfig.Acquisition(),
+            'gc': AppConfig.GarbageCollector(),
+            'energy': AppConfig.Energy(),
+            'retention': AppConfig.Retention(),
+            'capture': AppConfig.Capture(),
+            'oversampling': AppConfig.Oversampling(),
+            'auto_tune': AppConfig.AutoTune(),
         })))
         self._loader = loader
 
@@ -42,6 +51,11 @@ class Config:
         merger = Merger(loader.root)
         merger.merge(config)
 
+        # settings stored by --auto-tune override the configuration file
+        file = loader.root_object.auto_tune.file
+        if file and path.isfile(self.get_filename(file)):
+            merger.merge(reader.loads_from(self.get_filename(file)))
+
         return loader.root_object
 
     def print_config(self, output, section):
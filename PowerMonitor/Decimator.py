@@ -0,0 +1,150 @@
+#
+# Author: sascha_lammers@gmx.de
+#
+
+from .Enums import DECIMATION_FILTER
+import numpy as np
+
+# averages rows over fixed time intervals
+#
+# the rows of the last interval are kept until a row of the next interval has been added. the output has one row for
+# each interval that contains readings
+class BoxcarDecimator(object):
+
+    # period        length of the interval in seconds
+    # columns       number of columns, the first column is the time
+    def __init__(self, period, columns):
+        self._period = period
+        self._columns = columns
+        self.clear()
+
+    @property
+    def period(self):
+        return self._period
+
+    def clear(self):
+        self._carry = np.empty((0, self._columns))
+
+    # returns the mean of the rows of each completed interval
+    #
+    # rows          rows ordered by time
+    def process(self, rows):
+        if len(self._carry):
+            rows = np.concatenate((self._carry, rows))
+        if len(rows)==0:
+            return self._carry[0:0]
+        bins = np.floor(rows[:, 0] / self._period)
+        end = np.searchsorted(bins, bins[-1])
+        self._carry = rows[end:].copy()
+        if end==0:
+            return rows[0:0]
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(bins[0:end])) + 1))
+        counts = np.diff(np.append(starts, end))
+        return np.add.reduceat(rows[0:end], starts, axis=0) / counts[:, None]
+
+# low pass filter and decimation of irregular readings
+#
+# the readings are interpolated to a uniform grid with the sample period of the sensor, filtered with the FIR
+# coefficients and every factor-th sample is returned. the time column is filtered as well and is the center of the
+# filter window
+class FirDecimator(object):
+
+    # period        output interval in seconds
+    # input_period  sample period of the readings
+    # taps          FIR coefficients, the sum must be 1
+    # columns       number of columns, the first column is the time
+    def __init__(self, period, input_period, taps, columns):
+        self._period = period
+        self._input_period = input_period
+        self._factor = max(1, int(round(period / input_period)))
+        self._taps = np.asarray(taps, dtype=np.float64)
+        self._columns = columns
+        self.clear()
+
+    @property
+    def period(self):
+        return self._period
+
+    @property
+    def factor(self):
+        return self._factor
+
+    def clear(self):
+        self._last = None
+        self._next_t = None
+        self._history = np.empty((0, self._columns))
+
+    # returns the filtered rows
+    #
+    # rows          rows ordered by time
+    def process(self, rows):
+        if len(rows)==0:
+            return self._history[0:0]
+        # do not interpolate over gaps longer than the output interval
+        if self._next_t!=None and rows[0, 0] - self._last[0]>self._period:
+            self.clear()
+        if self._next_t==None:
+            self._next_t = rows[0, 0]
+            known = rows
+        else:
+            known = np.vstack((self._last, rows))
+        self._last = rows[-1].copy()
+
+        count = int(np.floor((known[-1, 0] - self._next_t) / self._input_period)) + 1
+        if count>0:
+            grid = self._next_t + np.arange(0, count) * self._input_period
+            self._next_t = grid[-1] + self._input_period
+            samples = np.empty((count, self._columns))
+            for column in range(0, self._columns):
+                samples[:, column] = np.interp(grid, known[:, 0], known[:, column])
+            self._history = np.vstack((self._history, samples))
+
+        num_taps = len(self._taps)
+        outputs = (len(self._history) - num_taps) // self._factor + 1
+        if outputs<=0:
+            return self._history[0:0]
+        windows = np.lib.stride_tricks.sliding_window_view(self._history, num_taps, axis=0)[0:outputs * self._factor:self._factor]
+        result = windows @ self._taps
+        self._history = self._history[outputs * self._factor:]
+        return result
+
+    # moving average of factor samples
+    def get_boxcar_taps(factor):
+        return np.full(factor, 1.0 / factor)
+
+    # response of a CIC filter with the given order and a differential delay of 1. the filter is applied as FIR with the
+    # same coefficients
+    def get_cic_taps(factor, order):
+        taps = np.ones(1)
+        for n in range(0, order):
+            taps = np.convolve(taps, np.ones(factor))
+        return taps / taps.sum()
+
+    # windowed sinc low pass with the cutoff frequency at the nyquist frequency of the output
+    #
+    # length        number of taps per decimation factor
+    def get_fir_taps(factor, length=4):
+        num_taps = factor * length + 1
+        n = np.arange(0, num_taps) - (num_taps - 1) / 2
+        taps = np.sinc(n / factor) * np.hamming(num_taps)
+        return taps / taps.sum()
+
+# create decimator for the readings of the sensor
+#
+# filter        DECIMATION_FILTER
+# period        output interval in seconds
+# input_period  sample period of the sensor
+# columns       number of columns, the first column is the time
+# order         order of the CIC filter
+def create_decimator(filter, period, input_period, columns, order=3):
+    if filter==DECIMATION_FILTER.BOXCAR:
+        # the mean of the readings in each interval does not need a uniform grid
+        return BoxcarDecimator(period, columns)
+    factor = max(1, int(round(period / input_period)))
+    if filter==DECIMATION_FILTER.CIC:
+        taps = FirDecimator.get_cic_taps(factor, order)
+    elif filter==DECIMATION_FILTER.FIR:
+        taps = FirDecimator.get_fir_taps(factor)
+    else:
+        raise ValueError('invalid filter: %s' % filter)
+    return FirDecimator(period, input_period, taps, columns)
@@ -0,0 +1,118 @@
+#
+# Author: sascha_lammers@gmx.de
+#
+
+from .Enums import DOWNSAMPLING_MODE
+import numpy as np
+
+# reduces the plot values to buckets with a fixed time interval
+#
+# the buckets are aligned to multiples of the interval. only buckets that end before the time limit are complete and
+# reduced, the rows of the following bucket are left for the next call. not more than max_rows are reduced per call,
+# unless a single bucket has more rows
+#
+# each bucket is reduced to two rows with the time of its first and last row. the values of U, I and P are reduced
+# with the DOWNSAMPLING_MODE of each quantity
+#
+# MEAN          mean value in both rows
+# MIN_MAX       min. and max. value in the order they occurred
+# FIRST_LAST    first and last value
+# LTTB          largest triangle three buckets with two points per bucket. the last selected point is kept for the
+#               next call
+#
+# the time of the two rows is shared by all channels and quantities, which select different readings. MIN_MAX and LTTB
+# return the values of the selected readings at the time of the first and last row of the bucket, the time of a peak
+# is shifted by up to one interval
+class StreamingDownsampler(object):
+
+    # interval      time of a bucket in seconds
+    # max_rows      max. number of rows per call
+    # modes         DOWNSAMPLING_MODE of U, I and P
+    def __init__(self, interval, max_rows, modes=(DOWNSAMPLING_MODE.MEAN, DOWNSAMPLING_MODE.MEAN, DOWNSAMPLING_MODE.MEAN)):
+        self._interval = interval
+        self._max_rows = max_rows
+        self._modes = modes
+        self._last = {}
+
+    # t             time of the rows
+    # values        values of the rows with the shape (n, channels, 3)
+    # time_limit    rows with a newer time might be added to the last bucket
+    #
+    # returns the number of rows that have been reduced and the time and values of the buckets or None
+    def process(self, t, values, time_limit):
+        end = np.searchsorted(t, np.floor(time_limit / self._interval) * self._interval, side='left')
+        if end==0:
+            return None
+        if end>self._max_rows:
+            # end before the bucket of the row max_rows or after the first bucket if it has more rows
+            limit = np.floor(t[self._max_rows] / self._interval) * self._interval
+            end = np.searchsorted(t, limit, side='left') or np.searchsorted(t, limit + self._interval, side='left')
+
+        t = t[0:end]
+        buckets = np.floor(t / self._interval)
+        starts = np.flatnonzero(np.concatenate(([True], buckets[1:]!=buckets[:-1])))
+        counts = np.diff(np.append(starts, end))
+
+        bucket_t = np.column_stack((t[starts], t[starts + counts - 1]))
+        bucket_values = np.empty((len(starts), 2) + values.shape[1:], dtype=np.float32)
+        for type, mode in enumerate(self._modes):
+            column = values[0:end, :, type]
+            if mode==DOWNSAMPLING_MODE.MIN_MAX:
+                bucket_values[..., type] = self._min_max(column, starts, counts)
+            elif mode==DOWNSAMPLING_MODE.FIRST_LAST:
+                bucket_values[..., type] = np.stack((column[starts], column[starts + counts - 1]), axis=1)
+            elif mode==DOWNSAMPLING_MODE.LTTB:
+                bucket_values[..., type] = self._lttb(type, t, column, starts, counts)
+            else:
+                mean = np.add.reduceat(column, starts, axis=0, dtype=np.float64) / counts[:, None]
+                bucket_values[..., type] = np.stack((mean, mean), axis=1)
+
+        return (int(end), bucket_t.reshape(-1), bucket_values.reshape((-1,) + values.shape[1:]))
+
+    def _min_max(self, column, starts, counts):
+        vmin = np.minimum.reduceat(column, starts, axis=0)
+        vmax = np.maximum.reduceat(column, starts, axis=0)
+        # index of the first min. and max. value of each bucket
+        bucket = np.repeat(np.arange(len(starts)), counts)
+        index = np.arange(len(column))[:, None]
+        imin = np.minimum.reduceat(np.where(column==vmin[bucket], index, len(column)), starts, axis=0)
+        imax = np.minimum.reduceat(np.where(column==vmax[bucket], index, len(column)), starts, axis=0)
+        order = imin<=imax
+        return np.stack((np.where(order, vmin, vmax), np.where(order, vmax, vmin)), axis=1)
+
+    # each bucket is split into two segments and one point of each segment is selected. the point forms the largest
+    # triangle with the point selected before and the mean of the next segment. each selection depends on the previous
+    # one and the segments are processed one by one, two iterations per bucket. the means of all segments are calculated
+    # in advance and the points of a segment are compared for all channels at once
+    def _lttb(self, type, t, column, starts, counts):
+        half = (counts + 1) // 2
+        seg_start = np.column_stack((starts, starts + half)).reshape(-1)
+        seg_end = np.column_stack((starts + half, starts + counts)).reshape(-1)
+        # the empty second segment of a bucket with a single row gets the same point
+        seg_start = np.where(seg_start==seg_end, seg_start - 1, seg_start)
+
+        sum_t = np.concatenate(([0], np.cumsum(t - t[0])))
+        sum_v = np.concatenate((np.zeros((1, column.shape[1])), np.cumsum(column, axis=0, dtype=np.float64)))
+        length = (seg_end - seg_start)
+        mean_t = (sum_t[seg_end] - sum_t[seg_start]) / length + t[0]
+        mean_v = (sum_v[seg_end] - sum_v[seg_start]) / length[:, None]
+
+        if type in self._last:
+            prev_t, prev_v = self._last[type]
+        else:
+            prev_t, prev_v = np.full(column.shape[1], t[0]), column[0].astype(np.float64)
+        columns = np.arange(column.shape[1])
+        result = np.empty((len(seg_start), column.shape[1]), dtype=np.float32)
+        for k in range(0, len(seg_start)):
+            # the last segment uses its own mean
+            n = min(k + 1, len(seg_start) - 1)
+            a = seg_start[k]
+            seg_t = t[a:seg_end[k], None]
+            seg_v = column[a:seg_end[k]]
+            area = np.abs((prev_t - mean_t[n]) * (seg_v - prev_v) - (prev_t - seg_t) * (mean_v[n] - prev_v))
+            selected = np.argmax(area, axis=0)
+            prev_t = t[a + selected]
+            prev_v = seg_v[selected, columns].astype(np.float64)
+            result[k] = prev_v
+        self._last[type] = (prev_t, prev_v)
+        return result.reshape(len(starts), 2, -1)
@@ -0,0 +1,119 @@
+#
+# Author: sascha_lammers@gmx.de
+#
+
+from .Enums import ENERGY_GAP_POLICY
+import numpy as np
+
+# integrates current and power of a single channel
+#
+# the timestamps are integer nanoseconds of the bus as read with the sensor, see INA3221.monotonic_ns(). the intervals
+# are exact and rounding errors of float timestamps do not add up. the readings are integrated with the trapezoidal
+# rule and the totals are kept with compensated (Neumaier) summation, small increments are not lost when the totals are
+# getting large
+#
+# the areas of a block are added with np.sum(), which uses pairwise summation along the contiguous last axis. the error
+# of a block grows with log2 of the number of readings and is a few ulp of the increment of the block, which is added
+# to the compensated totals
+#
+# gaps between readings that are longer than the limit are added with the gap policy up to max_gap. longer gaps are
+# not added and the missing time is counted separately
+class EnergyIntegrator(object):
+
+    # number of values of get_state()
+    STATE_SIZE = 11
+
+    # policy        ENERGY_GAP_POLICY
+    # max_gap       max. gap in seconds that is added with the gap policy
+    def __init__(self, policy, max_gap):
+        self._policy = policy
+        self._max_gap = int(round(max_gap * 1.0e9))
+        self.reset()
+
+    # set energy in Ah and Wh
+    def reset(self, ei=0, ep=0):
+        self._t = 0
+        self._last = np.zeros(2)
+        # As and Ws
+        self._sum = np.array([ei * 3600.0, ep * 3600.0])
+        self._comp = np.zeros(2)
+        self.gaps = 0
+        self.gap_time = 0
+        self.bridged_time = 0
+
+    @property
+    def ei(self):
+        return float(self._sum[0] + self._comp[0]) / 3600
+
+    @property
+    def ep(self):
+        return float(self._sum[1] + self._comp[1]) / 3600
+
+    # timestamp of the last reading in seconds
+    @property
+    def t(self):
+        return self._t / 1.0e9
+
+    # add a block of readings
+    #
+    # ts            int64 timestamps in nanoseconds, 0 if the channel has not been read
+    # current       current in A
+    # power         power in W
+    # limit         intervals up to this time in seconds are readings without gap
+    #
+    # returns the longest gap in seconds that has not been added or 0
+    def add(self, ts, current, power, limit):
+        valid = ts!=0
+        if not np.any(valid):
+            return 0
+        t = ts[valid].astype(np.int64, copy=False)
+        values = np.stack((current[valid], power[valid]))
+        if self._t:
+            t = np.concatenate(([self._t], t))
+            values = np.concatenate((self._last[:, None], values), axis=1)
+        self._t = int(t[-1])
+        self._last = values[:, -1].copy()
+        if len(t)<2:
+            return 0
+
+        dt = np.maximum(np.diff(t), 0)
+        area = (values[:, 1:] + values[:, :-1]) * 0.5
+        gap = dt>int(limit * 1.0e9)
+        skipped = 0
+        if np.any(gap):
+            bridged = gap & (dt<=self._max_gap)
+            if self._policy==ENERGY_GAP_POLICY.SKIP:
+                bridged[:] = False
+            elif self._policy==ENERGY_GAP_POLICY.HOLD:
+                area[:, bridged] = values[:, :-1][:, bridged]
+            skipped = gap & ~bridged
+            area[:, skipped] = 0
+            self.bridged_time += int(np.sum(dt[bridged]))
+            self.gap_time += int(np.sum(dt[skipped]))
+            self.gaps += int(np.count_nonzero(skipped))
+            skipped = np.max(dt[skipped], initial=0) / 1.0e9
+
+        # C-contiguous rows, the sum is pairwise
+        self._add(np.sum(area * (dt / 1.0e9), axis=1))
+        return skipped
+
+    # returns the state as float64 array to pass it to another process
+    #
+    # the time in nanoseconds is split into two values that it stays exact
+    def get_state(self):
+        return np.concatenate((self._sum, self._comp, self._last, (self._t >> 32, self._t & 0xffffffff, self.gaps, self.gap_time, self.bridged_time)))
+
+    # continue with the state of another integrator, see get_state()
+    def set_state(self, state):
+        self._sum = state[0:2].copy()
+        self._comp = state[2:4].copy()
+        self._last = state[4:6].copy()
+        self._t = (int(state[6]) << 32) | int(state[7])
+        self.gaps = int(state[8])
+        self.gap_time = int(state[9])
+        self.bridged_time = int(state[10])
+
+    def _add(self, values):
+        total = self._sum + values
+        self._comp += np.where(np.abs(self._sum)>=np.abs(values), (self._sum - total) + values, (values - total) + self._sum)
+        self._sum = total
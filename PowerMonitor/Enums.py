@@ -18,11 +18,52 @@ class DISPLAY_ENERGY(Enum):
     AH = 0
     WH = 1
 
+class SAMPLING_MODE(Enum):
+    INTERVAL = 0                # read sensor after the calculated read time
+    CONVERSION_READY = 1        # poll conversion ready flag and read once per conversion cycle
+
+class OVERRUN_POLICY(Enum):
+    CATCH_UP = 0                # read without delay until the missed deadlines have been caught up
+    SKIP = 1                    # skip missed deadlines and continue with the next one
+
+class THREAD_POLICY(Enum):
+    OTHER = 0                   # default time sharing scheduler, the nice level can be changed
+    FIFO = 1                    # real-time, runs until it blocks or a thread with higher priority is ready
+    RR = 2                      # real-time, round robin between threads with the same priority
+
+class CAPTURE_TRIGGER(Enum):
+    CURRENT = 0                 # current above the threshold
+    DI_DT = 1                   # rate of change of the current above the threshold
+    CRITICAL_ALERT = 2          # critical alert flag of the INA3221, the limit is the current threshold
+
+class DECIMATION_FILTER(Enum):
+    BOXCAR = 0                  # mean of the readings of each output interval
+    CIC = 1                     # cascaded integrator-comb, boxcar applied multiple times
+    FIR = 2                     # windowed sinc low pass
+
+class ENERGY_GAP_POLICY(Enum):
+    SKIP = 0                    # gaps are not added
+    INTERPOLATE = 1             # linear interpolation between the readings before and after the gap
+    HOLD = 2                    # the reading before the gap is held until the next reading
+
+class DOWNSAMPLING_MODE(Enum):
+    MEAN = 0                    # mean value of each interval
+    MIN_MAX = 1                 # min. and max. value of each interval, keeps peaks
+    FIRST_LAST = 2              # first and last value of each interval
+    LTTB = 3                    # largest triangle three buckets, keeps the shape of the curve
+
+class RETENTION_LEVEL(Enum):
+    NORMAL = 0                  # memory usage is below the budget
+    COMPRESS = 1                # values are compressed earlier
+    REDUCE = 2                  # the resolution of the oldest compressed values is reduced
+    TRIM = 3                    # the oldest values are removed
+
 class SCHEDULER_PRIO(Enum):
     WRITE_GUI_CONFIG = 0
     DEBUG_PING = 1
     ANIMATION = 2
     COMPRESS_DATA = 3
+    GC_COLLECT = 4
 
 class KEY_BINDINGS(Enum):
     TOGGLE_FULLSCREEN = 0
@@ -0,0 +1,58 @@
+#
+# Author: sascha_lammers@gmx.de
+#
+
+import threading
+import time
+import gc
+
+# measures the pauses of the garbage collector with gc.callbacks
+#
+# the callback is executed by the thread that triggered the collection while holding the GIL. all other threads are
+# paused for the same time
+class GcMonitor(object):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._start = None
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._count = [0, 0, 0]
+            self._total = 0
+            self._max = 0
+            self._collected = 0
+
+    def install(self):
+        if not self._callback in gc.callbacks:
+            gc.callbacks.append(self._callback)
+
+    def remove(self):
+        if self._callback in gc.callbacks:
+            gc.callbacks.remove(self._callback)
+
+    def _callback(self, phase, info):
+        if phase=='start':
+            self._start = time.perf_counter()
+            return
+        if self._start==None:
+            return
+        duration = time.perf_counter() - self._start
+        self._start = None
+        with self._lock:
+            self._count[info['generation']] += 1
+            self._total += duration
+            self._max = max(self._max, duration)
+            self._collected += info['collected']
+
+    # number of collections per generation, total and max. pause in milliseconds and collected objects since the
+    # last reset
+    def get_stats(self):
+        with self._lock:
+            return {
+                'gc_count': '%u/%u/%u' % tuple(self._count),
+                'gc_total_ms': round(self._total * 1000, 3),
+                'gc_max_ms': round(self._max * 1000, 3),
+                'gc_collected': self._collected
+            }
@@ -0,0 +1,215 @@
+#
+# Author: sascha_lammers@gmx.de
+#
+
+import numpy as np
+
+# buckets of a single level of the pyramid
+#
+# bucket j contains the rows j * size to (j + 1) * size - 1, first is the number of the oldest bucket
+class LodLevel(object):
+
+    INITIAL_CAPACITY = 256
+
+    def __init__(self, level, shape):
+        self.size = 1 << level
+        self._shape = shape
+        self._allocate(LodLevel.INITIAL_CAPACITY)
+        self.first = 0
+
+    def _allocate(self, capacity):
+        self._t = np.zeros((capacity, 2), dtype=np.float64)
+        self._min = np.zeros((capacity,) + self._shape, dtype=np.float32)
+        self._max = np.zeros((capacity,) + self._shape, dtype=np.float32)
+        self._sum = np.zeros((capacity,) + self._shape, dtype=np.float64)
+        self._start = 0
+        self._end = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    @property
+    def nbytes(self):
+        return self._t.nbytes + self._min.nbytes + self._max.nbytes + self._sum.nbytes
+
+    # number of the bucket after the newest bucket
+    @property
+    def end(self):
+        return self.first + len(self)
+
+    def clear(self, first=0):
+        self._start = 0
+        self._end = 0
+        self.first = first
+
+    # remove the buckets before first
+    def trim(self, first):
+        if first>=self.end:
+            self.clear(first)
+        elif first>self.first:
+            self._start += first - self.first
+            self.first = first
+
+    # copy the buckets to arrays that do not have more than the capacity
+    def compact(self, capacity):
+        length = len(self)
+        capacity = max(length, capacity)
+        if len(self._t)<=capacity:
+            return
+        tmp = (self._t[self._start:self._end], self._min[self._start:self._end], self._max[self._start:self._end], self._sum[self._start:self._end])
+        self._allocate(capacity)
+        self._t[0:length], self._min[0:length], self._max[0:length], self._sum[0:length] = tmp
+        self._end = length
+
+    # append buckets starting with number first
+    #
+    # t             time of the first and last row of each bucket
+    # vmin, vmax    min. and max. values
+    # vsum          sum of the values
+    def append(self, first, t, vmin, vmax, vsum):
+        if first!=self.end:
+            self.clear(first)
+        n = len(t)
+        if self._end + n>len(self._t):
+            length = len(self)
+            tmp = (self._t[self._start:self._end], self._min[self._start:self._end], self._max[self._start:self._end], self._sum[self._start:self._end])
+            self._allocate(max(LodLevel.INITIAL_CAPACITY, (length + n) * 2))
+            self._t[0:length], self._min[0:length], self._max[0:length], self._sum[0:length] = tmp
+            self._end = length
+        end = self._end + n
+        self._t[self._end:end] = t
+        self._min[self._end:end] = vmin
+        self._max[self._end:end] = vmax
+        self._sum[self._end:end] = vsum
+        self._end = end
+
+    # returns views of the buckets first to end
+    def get(self, first, end):
+        start = self._start + first - self.first
+        end = self._start + end - self.first
+        return (self._t[start:end], self._min[start:end], self._max[start:end], self._sum[start:end])
+
+# min., max. and mean values of buckets with a power of two rows for plotting long time frames
+#
+# the rows have absolute numbers that do not change if old rows are removed. level n combines 2^n rows and is built
+# from the level below when new rows have been appended. only complete buckets are stored, the rows at the start and
+# end of a time frame that do not fill a bucket are combined when querying
+class LodPyramid(object):
+
+    # level 0 and 1 are not stored, smaller time frames are returned without reduction
+    MIN_LEVEL = 2
+    MAX_LEVEL = 24
+
+    # shape         shape of the values of a row
+    def __init__(self, shape):
+        self._shape = tuple(shape)
+        self.clear()
+
+    def clear(self):
+        self._levels = []
+
+    # add the buckets that have been completed
+    #
+    # t, values     all rows
+    # first         absolute number of the first row
+    def update(self, t, values, first):
+        end = first + len(t)
+        for level in range(LodPyramid.MIN_LEVEL, LodPyramid.MAX_LEVEL + 1):
+            index = level - LodPyramid.MIN_LEVEL
+            size = 1 << level
+            if index==len(self._levels):
+                if end<size * 2:
+                    break
+                self._levels.append(LodLevel(level, self._shape))
+            lod = self._levels[index]
+            bucket_from = max(lod.end, -(-first // size))
+            bucket_to = end // size
+            if index==0:
+                if bucket_to<=bucket_from:
+                    break
+                start = bucket_from * size - first
+                stop = bucket_to * size - first
+                rows_t = t[start:stop].reshape(-1, size)
+                rows = values[start:stop].reshape((-1, size) + self._shape)
+                lod.append(bucket_from, np.column_stack((rows_t[:, 0], rows_t[:, -1])), rows.min(axis=1), rows.max(axis=1), rows.sum(axis=1, dtype=np.float64))
+            else:
+                below = self._levels[index - 1]
+                bucket_from = max(bucket_from, -(-below.first // 2))
+                bucket_to = min(bucket_to, below.end // 2)
+                if bucket_to<=bucket_from:
+                    break
+                t2, vmin, vmax, vsum = below.get(bucket_from * 2, bucket_to * 2)
+                lod.append(bucket_from, np.column_stack((t2[0::2, 0], t2[1::2, 1])), np.minimum(vmin[0::2], vmin[1::2]), np.maximum(vmax[0::2], vmax[1::2]), vsum[0::2] + vsum[1::2])
+
+    # remove the buckets that contain rows before first
+    def trim(self, first):
+        for lod in self._levels:
+            lod.trim(-(-first // lod.size))
+
+    # release the memory of removed buckets
+    #
+    # headroom      capacity for appending as part of the number of buckets
+    def compact(self, headroom):
+        # empty levels are created again by update()
+        while self._levels and not len(self._levels[-1]):
+            self._levels.pop()
+        for lod in self._levels:
+            lod.compact(int(len(lod) * (1 + headroom)))
+
+    # allocated bytes of all levels
+    @property
+    def nbytes(self):
+        return sum(lod.nbytes for lod in self._levels)
+
+    # returns the time and values of the rows start to end with not more than about max_points
+    #
+    # t, values     all rows
+    # first         absolute number of the first row
+    # mean          return the mean value of each bucket instead of min. and max. value
+    #
+    # the min. and max. value of each bucket is returned as two points, the first with the time of the first row and
+    # the min. value, the second with the time of the last row and the max. value. if the number of rows is below
+    # max_points, views of the rows are returned
+    def query(self, t, values, first, start, end, max_points, mean=False):
+        n = end - start
+        if n<=max_points or not self._levels:
+            return (t[start:end], values[start:end])
+        level = int(np.ceil(np.log2(max(1.0, n * (mean and 1 or 2) / max_points))))
+        index = min(max(level, LodPyramid.MIN_LEVEL), LodPyramid.MAX_LEVEL) - LodPyramid.MIN_LEVEL
+        lod = self._levels[min(index, len(self._levels) - 1)]
+        size = lod.size
+        bucket_from = max(-(-(first + start) // size), lod.first)
+        bucket_to = min((first + end) // size, lod.end)
+        if bucket_to<=bucket_from:
+            return (t[start:end], values[start:end])
+
+        parts = []
+        counts = []
+        head = bucket_from * size - first
+        if head>start:
+            parts.append(self._combine(t[start:head], values[start:head]))
+            counts.append([head - start])
+        parts.append(lod.get(bucket_from, bucket_to))
+        counts.append(np.full(bucket_to - bucket_from, size))
+        tail = bucket_to * size - first
+        if end>tail:
+            parts.append(self._combine(t[tail:end], values[tail:end]))
+            counts.append([end - tail])
+
+        t2, vmin, vmax, vsum = [np.concatenate(items) for items in zip(*parts)]
+        if mean:
+            counts = np.concatenate(counts).reshape((-1,) + (1,) * len(self._shape))
+            return (t2.mean(axis=1), (vsum / counts).astype(np.float32))
+
+        out_t = t2.reshape(-1)
+        out_values = np.empty((len(t2) * 2,) + self._shape, dtype=np.float32)
+        out_values[0::2] = vmin
+        out_values[1::2] = vmax
+        return (out_t, out_values)
+
+    def _combine(self, t, values):
+        return (np.array([[t[0], t[-1]]]), values.min(axis=0, keepdims=True), values.max(axis=0, keepdims=True), values.sum(axis=0, keepdims=True, dtype=np.float64))
+
+    # number of buckets of all levels
+    def __len__(self):
+        return sum(len(lod) for lod in self._levels)
@@ -50,6 +50,7 @@ class MainApp(Plot.Plot):
             self.debug(__name__, 'starting headless')
             AppConfig._debug_exception(e)
 
+        self.gc_init()
         self.start()
 
 
@@ -78,14 +79,10 @@ class MainApp(Plot.Plot):
             channel.calibration._update_multipliers()
             if channel.enabled:
                 self.channels.append(channel)
-        self.labels = [
-            {'U': 0, 'e': 0},
-            {'U': 0, 'e': 0},
-            {'U': 0, 'e': 0}
-        ]
+        self.labels = [{'U': 0, 'e': 0} for channel in AppConfig.channels]
 
         self.reset_values()
-        self.reset_avg()
+        self.reset_window_stats()
         self.reset_energy()
         self.reset_data()
 
@@ -142,11 +139,13 @@ class MainApp(Plot.Plot):
             self.reset_data()
             self.stats = {}
             self.start_time = time.monotonic()
-            self.compressed_ts = -1
             self.compressed_min_records = 0
+            self._plot_downsampler = None
+            self._retention = None
             self.plot_updated = 0
             self.plot_updated_times = []
-            self._y_limits = [[]]*4
+            # axis 0 and a voltage axis for each channel
+            self._y_limits = [None] * (1 + len(self.channels))
             for i in range(0, len(self._y_limits)):
                 self.y_limit_clear(i)
             self.power_sum = [ 1 ]
@@ -223,6 +222,8 @@ class MainApp(Plot.Plot):
 
         if AppConfig.gui.color_scheme == COLOR_SCHEME.DARK:
             self.CHANNELS = ['lime', 'deepskyblue', '#b4b0d1', '#0e830e', '#8681b5', '#268daf', 'red']
+            # channels of additional devices
+            self.CHANNELS_EXTRA = ['orange', 'magenta', 'yellow', 'cyan', 'salmon', 'gold', 'violet', 'springgreen', 'tomato']
             self.BG_COLOR = 'black'
             self.TEXT_COLOR = 'white'
             self.PLOT_TEXT = self.TEXT_COLOR
@@ -232,6 +233,7 @@ class MainApp(Plot.Plot):
             self.POPUP_BG_COLOR = '#999999'
         elif AppConfig.gui.color_scheme == COLOR_SCHEME.LIGHT:
             self.CHANNELS = ['green', 'blue', 'aqua', 'green', 'blue', 'aqua', 'red']
+            self.CHANNELS_EXTRA = ['darkorange', 'purple', 'olive', 'teal', 'brown', 'goldenrod', 'darkviolet', 'seagreen', 'crimson']
             self.BG_COLOR = 'white'
             self.TEXT_COLOR = 'black'
             self.PLOT_TEXT = self.TEXT_COLOR
@@ -244,17 +246,23 @@ class MainApp(Plot.Plot):
 
         Channel.COLOR_AGGREGATED_POWER = self.CHANNELS[6]
 
-        for i in range(3):
+        for i in AppConfig.channels:
+            if i<3:
+                color = self.CHANNELS[i]
+                hline_color = self.CHANNELS[i + 3]
+            else:
+                color = self.CHANNELS_EXTRA[(i - 3) % len(self.CHANNELS_EXTRA)]
+                hline_color = color
             if not AppConfig.channels[i].color:
-                AppConfig.channels[i].color = self.CHANNELS[i]
+                AppConfig.channels[i].color = color
             if not AppConfig.channels[i].hline_color:
-                AppConfig.channels[i].hline_color = self.CHANNELS[i + 3]
+                AppConfig.channels[i].hline_color = hline_color
 
         self._fonts = namedtuple('GuiFonts', ['top_font', 'debug_font', 'label_font'])
         self._fonts.top_font = font.Font(family='Helvetica', size=20)
         self._fonts.debug_font = font.Font(family='Helvetica', size=10)
-        label_font_size = (32, 28, 22)
-        self._fonts.label_font = font.Font(family='Helvetica', size=label_font_size[len(self.channels) - 1])
+        label_font_size = (32, 28, 22, 18, 16, 14)
+        self._fonts.label_font = font.Font(family='Helvetica', size=label_font_size[min(len(self.channels), len(label_font_size)) - 1])
 
     def set_screen_update_rate(self, running=True):
         if (self._animation.mode!=Animation.Mode.RUNNING)==running:
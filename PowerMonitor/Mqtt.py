@@ -157,6 +157,29 @@ class Mqtt(Influxdb.Influxdb):
             'value_template': '{{ value_json.%s }}' % value_json_name
         }, ensure_ascii=False, indent=None, separators=(',', ':'))
 
+    # publish the readings of a burst capture
+    #
+    # timestamp     time of the trigger
+    def mqtt_publish_capture(self, trace, timestamp):
+        if not self.mqtt_connected:
+            return
+        try:
+            payload = json.dumps({
+                'ts': round(timestamp, 6),
+                'channel': trace.channel + 1,
+                'trigger': trace.trigger.name,
+                'peak': self.format_float_precision(trace.peak_current),
+                't': np.round(trace.get_time(), 6).tolist(),
+                'U': np.round(trace.get_values(trace.channel, 'U'), 4).tolist(),
+                'I': np.round(trace.get_values(trace.channel, 'I'), 5).tolist()
+            }, separators=(',', ':'))
+            topic = AppConfig.mqtt.get_capture_topic()
+            self.debug(__name__, 'publish %s: %u bytes', topic, len(payload))
+            self.client.publish(topic, payload=payload, qos=AppConfig.mqtt.qos, retain=False)
+            self.add_stats('mqtt_pub', 1)
+        except Exception as e:
+            self.error(__name__, 'failed to publish capture: %s', e)
+
     def mqtt_thread_handler(self, notification):
         self.debug(__name__, 'cmd=%s data=%s', notification.data.cmd, notification.data)
         if notification.data.cmd=='quit':
@@ -174,16 +197,17 @@ class Mqtt(Influxdb.Influxdb):
 
         while not self._mqtt_thread_state['quit']:
             sleep_time = 5
-            if not self.mqtt_connected or np.sum(self.averages[0])<3:
+            window = self.window_stats.get('mqtt')
+            if not self.mqtt_connected or window==None or window.count<3:
                 # wait for connection and enough data
                 pass
             else:
                 sleep_time = AppConfig.mqtt.update_interval
                 tmp = None
+                # mean values of the last update interval
+                averages = window.mean.T
                 self._data_lock.acquire()
                 try:
-                    averages = [np.divide(self.averages[1], self.averages[0]), np.divide(self.averages[2], self.averages[0]), np.divide(self.averages[3], self.averages[0])]
-                    self.reset_avg()
                     tmp2 = copy.deepcopy(self.energy)
                 finally:
                     self._data_lock.release()
@@ -194,7 +218,7 @@ class Mqtt(Influxdb.Influxdb):
                     sum_P = 0
                     sum_E = 0
 
-                    for n in range(0, 3):
+                    for n in range(0, len(AppConfig.channels)):
                         payload = json.dumps({
                             'U': self.format_float_precision(averages[0][n]),
                             'I': self.format_float_precision(averages[1][n]),
@@ -19,7 +19,7 @@ except:
     colour = False
 
 class NamedTuples:
-    PlotData = namedtuple('PlotData', ['time', 'P', 'channels'])
+    PlotData = namedtuple('PlotData', ['time', 'P', 'channels', 'means', 'limits'])
     PlotChannel = namedtuple('PlotChannel', ['U', 'I', 'P'])
     PlotMargin = namedtuple('PlotMargin', ('top', 'bottom'))
 
@@ -44,13 +44,15 @@ class Plot(Sensor.Sensor):
     def init_vars(self):
         self.debug(__name__, 'init_vars')
 
-        # []*4
-        # [0] = axis 0, lines[]*3 current or power channel 1-3
-        # [1] = axis 1, lines[]*1 voltage channel 1
-        # [2] = axis 2, lines[]*1 voltage channel 2
-        # [3] = axis 3, lines[]*1 voltage channel 3
+        # []*(1 + active channels)
+        # [0] = axis 0, lines[]*n current or power of the active channels
+        # [1] = axis 1, lines[]*1 voltage of the first active channel
+        # [n] = axis n, lines[]*1 voltage of the nth active channel
         self._ax_data = []
         self._time_scale_num = 0
+        # line of the last burst capture on axis 0
+        self._capture_line = None
+        self._capture_shown = None
 
     def ticks_params(self):
         return {
@@ -86,14 +88,14 @@ class Plot(Sensor.Sensor):
         self.fig = Figure(figsize=(3, 3), dpi=self.geometry.dpi, tight_layout=True, facecolor=self.BG_COLOR)
 
         # axis 0
-        ax = self.fig.add_subplot(self.get_plot_geometry(0, PLOT_VISIBILITY.BOTH), facecolor=self.PLOT_BG)
+        ax = self.fig.add_subplot(*self.get_plot_geometry(0, PLOT_VISIBILITY.BOTH), facecolor=self.PLOT_BG)
         self._ax_data.append(namedtuple('AxisData%u' % len(self._ax_data), ('ax', 'background', 'lines', 'legend', 'datax', 'datay')))
         self._ax_data[-1].ax = ax
         self._ax_data[-1].lines = []
 
-        # axis 1-3
-        for channel in self.active_channels:
-            ax = self.fig.add_subplot(self.get_plot_geometry(channel.number, PLOT_VISIBILITY.BOTH), facecolor=self.PLOT_BG, sharex=self._ax_data[0].ax)
+        # axis 1-n
+        for idx, channel in enumerate(self.active_channels):
+            ax = self.fig.add_subplot(*self.get_plot_geometry(idx + 1, PLOT_VISIBILITY.BOTH), facecolor=self.PLOT_BG, sharex=self._ax_data[0].ax)
             self._ax_data.append(namedtuple('AxisData%u' % len(self._ax_data), ('ax', 'background', 'lines', 'datay', 'hline')))
             self._ax_data[-1].ax = ax
             self._ax_data[-1].lines = []
@@ -176,11 +178,11 @@ class Plot(Sensor.Sensor):
                 cols = 2
                 rows = 2
                 num = 8
-            elif len(self.active_channels)==3:
-                # 3x 2 rows 2 cols
+            else:
+                # 3x or more 2 rows 2 cols
                 cols = 2
                 rows = 2
-                num = 12
+                num = 4 * len(self.active_channels)
 
             w = 1 / cols
             h = 1 / rows
@@ -332,19 +334,20 @@ class Plot(Sensor.Sensor):
             info = '%u seconds' % self.get_time_scale()
         self._ax_data[0].legend = self._ax_data[0].ax.legend([info], handlelength=0, fontsize=AppConfig.plot.font_size, labelcolor=self.TEXT_COLOR, loc='lower center', frameon=False, borderpad=0.0, borderaxespad=0.2)
 
+    # returns (rows, cols, index) or None if the plot is hidden
     def get_plot_geometry(self, plot_number, visibility=None):
         if visibility==None:
             visibility = self._gui_config.plot_visibility
         if plot_number==0:
             if visibility==PLOT_VISIBILITY.BOTH:
-                return 121
+                return (1, 2, 1)
             elif visibility==PLOT_VISIBILITY.PRIMARY:
-                return 111
+                return (1, 1, 1)
         else:
             if visibility==PLOT_VISIBILITY.BOTH:
-                return (len(self.active_channels) * 100) + 20 + (plot_number * 2)
+                return (len(self.active_channels), 2, plot_number * 2)
             if visibility==PLOT_VISIBILITY.VOLTAGE:
-                return 100 + (len(self.active_channels) * 10) + (plot_number)
+                return (1, len(self.active_channels), plot_number)
         return None
 
     def get_time_scale_list(self):
@@ -373,6 +376,19 @@ class Plot(Sensor.Sensor):
     def get_time_scale(self):
         return self._time_scale_items[int((len(self._time_scale_items) - 1) * self._gui_config.plot_time_scale)]
 
+    # returns the statistics of the readings of the displayed time frame or None if the window has not been filled yet
+    #
+    # a window is added for each time scale that it is filled when the time scale is changed
+    def get_plot_window(self):
+        for time_scale in self._time_scale_items:
+            if not self.window_stats.has_window('plot:%s' % time_scale):
+                self.window_stats.set_window('plot:%s' % time_scale, time_scale)
+        time_scale = self.get_time_scale()
+        window = self.window_stats.get('plot:%s' % time_scale)
+        if window==None or window.timeframe<time_scale * 0.95:
+            return None
+        return window
+
     def plot_count_fps(self):
         ts = time.monotonic()
         self.plot_updated_times.append(ts - self.plot_updated)
@@ -386,7 +402,7 @@ class Plot(Sensor.Sensor):
             n = self._read_count
             avg = n / diff
             self._read_count = 0
-            self.debug(__name__, 'fps %.2f items %u sensor=%.2f/s (%u)', self.get_plot_fps(), len(self.values._t), avg, n)
+            self.debug(__name__, 'fps %.2f items %u sensor=%.2f/s (%u)', self.get_plot_fps(), len(self.values), avg, n)
 
     def get_plot_fps(self):
         return 1.0 / max(0.001, len(self.plot_updated_times)>2 and np.average(self.plot_updated_times[1:]) or 10000000)
@@ -405,7 +421,7 @@ class Plot(Sensor.Sensor):
                     # if self.is_channel_active(channel):
                     return (self._ax_data[0].lines[channel], self._data.channels[channel].P, self._ax_data[0].ax)
 
-        elif axis in (1, 2, 3) and self._gui_config.plot_visibility!=PLOT_VISIBILITY.PRIMARY:
+        elif axis>=1 and self._gui_config.plot_visibility!=PLOT_VISIBILITY.PRIMARY:
             # if self.is_channel_active(channel):
             return (self._ax_data[axis].lines[0], self._data.channels[channel].U, self._ax_data[axis].ax)
 
@@ -418,7 +434,7 @@ class Plot(Sensor.Sensor):
             self.debug(__name__, 'idx=%u visibility=%s get_plot_geometry=%s', idx, str(self._gui_config.plot_visibility), n)
             if n!=None:
                 ax.set_visible(True)
-                ax.change_geometry(int(n / 100) % 10, int(n / 10) % 10, int(n) % 10)
+                ax.change_geometry(*n)
             elif ax:
                 ax.set_visible(False)
 
@@ -471,6 +487,7 @@ class Plot(Sensor.Sensor):
                     line.remove()
                 self._ax_data[idx].lines = []
                 idx += 1
+            self._capture_line = None
 
             values = []
 
@@ -515,6 +532,10 @@ class Plot(Sensor.Sensor):
                             line, = data.ax.plot(values, values, color=channel._color_for('P'), label=channel.name + ' P', linewidth=AppConfig.plot.line_width)
                             data.lines.append(line)
 
+                    if self._gui_config.plot_primary_display==PLOT_PRIMARY_DISPLAY.CURRENT and self._capture:
+                        # full rate current of the last burst capture
+                        self._capture_line, = data.ax.plot(values, values, color=self.PLOT_TEXT, linewidth=AppConfig.plot.line_width / 3, ls='dashed')
+
             # secondary plots, voltage per axis
             if self._gui_config.plot_visibility in(PLOT_VISIBILITY.VOLTAGE, PLOT_VISIBILITY.BOTH):
                 for idx, channel in enumerate(self.active_channels):
@@ -538,6 +559,8 @@ class Plot(Sensor.Sensor):
         for data in self._ax_data:
             if data.ax.get_visible():
                 artists.extend(data.lines)
+        if self._capture_line!=None:
+            artists.append(self._capture_line)
                 # for child in data.ax.get_children():
                 #     if isinstance(child, (matplotlib.legend.Legend, matplotlib.text.Text)):
                 #         artists.append(child)
@@ -560,9 +583,6 @@ class Plot(Sensor.Sensor):
             if not self._data_lock.acquire(True, 0.2):
                 return self.plot_get_all_artists()
             try:
-                if AppConfig._debug:
-                    self._validate_array_len('plot')
-
                 self.plot_count_fps()
 
                 ts = time.monotonic()
@@ -572,18 +592,21 @@ class Plot(Sensor.Sensor):
                 x_max = self.values.max_time()
                 x_min = x_max - self.get_time_scale()
 
-                d_time = np.array(self.values._t)
-                display_idx = np.searchsorted(d_time, x_min)
+                # about points_per_pixel values per pixel of the plot width, peaks are preserved
+                max_points = 0
+                if AppConfig.plot.points_per_pixel:
+                    max_points = int(max(256, self.canvas.get_tk_widget().winfo_width()) * AppConfig.plot.points_per_pixel)
+                d_time, d_values = self.values.get_plot_values(x_min, max_points)
 
                 aggregatedP = None
                 channels = []
                 tmp = []
 
-                for channel_index, values in enumerate(self.values.values()):
+                for channel_index in range(0, len(self.values.values())):
 
-                    U = np.array(values.U[display_idx:])
-                    I = np.array(values.I[display_idx:])
-                    P = np.array(values.P[display_idx:])
+                    U = d_values[:, channel_index, 0]
+                    I = d_values[:, channel_index, 1]
+                    P = d_values[:, channel_index, 2]
 
                     # sum aggregated power for active channels
                     if self.channels[channel_index].aggregate_power and channel_index in self.active_channels_index:
@@ -595,11 +618,24 @@ class Plot(Sensor.Sensor):
                     aggregatedP = np.array(tmp).sum(axis=0)
 
                 # move last to 0 that the grid does not move and the reverse order is preserved
-                time_idx = np.subtract(self.values._t[display_idx:], self.values._t[-1])
+                last_t = self.values.max_time()
+                time_idx = np.subtract(d_time, last_t)
                 x_min = -self.get_time_scale()
                 x_max = 0
 
-                self._data = NamedTuples.PlotData(time=time_idx, P=aggregatedP, channels=channels)
+                # the labels show the mean values of all readings and the y limits are the min. and max. values of the
+                # readings of the time frame. both are read from the sliding windows that are updated by the sensor
+                positions = [int(channel) for channel in self.channels]
+                labels = self.window_stats.get('labels')
+                if labels!=None:
+                    means = labels.mean[positions]
+                else:
+                    means = self.values.get_mean_values(last_t - max(1.0, AppConfig.plot.display_top_values_mean_time))
+                limits = self.get_plot_window()
+                if limits!=None:
+                    limits = (limits.min[positions], limits.max[positions])
+
+                self._data = NamedTuples.PlotData(time=time_idx, P=aggregatedP, channels=channels, means=means, limits=limits)
                 data = self._data
 
             finally:
@@ -618,8 +654,13 @@ class Plot(Sensor.Sensor):
                 line, values, ax = self.get_plot_data(0, idx)
                 if line!=None:
 
-                    y_max0 = max(y_max0, np.amax(values))
-                    y_min0 = min(y_min0, np.amin(values))
+                    if data.limits!=None and self._gui_config.plot_primary_display!=PLOT_PRIMARY_DISPLAY.AGGREGATED_POWER:
+                        column = self._gui_config.plot_primary_display==PLOT_PRIMARY_DISPLAY.CURRENT and 1 or 2
+                        y_max0 = max(y_max0, data.limits[1][idx][column])
+                        y_min0 = min(y_min0, data.limits[0][idx][column])
+                    else:
+                        y_max0 = max(y_max0, np.amax(values))
+                        y_min0 = min(y_min0, np.amin(values))
 
                     line.set_data(data.time, values)
                     artists.append(line)
@@ -633,8 +674,12 @@ class Plot(Sensor.Sensor):
 
                     artists.append(self._ax_data[idx + 1].hline)
 
-                    max_val = np.amax(values)
-                    min_val = np.amin(values)
+                    if data.limits!=None:
+                        max_val = data.limits[1][idx][0]
+                        min_val = data.limits[0][idx][0]
+                    else:
+                        max_val = np.amax(values)
+                        min_val = np.amin(values)
 
                     # limits per channel
                     if channel.y_limits.voltage_max==None:
@@ -653,12 +698,9 @@ class Plot(Sensor.Sensor):
 
                 # top labels, one per channel
 
-                x_pos = x_max - max(1.0, AppConfig.plot.display_top_values_mean_time)
-                avg_idx = np.searchsorted(data.time, x_pos)
-
-                labelU_text = fmt.format(np.mean(data.channels[idx].U[avg_idx:]), 'V')
-                labelI_text = fmt.format(np.mean(data.channels[idx].I[avg_idx:]), 'A')
-                labelP_text = fmt.format(np.mean(data.channels[idx].P[avg_idx:]), 'W')
+                labelU_text = fmt.format(data.means[idx][0], 'V')
+                labelI_text = fmt.format(data.means[idx][1], 'A')
+                labelP_text = fmt.format(data.means[idx][2], 'W')
                 if self._gui_config.plot_display_energy==DISPLAY_ENERGY.AH:
                     tmp = ('ei', 'Ah')
                     val = self.energy[idx][tmp[0]]
@@ -677,6 +719,22 @@ class Plot(Sensor.Sensor):
 
             # ---------------------------------------------------------------------------------------
 
+            # last burst capture
+            if self.captures:
+                trace = self.captures[-1]
+                if self._capture_shown!=trace:
+                    self._capture_shown = trace
+                    self.show_popup('Capture %s: %s' % (AppConfig.channels[trace.channel].name, fmt.format(trace.peak_current, 'A')))
+                if self._capture_line!=None:
+                    capture_time = trace.values[:, 0] - last_t
+                    capture_current = trace.get_values(trace.channel, 'I')
+                    self._capture_line.set_data(capture_time, capture_current)
+                    artists.append(self._capture_line)
+                    visible = capture_time>=x_min
+                    if visible.any():
+                        y_max0 = max(y_max0, np.amax(capture_current[visible]))
+                        y_min0 = min(y_min0, np.amin(capture_current[visible]))
+
             # axis 0 y limits
             if y_min0!=sys.maxsize:
                 y_max0 = round(y_max0 * self._plot_margin.top, 2)
@@ -726,13 +784,8 @@ class Plot(Sensor.Sensor):
     def update_debug_info(self):
 
         # DEBUG DISPLAY
-        data_n = 0
-        for channel, values in self.values.items():
-            for type, items in values.items():
-                data_n += len(items)
-            # parts.append('%u:#%u' % (channel, len(values[0])))
-            # for i in range(0, len(values)):
-            #     data_n += len(values[i])
+        # U, I and P of each channel
+        data_n = len(self.values) * len(self.values.values()) * 3
 
         p = [
             'fps=%.2f' % self.get_plot_fps(),
@@ -3,89 +3,300 @@
 #
 
 from PowerMonitor.AppConfig import Channel
+from .LodPyramid import LodPyramid
 import numpy as np
 
+# channel of the container
+#
+# the values are read with PlotValuesContainer.get_plot_values(), index is the position of the channel in the values
 class PlotValues(object):
-    def __init__(self, channel: Channel):
+
+    TYPES = {'U': 0, 'I': 1, 'P': 2}
+
+    def __init__(self, container, channel: Channel, index):
+        self._container = container
         self._channel = channel
-        self.U = []
-        self.P = []
-        self.I = []
+        self.index = index
 
     def __len__(self):
-        return len(self.U)
+        return len(self._container)
 
-    def __setattr__(self, key, val):
-        if not key.startswith('_') and not key in ('U', 'I', 'P'):
-            raise KeyError('attribute %s readonly' % key)
-        object.__setattr__(self, key, val)
+# time and U, I, P of each channel in preallocated arrays
+#
+# the valid rows are _start to _end. removing the oldest rows only moves _start. if there is no space left for
+# appending, the rows are copied to a new array with twice the size that is needed. the arrays are never modified in
+# place, views that have been returned before stay valid
+#
+# time is stored as float64, the values as float32. the min., max. and mean values for plotting long time frames are
+# kept in a LodPyramid
+class PlotValuesBuffer(object):
 
-    def items(self):
-        return (
-            ('U', self.U),
-            ('I', self.I),
-            ('P', self.P)
-        )
+    INITIAL_CAPACITY = 4096
+
+    def __init__(self, channels):
+        self._channels = channels
+        self._lod = LodPyramid((channels, 3))
+        self.clear()
+
+    def _allocate(self, capacity):
+        self._t = np.zeros(capacity, dtype=np.float64)
+        self._v = np.zeros((capacity, self._channels, 3), dtype=np.float32)
+        self._start = 0
+        self._end = 0
+
+    def __len__(self):
+        return self._end - self._start
 
     def clear(self):
-        self.U.clear()
-        self.P.clear()
-        self.I.clear()
+        self._allocate(PlotValuesBuffer.INITIAL_CAPACITY)
+        # number of the row at _start since the buffer has been cleared
+        self._first = 0
+        self._lod.clear()
+
+    # make space for n rows at the end
+    def _reserve(self, n):
+        if self._end + n<=len(self._t):
+            return
+        length = len(self)
+        t = self._t[self._start:self._end]
+        v = self._v[self._start:self._end]
+        self._allocate(max(PlotValuesBuffer.INITIAL_CAPACITY, (length + n) * 2))
+        self._t[0:length] = t
+        self._v[0:length] = v
+        self._end = length
+
+    # copy the rows to arrays with headroom for appending as part of the number of rows. the arrays are only replaced
+    # if they are larger
+    def compact(self, headroom):
+        length = len(self)
+        capacity = max(PlotValuesBuffer.INITIAL_CAPACITY, int(length * (1 + headroom)))
+        if len(self._t)>capacity:
+            t = self._t[self._start:self._end]
+            v = self._v[self._start:self._end]
+            self._allocate(capacity)
+            self._t[0:length] = t
+            self._v[0:length] = v
+            self._end = length
+        self._lod.compact(headroom)
+
+    # allocated bytes including the LodPyramid
+    @property
+    def nbytes(self):
+        return self._t.nbytes + self._v.nbytes + self._lod.nbytes
+
+    # t             time
+    # values        array with the shape (n, channels, 3)
+    def append(self, t, values):
+        n = len(t)
+        if n==0:
+            return
+        self._reserve(n)
+        self._t[self._end:self._end + n] = t
+        self._v[self._end:self._end + n] = values
+        self._end += n
+        self._lod.update(self.time(), self.all_values(), self._first)
+
+    # remove the oldest n rows
+    def trim(self, n):
+        n = min(len(self), n)
+        self._start += n
+        self._first += n
+        self._lod.trim(self._first)
+
+    def max_time(self):
+        if self._end>self._start:
+            return float(self._t[self._end - 1])
+        return 0
+
+    # returns a view of the time
+    def time(self):
+        return self._t[self._start:self._end]
+
+    # returns a view of the values with the shape (n, channels, 3)
+    def all_values(self):
+        return self._v[self._start:self._end]
+
+    def get_plot_values(self, time_val, max_points=0, mean=False):
+        start = np.searchsorted(self.time(), time_val, side='left')
+        if max_points<=0:
+            return (self.time()[start:], self.all_values()[start:])
+        return self._lod.query(self.time(), self.all_values(), self._first, start, len(self), max_points, mean)
 
+    # returns the sum of the values newer than time_val and the number of rows
+    def get_sum_values(self, time_val):
+        start = np.searchsorted(self.time(), time_val, side='left')
+        return (self.all_values()[start:].sum(axis=0, dtype=np.float64), len(self) - start)
+
+# the plot values of all channels
+#
+# new values are appended to the uncompressed buffer. values that are older than plot.compression.uncompressed_time
+# are moved to the compressed buffer in chunks by a StreamingDownsampler. the compressed values are not modified
+# anymore. the time of the compressed values is always before the time of the uncompressed values
 class PlotValuesContainer(object):
 
     def __init__(self, channels):
         self._values = []
-        for channel in channels:
-            self._values.append(PlotValues(channel))
-        self._t = []
+        self._positions = {}
+        for index, channel in enumerate(channels):
+            self._values.append(PlotValues(self, channel, index))
+            self._positions[int(channel)] = index
+        self._compressed = PlotValuesBuffer(len(self._values))
+        self._uncompressed = PlotValuesBuffer(len(self._values))
+
+    def __len__(self):
+        return len(self._compressed) + len(self._uncompressed)
 
     def clear(self):
-        self._t.clear()
-        for val in self._values:
-            val.clear()
+        self._compressed.clear()
+        self._uncompressed.clear()
 
     def __getitem__(self, key):
         if isinstance(key, Channel):
-            return self._values[int(key)]
+            return self._values[self._positions[int(key)]]
         return self._values[key]
 
-    # def append_time(self, list):
-    #     self._t += list
+    # append rows with time followed by U, I and P of each channel
+    #
+    # rows          array with the columns t, U, I, P of channel 0, U, I, P of channel 1, ...
+    # channels      channel numbers of the columns, None if the columns match the channels of the container
+    def append(self, rows, channels=None):
+        values = rows[:, 1:].reshape(len(rows), -1, 3)
+        if channels!=None:
+            values = values[:, [int(channel) for channel in channels]]
+        self._uncompressed.append(rows[:, 0], values)
+
+    # remove the oldest n rows
+    def trim(self, n):
+        compressed = min(n, len(self._compressed))
+        self._compressed.trim(compressed)
+        self._uncompressed.trim(n - compressed)
+
+    # returns views of the time and values of the uncompressed rows older than time_val
+    def get_uncompressed(self, time_val):
+        end = np.searchsorted(self._uncompressed.time(), time_val, side='left')
+        return (self._uncompressed.time()[0:end], self._uncompressed.all_values()[0:end])
+
+    # replace the oldest n uncompressed rows with compressed rows
+    def compress(self, n, t, values):
+        self._compressed.append(t, values)
+        self._uncompressed.trim(n)
+
+    def compressed_len(self):
+        return len(self._compressed)
+
+    # returns views of the time and values of the compressed rows
+    def get_compressed(self):
+        return (self._compressed.time(), self._compressed.all_values())
+
+    # replace the oldest n compressed rows with rows that have a lower resolution
+    #
+    # the compressed rows are copied to a new buffer, views that have been returned before stay valid
+    def reduce(self, n, t, values):
+        buffer = PlotValuesBuffer(len(self._values))
+        buffer.append(np.concatenate((t, self._compressed.time()[n:])), np.concatenate((values, self._compressed.all_values()[n:])))
+        buffer.compact(0.25)
+        self._compressed = buffer
+
+    # release the memory of removed rows
+    #
+    # headroom      capacity for appending as part of the number of rows
+    def compact(self, headroom=0.25):
+        self._compressed.compact(headroom)
+        self._uncompressed.compact(headroom)
+
+    # allocated bytes of the compressed and uncompressed values
+    @property
+    def nbytes(self):
+        return self._compressed.nbytes + self._uncompressed.nbytes
 
     def max_time(self):
-        if self._t:
-            return self._t[-1]
+        if len(self._uncompressed):
+            return self._uncompressed.max_time()
+        return self._compressed.max_time()
+
+    def min_time(self):
+        if len(self._compressed):
+            return float(self._compressed.time()[0])
+        if len(self._uncompressed):
+            return float(self._uncompressed.time()[0])
         return 0
 
-    def timeframe(self, start=0, end=-1):
-        if len(self._t):
-            return self._t[end] - self._t[start]
+    def timeframe(self):
+        if len(self):
+            return self.max_time() - self.min_time()
         return 0.0
 
+    # returns the time of all rows. the rows are copied if there are compressed rows, use get_plot_values() or
+    # find_time_index() to access parts of the rows
     def time(self):
-        return self._t
-
-    def find_time_index(self, time_val, timestamp=False, func=None):
-        time_max = self.max_time()
-        if func!=None:
-            f = filter(lambda t: func(t), self._t)
-        elif timestamp:
-            f = filter(lambda t: t > time_val, self._t)
-        else:
-            f = filter(lambda t: time_max - t <= time_val, self._t)
-        element = next(f, None)
-        if element==None:
+        if not len(self._compressed):
+            return self._uncompressed.time()
+        return np.concatenate((self._compressed.time(), self._uncompressed.time()))
+
+    # returns the values of all rows with the shape (n, channels, 3). the rows are copied if there are compressed rows
+    def all_values(self):
+        if not len(self._compressed):
+            return self._uncompressed.all_values()
+        return np.concatenate((self._compressed.all_values(), self._uncompressed.all_values()))
+
+    # returns the time and values newer than time_val with not more than about max_points, 0 for all values
+    #
+    # for longer time frames the min. and max. value of each bucket is returned as two points. with mean=True the
+    # mean value of each bucket is returned. the points are divided between the compressed and uncompressed values by
+    # their time frame
+    def get_plot_values(self, time_val, max_points=0, mean=False):
+        timeframe = max(self.max_time() - time_val, 1.0e-9)
+        parts = []
+        for buffer in (self._compressed, self._uncompressed):
+            if len(buffer)==0 or buffer.max_time()<time_val:
+                continue
+            points = max_points
+            if max_points>0:
+                points = max(2, int(max_points * (buffer.max_time() - max(time_val, float(buffer.time()[0]))) / timeframe))
+            parts.append(buffer.get_plot_values(time_val, points, mean))
+        if not parts:
+            return (np.zeros(0), np.zeros((0, len(self._values), 3), dtype=np.float32))
+        if len(parts)==1:
+            return parts[0]
+        return (np.concatenate([part[0] for part in parts]), np.concatenate([part[1] for part in parts]))
+
+    # returns the mean values of the rows newer than time_val with the shape (channels, 3)
+    def get_mean_values(self, time_val):
+        total = np.zeros((len(self._values), 3))
+        count = 0
+        for buffer in (self._compressed, self._uncompressed):
+            values, n = buffer.get_sum_values(time_val)
+            total += values
+            count += n
+        if count==0:
+            return total
+        return total / count
+
+    # binary search in the time, which is monotonic
+    #
+    # time_val      with timestamp=True the index of the first time newer than time_val is returned, otherwise the index
+    #               of the first time that is within time_val seconds of the latest time
+    #
+    # returns None if there is no such time
+    def find_time_index(self, time_val, timestamp=False):
+        index = self.find_time_indices((time_val,), timestamp)[0]
+        if index==len(self):
             return None
-        return self._t.index(element)
+        return int(index)
 
-    def set_items(self, type_str, channel, items):
-        if type_str=='t':
-            self._t = items
-        elif channel<0 or channel>=len(self._values):
-            raise ValueError('invalid channel: %u: type: %s' % (channel, type_str))
-        elif type_str in ('U', 'I', 'P'):
-            object.__setattr__(self._values[channel], type_str, items)
+    # find_time_index for a list of values
+    #
+    # returns an array of indices, len(self) if there is no such time
+    def find_time_indices(self, time_vals, timestamp=False):
+        if timestamp:
+            side = 'right'
+            time_vals = np.asarray(time_vals, dtype=np.float64)
+        else:
+            side = 'left'
+            time_vals = self.max_time() - np.asarray(time_vals, dtype=np.float64)
+        compressed = np.searchsorted(self._compressed.time(), time_vals, side=side)
+        uncompressed = np.searchsorted(self._uncompressed.time(), time_vals, side=side)
+        return np.where(compressed<len(self._compressed), compressed, len(self._compressed) + uncompressed)
 
     def items(self):
         tmp = []
@@ -95,10 +306,3 @@ class PlotValuesContainer(object):
 
     def values(self):
         return self._values
-
-    def all(self):
-        tmp = [('t', 0, self._t)]
-        for values in self._values:
-            for type, items in values.items():
-                tmp.append((type, int(values._channel), items))
-        return tmp
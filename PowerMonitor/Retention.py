@@ -0,0 +1,96 @@
+#
+# Author: sascha_lammers@gmx.de
+#
+
+from .Enums import RETENTION_LEVEL
+from .Downsampler import StreamingDownsampler
+import numpy as np
+
+# keeps the memory used by the plot values and the sensor buffers within a budget
+#
+# the level is raised when the usage exceeds the limit of the level and lowered when it is HYSTERESIS below
+#
+# COMPRESS      the values are compressed after a shorter time
+# REDUCE        the oldest part of the compressed values is reduced to half of the rows. older values are reduced more
+#               often and have a lower resolution
+# TRIM          almost all values are compressed and the oldest values are removed
+class RetentionManager(object):
+
+    # usage as part of the budget
+    LIMITS = (
+        (RETENTION_LEVEL.TRIM, 1.0),
+        (RETENTION_LEVEL.REDUCE, 0.85),
+        (RETENTION_LEVEL.COMPRESS, 0.7),
+    )
+    HYSTERESIS = 0.05
+    # uncompressed_time is multiplied with the factor of the level
+    COMPRESS_FACTORS = {
+        RETENTION_LEVEL.NORMAL: 1.0,
+        RETENTION_LEVEL.COMPRESS: 0.25,
+        RETENTION_LEVEL.REDUCE: 0.25,
+        RETENTION_LEVEL.TRIM: 0.05,
+    }
+    # part of the compressed rows that is reduced at once
+    REDUCE_PART = 0.5
+    # min. number of compressed rows that are reduced
+    REDUCE_MIN_ROWS = 64
+    # usage as part of the budget after trimming
+    TRIM_TARGET = 0.8
+
+    # budget        max. number of bytes
+    # modes         DOWNSAMPLING_MODE of U, I and P
+    def __init__(self, budget, modes):
+        self._budget = budget
+        self._modes = modes
+        self.level = RETENTION_LEVEL.NORMAL
+
+    @property
+    def budget(self):
+        return self._budget
+
+    # returns the usage as part of the budget
+    def get_usage(self, used):
+        return used / float(self._budget)
+
+    # update the level with the number of bytes that are used
+    def update(self, used):
+        usage = self.get_usage(used)
+        for level, limit in RetentionManager.LIMITS:
+            if usage>=limit or (self.level.value>=level.value and usage>=limit - RetentionManager.HYSTERESIS):
+                self.level = level
+                return level
+        self.level = RETENTION_LEVEL.NORMAL
+        return self.level
+
+    def get_uncompressed_time(self, uncompressed_time):
+        return uncompressed_time * RetentionManager.COMPRESS_FACTORS[self.level]
+
+    # reduce the oldest part of the compressed rows to about half of the rows
+    #
+    # the interval of the buckets is twice the mean interval of the two rows of each bucket
+    #
+    # returns the number of rows that have been reduced and the time and values of the buckets or None
+    def reduce(self, t, values):
+        end = int(len(t) * RetentionManager.REDUCE_PART)
+        if end<RetentionManager.REDUCE_MIN_ROWS:
+            return None
+        interval = 4.0 * (t[end - 1] - t[0]) / end
+        if interval<=0:
+            return None
+        downsampler = StreamingDownsampler(interval, end, self._modes)
+        result = downsampler.process(t, values, t[end])
+        if result==None or len(result[1])>=result[0]:
+            return None
+        return result
+
+    # returns the number of rows that have to be removed
+    #
+    # used          bytes used
+    # history       bytes used by the plot values
+    # rows          number of plot values
+    def get_trim_rows(self, used, history, rows):
+        if rows==0 or self.get_usage(used)<RetentionManager.TRIM_TARGET:
+            return 0
+        row_bytes = history / float(rows)
+        n = int(np.ceil((used - self._budget * RetentionManager.TRIM_TARGET) / row_bytes))
+        return min(n, rows - 1)
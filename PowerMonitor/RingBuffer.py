@@ -0,0 +1,90 @@
+#
+# Author: sascha_lammers@gmx.de
+#
+
+import numpy as np
+
+# preallocated ring buffer of rows with a fixed number of columns for a single writer and a single reader
+#
+# the reader gets views of the rows that have been appended since the last read. the views are not copied and
+# remain valid until the writer has appended another capacity rows
+class RingBuffer(object):
+
+    # capacity      max. number of rows
+    # columns       number of columns per row
+    def __init__(self, capacity, columns, dtype=np.float64):
+        self._capacity = capacity
+        self._buffer = np.zeros((capacity, columns), dtype=dtype)
+        self._write = 0
+        self._read = 0
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def columns(self):
+        return self._buffer.shape[1]
+
+    # allocated bytes
+    @property
+    def nbytes(self):
+        return self._buffer.nbytes
+
+    # number of rows that have not been read yet
+    def __len__(self):
+        return min(self._capacity, self._write - self._read)
+
+    def clear(self):
+        self._write = 0
+        self._read = 0
+
+    # append a row, if the buffer is full the oldest row is overwritten
+    def append(self, row):
+        self._buffer[self._write % self._capacity] = row
+        self._write += 1
+
+    # append multiple rows
+    #
+    # the write position is updated once after all rows have been written
+    def extend(self, rows):
+        write = self._write
+        count = len(rows)
+        if count>self._capacity:
+            rows = rows[count - self._capacity:]
+            write += count - self._capacity
+            count = self._capacity
+        start = write % self._capacity
+        end = min(self._capacity, start + count)
+        self._buffer[start:end] = rows[0:end - start]
+        if end - start<count:
+            self._buffer[0:count - end + start] = rows[end - start:]
+        self._write = write + count
+
+    # returns a list of up to 2 views of the rows since the last read and the number of rows that have been overwritten
+    # before reading
+    def read(self):
+        start = self._read
+        end = self._write
+        dropped = 0
+        if end - start>self._capacity:
+            dropped = end - start - self._capacity
+            start = end - self._capacity
+        self._read = end
+        count = end - start
+        if count==0:
+            return ([], dropped)
+        start %= self._capacity
+        if start + count<=self._capacity:
+            return ([self._buffer[start:start + count]], dropped)
+        return ([self._buffer[start:], self._buffer[0:start + count - self._capacity]], dropped)
+
+    # returns a copy of the last count rows without changing the read position
+    def tail(self, count):
+        count = min(count, self._capacity, self._write)
+        if count==0:
+            return self._buffer[0:0].copy()
+        start = (self._write - count) % self._capacity
+        if start + count<=self._capacity:
+            return self._buffer[start:start + count].copy()
+        return np.concatenate((self._buffer[start:], self._buffer[0:start + count - self._capacity]))
@@ -0,0 +1,88 @@
+#
+# Author: sascha_lammers@gmx.de
+#
+
+from .Enums import OVERRUN_POLICY
+import time
+
+# schedules the sensor reads at absolute deadlines t0 + n * period. delays do not shift the following deadlines
+class SampleScheduler(object):
+
+    # period            interval in seconds
+    # policy            OVERRUN_POLICY
+    # max_catch_up      max. number of missed deadlines for OVERRUN_POLICY.CATCH_UP
+    # clock             callable returning the time in nanoseconds
+    def __init__(self, period, policy=OVERRUN_POLICY.CATCH_UP, max_catch_up=10, clock=time.monotonic_ns):
+        self._period = max(1, int(period * 1.0e9))
+        self._policy = policy
+        self._max_catch_up = max_catch_up
+        self._clock = clock
+        self.reset()
+
+    @property
+    def period(self):
+        return self._period / 1.0e9
+
+    # restart the schedule with the next call of start()
+    def reset(self):
+        self._t0 = None
+        self._n = 0
+        self._deadline = None
+        self._count = 0
+        self._lateness_sum = 0
+        self._lateness_max = 0
+        self._overruns = 0
+        self._skipped = 0
+        # deviation of the time between two iterations from the period
+        self._last = None
+        self._jitter_count = 0
+        self._jitter_sum_sq = 0
+        self._jitter_max = 0
+
+    # call at the beginning of each iteration. returns the lateness in seconds
+    def start(self):
+        now = self._clock()
+        if self._t0==None:
+            self._t0 = now
+            self._deadline = now
+        lateness = now - self._deadline
+        self._count += 1
+        self._lateness_sum += lateness
+        self._lateness_max = max(self._lateness_max, lateness)
+        if self._last!=None:
+            jitter = now - self._last - self._period
+            self._jitter_count += 1
+            self._jitter_sum_sq += jitter * jitter
+            self._jitter_max = max(self._jitter_max, abs(jitter))
+        self._last = now
+
+        self._n += 1
+        missed = lateness // self._period
+        if missed>0:
+            self._overruns += 1
+            if self._policy==OVERRUN_POLICY.SKIP:
+                self._n += missed
+                self._skipped += missed
+            elif missed>self._max_catch_up:
+                # restart the schedule after long delays
+                self._skipped += missed - self._max_catch_up
+                self._t0 = now - self._max_catch_up * self._period
+                self._n = 1
+        self._deadline = self._t0 + self._n * self._period
+        return lateness / 1.0e9
+
+    # time in seconds until the next deadline, negative if the deadline has already passed
+    def sleep_time(self):
+        return (self._deadline - self._clock()) / 1.0e9
+
+    # lateness and jitter of the loop period in microseconds, number of iterations that started more than one period late
+    # and skipped deadlines
+    def get_stats(self):
+        return {
+            'late_avg_us': self._count and round(self._lateness_sum / self._count / 1000.0, 1) or 0,
+            'late_max_us': round(self._lateness_max / 1000.0, 1),
+            'jitter_rms_us': self._jitter_count and round((self._jitter_sum_sq / self._jitter_count) ** 0.5 / 1000.0, 1) or 0,
+            'jitter_max_us': round(self._jitter_max / 1000.0, 1),
+            'overruns': self._overruns,
+            'skipped': self._skipped
+        }
@@ -6,22 +6,72 @@ from . import Mqtt
 from . import ChannelCalibration
 from . import Animation
 from . import Enums
+from .RingBuffer import RingBuffer
+from .SensorBlock import SensorBlock
+from .SampleScheduler import SampleScheduler
+from .BurstCapture import BurstCapture
+from .Decimator import (BoxcarDecimator, create_decimator)
+from .SharedRingBuffer import SharedRingBuffer
+from .Downsampler import StreamingDownsampler
+from .WindowStats import WindowStats
+from .Retention import RetentionManager
+from .EnergyIntegrator import EnergyIntegrator
+from . import ThreadScheduling
 import SDL_Pi_INA3221
 import EventManager
 import time
 import numpy as np
 import shutil
-import copy
 import json
-import copy
 import random
 import sqlite3
+import collections
+import multiprocessing
+import gc
+import signal
+import sys
+import os
 
 INA3211_CONFIG = SDL_Pi_INA3221.INA3211_CONFIG
+SAMPLING_MODE = Enums.SAMPLING_MODE
+THREAD_POLICY = Enums.THREAD_POLICY
+CAPTURE_TRIGGER = Enums.CAPTURE_TRIGGER
+
+# add an INA3221 with the waveforms from the channel configuration to the simulated bus
+#
+# config        AppConfig.App
+# device        device number to select the channels
+def add_simulated_device(config, bus, addr, device):
+    waveforms = []
+    shunts = []
+    offset = device * config.ina3221.CHANNELS_PER_DEVICE
+    for index in range(offset, offset + config.ina3221.CHANNELS_PER_DEVICE):
+        channel = config.channels[index]
+        sim = channel.simulation
+        voltage = sim.voltage
+        if voltage==None:
+            voltage = channel.voltage!=None and channel.voltage or 5.0
+        waveforms.append(SDL_Pi_INA3221.Waveform(voltage, sim.current, sim.waveform, sim.amplitude, sim.period, sim.duty, sim.noise, sim.voltage_noise))
+        shunts.append(channel.calibration.shunt / 1000.0)
+    return bus.add_device(addr, waveforms, shunts)
 
 class Sensor(Mqtt.Mqtt):
 
     ENERGY_MIN_READTIME = 0.005
+    # max. number of plot values that are compressed at once
+    COMPRESS_CHUNK_SIZE = 16384
+    # max. number of read cycles that are converted at once
+    SENSOR_BLOCK_SIZE = 256
+    # max. time in seconds before the read cycles are converted
+    SENSOR_BLOCK_TIME = 0.1
+    # number of sensor readings buffered for the GUI
+    DATA_BUFFER_SIZE = 8192
+    # min. interval for polling the conversion ready flag
+    CONVERSION_READY_POLL_INTERVAL = 0.0005
+    # number of conversion cycles without the conversion ready flag before reading the old values again
+    CONVERSION_READY_TIMEOUT = 3
+    # max. time to restart the conversions of multiple devices with an offset
+    MAX_STAGGER_TIME = 1.0
 
     def __init__(self):
         # AppConfig = config
@@ -30,42 +80,240 @@ class Sensor(Mqtt.Mqtt):
         AppConfig = self._app_config
 
         self._energy_backup_file_num = 0
-        self._read_sensor_thread_state = {'quit': False}
+        # finished is set at the end of a replay
+        self._read_sensor_thread_state = {'quit': False, 'finished': False}
         self._read_count = 0
         self._errors = 0
         self._compress_data_timeout = 0
+        self._conversion_ready_ts = [0] * AppConfig.ina3221.devices
+        self._device_index = 0
+        self._read_cycle = 0
+        self._replay_bus = None
+        self._sensor_block = SensorBlock(Sensor.SENSOR_BLOCK_SIZE, len(AppConfig.channels))
+        self._capture = None
+        self._decimator = None
+        self._plot_decimator = None
+        # the sensor is read by a child process, see AppConfig.Acquisition
+        self._acquisition_process = AppConfig.acquisition.separate_process
+        if self._acquisition_process and not 'fork' in multiprocessing.get_all_start_methods():
+            self.error(__name__, 'acquisition.separate_process is not supported on this platform')
+            self._acquisition_process = False
+        self._acquisition_buffer = None
+        self._acquisition_child = False
+        # completed burst captures for the GUI
+        self.captures = collections.deque(maxlen=AppConfig.capture.MAX_TRACES)
 
         if not self._init_ina3221_sensor():
             self._errors += 1
 
-    def _init_ina3221_sensor(self, init_calibration=False):
+    def _init_ina3221_sensor(self):
+        # disabled channels are turned off in the configuration register and not converted at all. the conversion cycle
+        # gets shorter and the remaining channels are sampled at a higher rate
+        channels_per_device = AppConfig.ina3221.CHANNELS_PER_DEVICE
+        self._device_channels = []
+        for device in range(0, AppConfig.ina3221.devices):
+            offset = device * channels_per_device
+            self._device_channels.append([channel for channel in range(offset, offset + channels_per_device) if AppConfig.channels[channel].enabled])
+        # devices without enabled channels are not read
+        self._read_devices = [device for device, channels in enumerate(self._device_channels) if channels]
+        if not self._read_devices:
+            self.error(__name__, 'no channels enabled')
+            self._read_devices = [0]
+        active_channels = max(1, max([len(channels) for channels in self._device_channels]))
+        # registers that are not read every cycle
+        self._read_dividers = [AppConfig.ina3221.get_read_dividers(AppConfig.channels[channel]) for channel in range(0, len(AppConfig.channels))]
+        self._read_all = all([dividers==(1, 1) for dividers in self._read_dividers])
+
         if AppConfig.ina3221.auto_mode_sensor_values_per_second!=None and AppConfig.ina3221.auto_mode_sensor_values_per_second!=0:
-            avg, vbus, vshunt, interval, o_list = SDL_Pi_INA3221.INA3221.get_interval_params(1 / AppConfig.ina3221.auto_mode_sensor_values_per_second)
+            avg, vbus, vshunt, interval, o_list = SDL_Pi_INA3221.INA3221.get_interval_params(1 / AppConfig.ina3221.auto_mode_sensor_values_per_second / active_channels)
         else:
             avg = AppConfig.ina3221.averaging_mode
             vbus = AppConfig.ina3221.vbus_conversion_time
             vshunt = AppConfig.ina3221.vshunt_conversion_time
-        try:
-            self.ina3221 = SDL_Pi_INA3221.INA3221(addr=AppConfig.ina3221.i2c_address, avg=avg, vbus_ct=vbus, vshunt_ct=vbus, shunt=1)
-            if init_calibration:
-                self.ina3221._calibration = ChannelCalibration(AppConfig)
-        except Exception as e:
-            self.error(__name__, 'exception while initializing INA3221 sensor: %s' % e)
-            return False
 
-        if self.ina3221._channel_read_time<Sensor.ENERGY_MIN_READTIME:
+        # read interval for SAMPLING_MODE.INTERVAL
+        if AppConfig.ina3221.auto_mode_sensor_values_per_second:
+            period = 1.0 / AppConfig.ina3221.auto_mode_sensor_values_per_second
+        else:
+            # a new value is available once per conversion cycle of the device with most active channels
+            period = SDL_Pi_INA3221.INA3221.get_interval(avg, vbus, vshunt) * active_channels
+        self._read_period = period
+        self._energy_read_time = SDL_Pi_INA3221.INA3221.get_interval(avg, vbus, vshunt)
+
+        if AppConfig.oversampling.enabled:
+            # the sensor runs with minimal averaging and the readings are filtered in software
+            avg = AppConfig.oversampling.averaging_mode
+            vbus = AppConfig.oversampling.vbus_conversion_time
+            vshunt = AppConfig.oversampling.vshunt_conversion_time
+            self._read_period = AppConfig.oversampling.interval
+            self._energy_read_time = self._read_period
+        if AppConfig.capture.enabled:
+            # the sensor runs at full rate and the readings are averaged over the read period
+            avg = INA3211_CONFIG.AVERAGING_MODE.x1
+            vbus = INA3211_CONFIG.VBUS_CONVERSION_TIME.time_140_us
+            vshunt = INA3211_CONFIG.VSHUNT_CONVERSION_TIME.time_140_us
+        if AppConfig.oversampling.enabled or AppConfig.capture.enabled:
+            period = SDL_Pi_INA3221.INA3221.get_interval(avg, vbus, vshunt) * active_channels
+            if AppConfig.capture.enabled:
+                self._init_capture(period)
+            self._init_decimators(period)
+        # the devices are read one after another within the period
+        self._sample_scheduler = SampleScheduler(period / len(self._read_devices), AppConfig.ina3221.overrun_policy, AppConfig.ina3221.max_catch_up)
+
+        # time of a conversion cycle of the device with most active channels
+        self._cycle_time = SDL_Pi_INA3221.INA3221.get_conversion_time(avg, vbus, vshunt) * active_channels
+
+        # with a separate process, the bus is opened by the child process
+        if not self._acquisition_process or self._acquisition_child:
+            if not self._open_ina3221_devices(avg, vbus, vshunt):
+                return False
+
+        if self._energy_read_time<Sensor.ENERGY_MIN_READTIME and not self._acquisition_child:
             print(AppConfig.ignore_warnings)
             if AppConfig.ignore_warnings<=0:
-                raise RuntimeWarning("Sensor read time below minimum. %.6f<%s. Energy readings won't be available. Start with --ignore-warnings=<number>" % (self.ina3221._channel_read_time, Sensor.ENERGY_MIN_READTIME))
+                raise RuntimeWarning("Sensor read time below minimum. %.6f<%s. Energy readings won't be available. Start with --ignore-warnings=<number>" % (self._energy_read_time, Sensor.ENERGY_MIN_READTIME))
             AppConfig.ignore_warnings -= 1
 
         return True
 
+    # create the bus and the INA3221 devices
+    def _open_ina3221_devices(self, avg, vbus, vshunt):
+        try:
+            # the replay continues after reinitializing the sensor
+            if hasattr(self, 'ina3221') and not self._replay_bus:
+                self.ina3221.close()
+        except Exception as e:
+            self.debug(__name__, 'exception while closing INA3221 sensor: %s' % e)
+        try:
+            channels_per_device = AppConfig.ina3221.CHANNELS_PER_DEVICE
+            addresses = AppConfig.ina3221.get_i2c_addresses()
+            if AppConfig.ina3221.replay_file:
+                if not self._replay_bus:
+                    file = AppConfig.get_filename(AppConfig.ina3221.replay_file)
+                    self.info(__name__, 'replaying %s realtime=%s', file, AppConfig.ina3221.replay_realtime)
+                    self._replay_bus = SDL_Pi_INA3221.ReplayBus(file, AppConfig.ina3221.replay_realtime)
+                bus = self._replay_bus
+            else:
+                bus = SDL_Pi_INA3221.create_bus(AppConfig.ina3221.bus_backend, i2c_clock=AppConfig.ina3221.simulation_i2c_clock)
+                if AppConfig.ina3221.bus_backend==SDL_Pi_INA3221.BUS_BACKEND.SIMULATED:
+                    for device, addr in enumerate(addresses):
+                        self._add_simulated_device(bus, addr, device)
+                if AppConfig.ina3221.record_file:
+                    file = AppConfig.get_filename(AppConfig.ina3221.record_file)
+                    self.info(__name__, 'recording sensor to %s', file)
+                    bus = SDL_Pi_INA3221.RecordingBus(bus, file)
+            # all devices share the bus, the first device provides the bus and timing properties
+            self.ina3221_devices = []
+            for device, addr in enumerate(addresses):
+                bits = SDL_Pi_INA3221.INA3221.get_channel_bits([channel - device * channels_per_device for channel in self._device_channels[device]])
+                self.ina3221_devices.append(SDL_Pi_INA3221.INA3221(addr=addr, channels=bits, avg=avg, vbus_ct=vbus, vshunt_ct=vshunt, shunt=1, bus=bus))
+            self.ina3221 = self.ina3221_devices[0]
+            if self._capture and self._capture.trigger==CAPTURE_TRIGGER.CRITICAL_ALERT:
+                self._set_critical_alerts()
+            self._stagger_devices()
+            # writing the configuration restarts the conversion, the registers are valid after the first cycle
+            self._sensor_block.invalidate_held(self.ina3221.monotonic_ns() + int(self._cycle_time * 1.0e9))
+        except EOFError as e:
+            self._replay_finished()
+            return False
+        except Exception as e:
+            self.error(__name__, 'exception while initializing INA3221 sensor: %s' % e)
+            return False
+
+        return True
+
+    # create the burst capture
+    #
+    # period        time of a full rate read cycle
+    def _init_capture(self, period):
+        if self._capture:
+            return
+        capture = AppConfig.capture
+        threshold = capture.trigger==CAPTURE_TRIGGER.DI_DT and capture.didt_threshold or capture.current_threshold
+        capacity = int((capture.pre_trigger + capture.post_trigger + Sensor.SENSOR_BLOCK_TIME) / period) + Sensor.SENSOR_BLOCK_SIZE
+        self._capture = BurstCapture(capture.trigger, threshold, capture.pre_trigger, capture.post_trigger, capture.holdoff, len(AppConfig.channels), capacity)
+        self.info(__name__, 'burst capture trigger=%s threshold=%s capacity=%u', capture.trigger.name, threshold, capacity)
+
+    # create the decimators that filter the readings of the oversampling or burst capture mode
+    #
+    # period        sample period of the sensor
+    def _init_decimators(self, period):
+        if self._decimator:
+            return
+        # time followed by the timestamps, U, I and P of each channel
+        columns = 1 + len(AppConfig.channels) * 4
+        oversampling = AppConfig.oversampling
+        if not oversampling.enabled:
+            self._decimator = BoxcarDecimator(self._read_period, columns)
+            return
+        self._decimator = create_decimator(oversampling.filter, oversampling.interval, period, columns, oversampling.cic_order)
+        self.info(__name__, 'oversampling filter=%s sample period=%.3fms interval=%.3fs', oversampling.filter.name, period * 1000, oversampling.interval)
+        # the plot can have a higher bandwidth than the other consumers
+        if oversampling.plot_interval and not AppConfig.headless:
+            self._plot_decimator = create_decimator(oversampling.filter, oversampling.plot_interval, period, columns, oversampling.cic_order)
+            self.info(__name__, 'oversampling plot interval=%.3fs', oversampling.plot_interval)
+
+    # set the current threshold as critical alert limit of the enabled channels
+    def _set_critical_alerts(self):
+        for device in self._read_devices:
+            offset = device * AppConfig.ina3221.CHANNELS_PER_DEVICE
+            ina3221 = self.ina3221_devices[device]
+            for channel in self._device_channels[device]:
+                ina3221.set_critical_alert(channel - offset, AppConfig.channels[channel].calibration.get_shunt_from_current(AppConfig.capture.current_threshold))
+            ina3221.set_critical_alert_latch(True)
+
+    # returns a list of channels that exceeded the critical alert limit
+    def _get_critical_alerts(self):
+        alerts = []
+        try:
+            for device in self._read_devices:
+                offset = device * AppConfig.ina3221.CHANNELS_PER_DEVICE
+                alerts.extend([channel + offset for channel in self.ina3221_devices[device].get_critical_alerts()])
+        except Exception as e:
+            self.error(__name__, 'exception while reading critical alerts: %s', e)
+        return alerts
+
+    # restart the conversions of the devices with an offset of cycle time / devices. the transfers of one device overlap
+    # with the conversions of the other devices
+    def _stagger_devices(self):
+        devices = [self.ina3221_devices[device] for device in self._read_devices]
+        if len(devices)<2 or self.ina3221.paced:
+            return
+        offset = max([device.get_cycle_time() for device in devices]) / len(devices)
+        if offset * (len(devices) - 1)>Sensor.MAX_STAGGER_TIME:
+            return
+        start = self.ina3221.monotonic()
+        for index, device in enumerate(devices):
+            sleep_time = start + index * offset - self.ina3221.monotonic()
+            if sleep_time>0:
+                time.sleep(sleep_time)
+            device.restart_conversion()
+
+    # add an INA3221 with the waveforms from the channel configuration to the simulated bus
+    #
+    # device        device number to select the channels
+    def _add_simulated_device(self, bus, addr, device):
+        self.debug(__name__, 'simulated INA3221 at 0x%02x', addr)
+        add_simulated_device(AppConfig, bus, addr, device)
+
     def start(self):
         self.debug(__name__, 'start')
         self._read_sensor_thread_listener = EventManager.Listener('read_sensor', self._event)
         self.thread_daemonize(__name__, self.read_sensor_thread)
 
+    def destroy(self):
+        self.debug(__name__, 'destroy')
+        # the sensor thread is a daemon thread and might not reach the end of read_sensor_thread()
+        self.flush_recording()
+
+    # write the records of the recording to the file
+    def flush_recording(self):
+        try:
+            if hasattr(self, 'ina3221'):
+                self.ina3221.flush()
+        except Exception as e:
+            self.debug(__name__, 'exception while flushing the recording: %s' % e)
+
     def init_database(self):
         try:
             cur = self._conn.cursor()
@@ -76,25 +324,39 @@ class Sensor(Mqtt.Mqtt):
                 updated_ts INTEGER, \
                 PRIMARY KEY (updated_ts, channel_id) \
             )')
+            # readings of the burst capture as float32 rows of the time relative to the trigger followed by U, I and P
+            # of each channel
+            cur.execute('CREATE TABLE IF NOT EXISTS captures ( \
+                captured_ts REAL, \
+                channel_id TINYINT, \
+                trigger TINYINT, \
+                peak_current REAL, \
+                columns TINYINT, \
+                data BLOB \
+            )')
         except Exception as e:
             raise RuntimeError("Failed to create table: %s" % e)
 
     def init_vars(self):
         self.debug(__name__, 'init_vars')
         self._time_scale_num = 0
-        self.ina3221._calibration = ChannelCalibration(AppConfig)
+        self._calibration = ChannelCalibration(AppConfig)
         self.reset_data()
 
     def reset_energy(self):
-        self.energy = dict(enumerate([{'t': 0, 'ei': 0, 'ep': 0}]*3))
+        self._energy_integrators = [EnergyIntegrator(AppConfig.energy.gap_policy, AppConfig.energy.max_gap) for index in AppConfig.channels]
+        self.energy = {index: {'t': 0, 'ei': 0, 'ep': 0} for index in AppConfig.channels}
         self.energy['stored'] = 0
 
     def reset_data(self):
         # do not store data for GUI in headless mode
         if AppConfig.headless:
             self.data = None
+        elif hasattr(self, 'data') and self.data!=None:
+            self.data.clear()
         else:
-            self.data = [[], [ [[], [], []], [[], [], []], [[], [], []] ]]
+            # time followed by U, I and P of each channel
+            self.data = RingBuffer(Sensor.DATA_BUFFER_SIZE, 1 + len(AppConfig.channels) * 3)
 
     def read_sensor_thread_handler(self, notification):
         self.debug(__name__, 'cmd=%s data=%s', notification.data.cmd, notification.data)
@@ -102,9 +364,104 @@ class Sensor(Mqtt.Mqtt):
             self._read_sensor_thread_state['quit'] = True
             raise EventManager.StopSleep
 
+    # sleep in the sensor thread. a replay controls the timing itself and only pending notifications are processed
+    #
+    # the child process has no notifications, it quits if requested through the shared buffer or if the main process
+    # has ended
+    def _sensor_sleep(self, sleep_time):
+        if self._acquisition_child:
+            self._acquisition_buffer.heartbeat()
+            if self._acquisition_buffer.is_quit() or os.getppid()!=self._parent_pid:
+                self._read_sensor_thread_state['quit'] = True
+            elif sleep_time>0 and not self.ina3221.paced:
+                time.sleep(sleep_time)
+            return
+        if (not self._acquisition_process and self.ina3221.paced) or sleep_time<=0:
+            self._read_sensor_thread_listener.poll(self.read_sensor_thread_handler)
+        else:
+            self._read_sensor_thread_listener.sleep(sleep_time, self.read_sensor_thread_handler)
+
+    # end of the recording, stop reading the sensor and report the throughput
+    #
+    # in headless mode the app terminates after the sensor thread has processed the last block and stored the energy
+    def _replay_finished(self):
+        bus = self._replay_bus
+        duration = time.monotonic() - self._replay_start
+        self.info(__name__, 'replay finished: %u reads, %u mismatches, %u samples, recorded %.3fs, replayed %.3fs, %.1f samples/s',
+            bus.reads, bus.mismatches, self._read_count, bus.duration, duration, duration and (self._read_count / duration) or 0)
+        self.add_stats('replay', self._read_count)
+        self._read_sensor_thread_state['quit'] = True
+        self._read_sensor_thread_state['finished'] = True
+
+    # poll the conversion ready flag until the next conversion cycle has been completed
+    #
+    # device        index of the device
+    #
+    # returns the time in nanoseconds the conversion has been detected or None if the thread is quitting
+    def wait_conversion_ready(self, device=0):
+        ina3221 = self.ina3221_devices[device]
+        cycle_time = ina3221.get_cycle_time()
+        poll_interval = max(Sensor.CONVERSION_READY_POLL_INTERVAL, cycle_time / 20)
+        last_ts = self._conversion_ready_ts[device]
+        if last_ts:
+            # sleep until shortly before the next conversion is expected
+            sleep_time = last_ts + cycle_time - poll_interval - self.ina3221.monotonic()
+            if sleep_time>0:
+                self._sensor_sleep(sleep_time)
+
+        timeout = self.ina3221.monotonic() + cycle_time * Sensor.CONVERSION_READY_TIMEOUT
+        while not self._read_sensor_thread_state['quit']:
+            ts_ns = self.ina3221.monotonic_ns()
+            ts = ts_ns / 1.0e9
+            if ina3221.conversion_ready():
+                if last_ts:
+                    # the flag does not count conversions, missed cycles are detected by the elapsed time
+                    missed = int(round((ts - last_ts) / cycle_time)) - 1
+                    if missed>0:
+                        self.add_stats('cvrf_miss', missed)
+                self.add_stats('cvrf', 1)
+                self._conversion_ready_ts[device] = ts
+                return ts_ns
+            if ts>=timeout:
+                # no new conversion available, the values of the last cycle are read again
+                self.add_stats('cvrf_dup', 1)
+                self._conversion_ready_ts[device] = ts
+                return ts_ns
+            self._sensor_sleep(poll_interval)
+
+        return None
+
+    # apply CPU affinity and scheduling policy of the sensor_thread section to the calling thread. errors are logged and
+    # the thread continues with the default settings
+    #
+    # own_thread    False to move the threads of the process off the CPUs of the sensor without changing the calling
+    #               thread, i.e. the sensor is read by a child process
+    def _set_thread_scheduling(self, own_thread=True):
+        config = AppConfig.sensor_thread
+        try:
+            cpus = config.get_cpu_affinity()
+            if cpus!=None and not own_thread:
+                if config.isolate_cpu:
+                    others = ThreadScheduling.move_threads(cpus)
+                    self.info(__name__, 'threads moved to CPUs %s', sorted(others))
+            elif cpus!=None:
+                others = ThreadScheduling.set_thread_affinity(cpus, config.isolate_cpu)
+                self.info(__name__, 'sensor thread CPU affinity %s, other threads %s', sorted(cpus), others!=None and sorted(others) or 'unchanged')
+        except Exception as e:
+            self.error(__name__, 'failed to set CPU affinity %s: %s', config.cpu_affinity, e)
+        if not own_thread:
+            return
+        try:
+            if config.policy!=THREAD_POLICY.OTHER or config.nice!=None:
+                ThreadScheduling.set_thread_policy(config.policy, config.priority, config.nice)
+                self.info(__name__, 'sensor thread policy %s priority %u nice %s', config.policy.name, config.priority, config.nice)
+        except Exception as e:
+            self.error(__name__, 'failed to set scheduling policy %s: %s', config.policy.name, e)
+
     def read_sensor_thread(self):
         self.thread_register(__name__)
-        self.info(__name__, 'sensor read interval %.2fms' % (self.ina3221._channel_read_time * 1000))
+        self._set_thread_scheduling(not self._acquisition_process)
+        self.info(__name__, 'sensor read interval %.2fms, %u active channels' % (self._read_period * 1000, sum([len(channels) for channels in self._device_channels])))
 
         try:
             file = AppConfig.get_filename(AppConfig.database_file)
@@ -115,106 +472,105 @@ class Sensor(Mqtt.Mqtt):
             raise RuntimeError(msg)
         self.init_database()
         self.db_load_energy()
+        self._replay_start = time.monotonic()
+
+        if self._acquisition_process:
+            self.acquisition_thread()
+        else:
+            self._read_sensor_loop()
+
+        self.process_sensor_block()
+        self.db_store_energy()
+        if self._conn:
+            self._conn.close()
+            self._conn = None
 
+        if not self._acquisition_process:
+            try:
+                # flush the recording
+                self.ina3221.close()
+            except Exception as e:
+                self.debug(__name__, 'exception while closing INA3221 sensor: %s' % e)
+
+        if self._read_sensor_thread_state['finished'] and AppConfig.headless:
+            self.terminate.set()
+
+        self.thread_register(__name__)
+
+    # read the sensor until the thread or the child process quits
+    def _read_sensor_loop(self):
         try:
             while not self._read_sensor_thread_state['quit']:
 
-                t = time.monotonic()
+                conversion_ready = AppConfig.ina3221.sampling_mode==SAMPLING_MODE.CONVERSION_READY
+                if not conversion_ready:
+                    self._sample_scheduler.start()
+                t = self.ina3221.monotonic()
                 if self._errors==0:
                     # read data from sensor
-                    tmp = []
-                    for channel in AppConfig.channels:
-                        ch = int(channel)
-                        if channel in self.channels: # channel enabled?
-                            tmp.append((0, 0, 0, 0))
-                        else:
-                            try:
-                                busvoltage = self.ina3221.getBusVoltage_V(ch)
-                                shuntvoltage = self.ina3221.getShuntVoltage_V(ch)
-                                current = self.ina3221.getCurrent_mA(ch)
-                                loadvoltage = busvoltage - shuntvoltage
-                                current = current / 1000.0
-                                power = (current * busvoltage)
-                                self.add_stats('sensor', 1)
-                                tmp.append((loadvoltage, current, power, time.monotonic()))
-                            except Exception as e:
-                                self.add_stats('senerr', 1)
-                                self.error(__name__, 'exception while reading INA3221 sensor: %s', str(e))
-                                self._errors += 1
-                                tmp = None
+                    try:
+                        # the devices with enabled channels are read one per iteration
+                        device = self._read_devices[self._device_index]
+                        conversion_ts = None
+                        if conversion_ready:
+                            conversion_ts = self.wait_conversion_ready(device)
+                            if conversion_ts==None:
                                 break
+                            t = conversion_ts / 1.0e9
+
+                        # read all registers of the device in a single pass and store the raw values. the conversion is done per block
+                        offset = device * AppConfig.ina3221.CHANNELS_PER_DEVICE
+                        channels = self._device_channels[device]
+                        quantities = None
+                        if not self._read_all:
+                            # the registers are read every cycle until they have been read after the first conversion
+                            block = self._sensor_block
+                            quantities = []
+                            for channel in channels:
+                                vbus_divider, vshunt_divider = self._read_dividers[channel]
+                                quantities.append((self._read_cycle % vbus_divider==0 or not block.is_held_valid(0, channel), self._read_cycle % vshunt_divider==0 or not block.is_held_valid(1, channel)))
+                        values = self.ina3221_devices[device].read_channels_raw([channel - offset for channel in channels], quantities)
+                        # in conversion ready mode all channels belong to the conversion cycle that ended at t
+                        self._sensor_block.update(t, channels, values, conversion_ts)
+
+                        self._device_index += 1
+                        if self._device_index>=len(self._read_devices):
+                            self._device_index = 0
+                            self._read_cycle += 1
+                            self._sensor_block.next_row()
+                    except EOFError as e:
+                        self._replay_finished()
+                        break
+                    except Exception as e:
+                        self.add_stats('senerr', 1)
+                        self.error(__name__, 'exception while reading INA3221 sensor: %s', str(e))
+                        self._errors += 1
+
+                    if self._errors==0 and self._device_index==0 and (self._sensor_block.full() or t - self._sensor_block.start_time()>=Sensor.SENSOR_BLOCK_TIME):
+                        self.process_sensor_block()
 
-                    if self._errors==0 and len(tmp):
-                        # lock'n'copy
-
-                        # store_energy_data = None
-                        diff_limit = self.ina3221._channel_read_time * len(self.channels) * 3
-                        self._data_lock.acquire()
-                        try:
-                            if self.data:
-                                self.data[0].append(t)
-
-                            for index, (loadvoltage, current, power, ts) in enumerate(tmp):
-
-                                self.averages[0][index] += 1
-                                self.averages[1][index] += loadvoltage
-                                self.averages[2][index] += current
-                                self.averages[3][index] += power
-
-                                # due to the resolution of the timestamp, energy can only be calculated precisely having an interval > 50ms
-                                # precision will benefit from even longer intervals
-                                if self.ina3221._channel_read_time>=Sensor.ENERGY_MIN_READTIME:
-                                    if self.energy[index]['t']==0 or ts==0:
-                                        self.energy[index]['t'] = ts
-                                    else:
-                                        diff = ts - self.energy[index]['t']
-                                        # do not add if there is a gap that is over 3x times the expected read time
-                                        if diff < diff_limit:
-                                            self.energy[index]['ei'] += (diff * current / 3600)
-                                            self.energy[index]['ep'] += (diff * power / 3600)
-                                        else:
-                                            if diff>diff_limit * 10:
-                                                self.error(__name__, 'sensor read timeout for channel number %u: %.3fs channels: %u read time: %.6fms', (index + 1), diff, len(self.channels), self.ina3221._channel_read_time / 1000000)
-                                        self.energy[index]['t'] = ts
-
-                                    if t>self.energy['stored'] + min(30, AppConfig.store_energy_interval): # limited to >=30 seconds
-                                        self.energy['stored'] = t;
-                                        self.db_store_energy()
-
-
-                                if self.data:
-                                    self.data[1][index][0].append(loadvoltage)
-                                    self.data[1][index][1].append(current)
-                                    self.data[1][index][2].append(power)
-
-                        finally:
-                            self._data_lock.release()
-
-                        if self.influx_client:
-                            self.influxdb_push_data(tmp)
-
-                        if self._gui and self._animation.mode==Animation.Mode.NONE:
-                            self.debug(__name__, 'starting animation from sensor')
-                            self._animation.schedule()
-
-                        # self.debug(__name__, 'sensor items %u', len(self.data[0]))
-
-                diff = time.monotonic() - t
-                diff = diff>=0 and (self.ina3221._channel_read_time - diff) or 0
                 self._read_count += 1
-                self._read_sensor_thread_listener.sleep(diff, self.read_sensor_thread_handler)
+                if not conversion_ready:
+                    # sleep until the next deadline
+                    self._sensor_sleep(self._sample_scheduler.sleep_time())
 
                 # if any error occurs, let it finish reading all channels and try to reinitialize here
                 if self._errors>0:
-                    self.energy[index]['t'] = 0
+                    self.process_sensor_block()
+                    if self._acquisition_child:
+                        # the watchdog restarts the process
+                        break
                     while True:
                         self.info(__name__, 'waiting 5 seconds before trying to reinitialize the sensor: errors=%u', self._errors)
-                        self._read_sensor_thread_listener.sleep(5.0, self.read_sensor_thread_handler)
+                        self._sensor_sleep(5.0)
                         if self._read_sensor_thread_state['quit']:
                             break
-                        if self._init_ina3221_sensor(True):
+                        if self._init_ina3221_sensor():
                             self.info(__name__, 'resetting sensor error count')
                             self._errors = 0
+                            self._conversion_ready_ts = [0] * len(self.ina3221_devices)
+                            self._device_index = 0
+                            self._read_cycle = 0
                             break
                         self._errors += 1
 
@@ -222,22 +578,280 @@ class Sensor(Mqtt.Mqtt):
             self.error(__name__, str(e))
             AppConfig._debug_exception(e)
 
-        self.db_store_energy()
-        if self._conn:
-            self._conn.close()
-            self._conn = None
 
-        self.thread_register(__name__)
+    # start the child process that reads the sensor, pass its readings to process_readings() and restart it if it stops
+    # responding or exits with an error
+    def acquisition_thread(self):
+        config = AppConfig.acquisition
+        # time followed by the critical alerts, the timestamps, U, I and P of each channel
+        # the energy is integrated by the child process and passed with the state of the integrators
+        self._acquisition_buffer = SharedRingBuffer(config.buffer_size, 2 + len(AppConfig.channels) * 4, (len(AppConfig.channels), EnergyIntegrator.STATE_SIZE))
+        context = multiprocessing.get_context('fork')
+        try:
+            while not self._read_sensor_thread_state['quit']:
+                self._acquisition_buffer.reset()
+                process = context.Process(target=self._acquisition_child_main, name='sensor', daemon=True)
+                process.start()
+                self.info(__name__, 'sensor process started pid=%u', process.pid)
+                start = time.monotonic()
+                while not self._read_sensor_thread_state['quit'] and process.is_alive():
+                    self._sensor_sleep(Sensor.SENSOR_BLOCK_TIME)
+                    self._read_acquisition_buffer()
+                    # the child process does not send heartbeats while it is initializing the sensor
+                    age = self._acquisition_buffer.get_heartbeat_age()
+                    if age==None:
+                        age = time.monotonic() - start
+                    if age>config.watchdog_timeout:
+                        self.error(__name__, 'sensor process pid=%u not responding for %.1fs', process.pid, age)
+                        break
+
+                self._acquisition_buffer.quit()
+                process.join(1.0)
+                if process.is_alive():
+                    process.kill()
+                    process.join()
+                self._read_acquisition_buffer()
+                if self._read_sensor_thread_state['quit']:
+                    break
+                if process.exitcode==0:
+                    # end of the replay
+                    self.info(__name__, 'sensor process finished')
+                    self._read_sensor_thread_state['finished'] = True
+                    break
+
+                self.add_stats('acq_restart', 1)
+                self.error(__name__, 'sensor process pid=%u exit code %s, restarting in %.1fs', process.pid, process.exitcode, config.restart_delay)
+                self._sensor_sleep(config.restart_delay)
 
+        except Exception as e:
+            self.error(__name__, str(e))
+            AppConfig._debug_exception(e)
+        finally:
+            self._acquisition_buffer.close()
+            self._acquisition_buffer = None
+
+    # entry point of the child process
+    def _acquisition_child_main(self):
+        self._acquisition_child = True
+        self._parent_pid = os.getppid()
+        # the main process requests the child to quit
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        for signum in (signal.SIGINT, signal.SIGQUIT, signal.SIGHUP):
+            signal.signal(signum, signal.SIG_IGN)
+        # the explicit collections of the main thread are not available
+        self._gc_monitor.remove()
+        gc.enable()
+        self._read_sensor_thread_state = {'quit': False, 'finished': False}
+        self._errors = 0
+        self._conn = None
+        self.stats = {}
+        self._set_thread_scheduling()
+        if not self._init_ina3221_sensor():
+            sys.exit(1)
+        self._read_sensor_loop()
+        self.process_sensor_block()
+        try:
+            self.ina3221.close()
+        except Exception as e:
+            self.debug(__name__, 'exception while closing INA3221 sensor: %s' % e)
+        self._acquisition_buffer.close()
+        sys.exit(self._errors and 1 or 0)
+
+    # readings of the child process
+    def _read_acquisition_buffer(self):
+        buffer = self._acquisition_buffer
+        blocks, dropped = buffer.read()
+        if dropped:
+            self.add_stats('acq_dropped', dropped)
+        self.stats.update(buffer.get_stats())
+        # the energy includes readings that have been dropped
+        state = buffer.get_energy()
+        if state is not None:
+            self._data_lock.acquire()
+            try:
+                for index, integrator in enumerate(self._energy_integrators):
+                    integrator.set_state(state[index])
+                    self._update_energy(index)
+            finally:
+                self._data_lock.release()
+        if not blocks:
+            return
+        rows = np.concatenate(blocks)
+        channels = (rows.shape[1] - 2) // 4
+        ts, loadvoltage, current, power = [rows[:, 2 + n * channels:2 + (n + 1) * channels] for n in range(0, 4)]
+        ts = ts.astype(np.int64)
+        alerts = int(np.bitwise_or.reduce(rows[:, 1].astype(np.int64)))
+        sums = np.empty((4, channels))
+        sums[0] = len(rows)
+        sums[1] = loadvoltage.sum(axis=0)
+        sums[2] = current.sum(axis=0)
+        sums[3] = power.sum(axis=0)
+        self.process_readings(rows[:, 0], ts, loadvoltage, current, power, sums, [channel for channel in range(0, channels) if alerts & (1 << channel)])
+
+    # write the converted readings of the child process to the shared buffer
+    def _write_acquisition_buffer(self, t, ts, loadvoltage, current, power):
+        buffer = self._acquisition_buffer
+        alerts = np.zeros(len(t))
+        if self._capture and self._capture.trigger==CAPTURE_TRIGGER.CRITICAL_ALERT and len(t):
+            alerts[-1] = sum([1 << channel for channel in self._get_critical_alerts()])
+        if self._energy_read_time>=Sensor.ENERGY_MIN_READTIME:
+            self.integrate_block_energy(ts, current, power)
+            buffer.set_energy([integrator.get_state() for integrator in self._energy_integrators])
+        # the timestamps in nanoseconds are exact in float64 for an uptime of more than 100 days
+        buffer.extend(np.column_stack((t, alerts, ts, loadvoltage, current, power)))
+        buffer.set_stats(self.stats)
+        buffer.heartbeat()
+
+    # convert the raw values of the sensor block and update window stats, energy, GUI data and influxdb
+    def process_sensor_block(self):
+        self.flush_recording()
+        block = self._sensor_block
+        if len(block)==0:
+            return
+        self.add_stats('sensor', len(block) * block.enabled_channels())
+        if AppConfig.ina3221.sampling_mode==SAMPLING_MODE.INTERVAL:
+            self.stats.update(self._sample_scheduler.get_stats())
+        if not self._read_all:
+            # max. age of the values that have been used without reading the register
+            max_age = block.get_max_age()
+            self.stats.update({'vbus_age_ms': round(float(max_age[0].max()) * 1000, 3), 'vshunt_age_ms': round(float(max_age[1].max()) * 1000, 3)})
+        t, ts, loadvoltage, current, power, sums = block.convert(self._calibration)
+        if self._acquisition_child:
+            self._write_acquisition_buffer(t, ts, loadvoltage, current, power)
+            return
+        self.process_readings(t, ts, loadvoltage, current, power, sums)
+
+    # update window stats, energy, GUI data and influxdb with converted readings, see SensorBlock.convert()
+    #
+    # alerts        list of channels with the critical alert flag set, None to read the flags from the sensor
+    def process_readings(self, t, ts, loadvoltage, current, power, sums, alerts=None):
+        self.window_stats.add(t, np.stack((loadvoltage, current, power), axis=2))
+
+        # energy is integrated with all readings and the timestamps in nanoseconds
+        energy_t = t[-1]
+        energy_ts, energy_current, energy_power = ts, current, power
+        ts = ts / 1.0e9
+        plot_values = None
+        if self._decimator:
+            if self._capture:
+                self._process_capture(t, loadvoltage, current, power, alerts)
+            rows = np.column_stack((t, ts, loadvoltage, current, power))
+            if self._plot_decimator:
+                plot_values = self._decimate(self._plot_decimator, rows)
+            t, ts, loadvoltage, current, power, sums = self._decimate(self._decimator, rows)
+        if plot_values==None:
+            plot_values = (t, ts, loadvoltage, current, power, sums)
+
+        self._data_lock.acquire()
+        try:
+            # due to the resolution of the timestamp, energy can only be calculated precisely having an interval > 50ms
+            # precision will benefit from even longer intervals
+            if self._energy_read_time>=Sensor.ENERGY_MIN_READTIME:
+                # with a separate process the energy is integrated by the child process, see _read_acquisition_buffer()
+                if not self._acquisition_process:
+                    self.integrate_block_energy(energy_ts, energy_current, energy_power)
+                self.stats['energy_gaps'] = sum(integrator.gaps for integrator in self._energy_integrators)
+                self.stats['energy_gap_s'] = round(max(integrator.gap_time for integrator in self._energy_integrators) / 1.0e9, 3)
+                self.stats['energy_bridged_s'] = round(max(integrator.bridged_time for integrator in self._energy_integrators) / 1.0e9, 3)
+
+                if energy_t>self.energy['stored'] + min(30, AppConfig.store_energy_interval): # limited to >=30 seconds
+                    self.energy['stored'] = float(energy_t)
+                    self.db_store_energy()
+
+            if self.data!=None:
+                # time followed by U, I and P of each channel
+                plot_t, plot_ts, plot_loadvoltage, plot_current, plot_power, plot_sums = plot_values
+                self.data.extend(np.column_stack((plot_t, np.stack((plot_loadvoltage, plot_current, plot_power), axis=2).reshape(len(plot_t), -1))))
+
+        finally:
+            self._data_lock.release()
+
+        if self.influx_client:
+            channels = range(0, loadvoltage.shape[1])
+            for n in range(0, len(t)):
+                self.influxdb_push_data([(loadvoltage[n, index], current[n, index], power[n, index], ts[n, index]) for index in channels])
+
+        if self._gui and self._animation.mode==Animation.Mode.NONE:
+            self.debug(__name__, 'starting animation from sensor')
+            self._animation.schedule()
+
+    # check the trigger of the burst capture and pass a completed capture to the GUI, database and MQTT
+    def _process_capture(self, t, loadvoltage, current, power, alerts=None):
+        if self._capture.trigger==CAPTURE_TRIGGER.CRITICAL_ALERT and alerts==None:
+            alerts = self._get_critical_alerts()
+        trace = self._capture.add(t, loadvoltage, current, power, alerts)
+        if trace==None:
+            return
+        # the child process uses the time of the bus, which is the monotonic clock unless replaying
+        monotonic = self._acquisition_process and time.monotonic() or self.ina3221.monotonic()
+        timestamp = time.time() - (monotonic - trace.t)
+        self.add_stats('capture', 1)
+        self.info(__name__, 'capture channel %u: trigger=%s peak=%.4fA readings=%u duration=%.1fms', trace.channel + 1, trace.trigger.name, trace.peak_current, len(trace), trace.duration * 1000)
+        self.captures.append(trace)
+        self.db_store_capture(trace, timestamp)
+        self.mqtt_publish_capture(trace, timestamp)
+
+    # filter the full rate readings
+    #
+    # decimator     BoxcarDecimator or FirDecimator
+    # rows          time followed by the timestamps, U, I and P of each channel
+    #
+    # returns the same tuple as SensorBlock.convert()
+    def _decimate(self, decimator, rows):
+        channels = (rows.shape[1] - 1) // 4
+        rows = decimator.process(rows)
+        ts, loadvoltage, current, power = [rows[:, 1 + n * channels:1 + (n + 1) * channels] for n in range(0, 4)]
+        sums = np.empty((4, channels))
+        sums[0] = len(rows)
+        sums[1] = loadvoltage.sum(axis=0)
+        sums[2] = current.sum(axis=0)
+        sums[3] = power.sum(axis=0)
+        return (rows[:, 0], ts, loadvoltage, current, power, sums)
+
+    # integrate the energy of all channels
+    #
+    # ts, current, power    timestamps in nanoseconds and readings (n x channels)
+    def integrate_block_energy(self, ts, current, power):
+        # readings with a longer interval are a gap
+        if AppConfig.ina3221.sampling_mode==SAMPLING_MODE.CONVERSION_READY and not self._decimator:
+            diff_limit = self._cycle_time * 3
+        else:
+            diff_limit = self._read_period * 3
+        for index in range(0, len(AppConfig.channels)):
+            self.integrate_energy(index, ts[:, index], current[:, index], power[:, index], diff_limit)
+
+    # add the energy of consecutive readings of a channel
+    #
+    # index         channel number
+    # ts            timestamps of the readings in nanoseconds, 0 if the channel has not been read
+    # current       current in A
+    # power         power in W
+    # diff_limit    longer intervals are gaps that are added with energy.gap_policy
+    def integrate_energy(self, index, ts, current, power, diff_limit):
+        integrator = self._energy_integrators[index]
+        gap = integrator.add(ts, current, power, diff_limit)
+        if gap>diff_limit * 10:
+            self.error(__name__, 'sensor read timeout for channel number %u: %.3fs channels: %u read time: %.6fms', (index + 1), gap, len(self.channels), self._energy_read_time * 1000)
+        self._update_energy(index)
+
+    def _update_energy(self, index):
+        integrator = self._energy_integrators[index]
+        energy = self.energy[index]
+        energy['ei'] = integrator.ei
+        energy['ep'] = integrator.ep
+        energy['t'] = integrator.t
 
     def db_load_energy(self):
         try:
             self.reset_energy()
-            statement = 'SELECT channel_id, MAX(energy_Ah) AS ei, MAX(energy_Wh) as ep FROM energy GROUP BY channel_id ORDER BY updated_ts DESC,channel_id ASC LIMIT 3'
+            statement = 'SELECT channel_id, MAX(energy_Ah) AS ei, MAX(energy_Wh) as ep FROM energy GROUP BY channel_id ORDER BY updated_ts DESC,channel_id ASC LIMIT %u' % len(AppConfig.channels)
             cur = self._conn.cursor()
             tmp = { row[0]: { 'ei': row[1], 'ep': row[2], 't': 0 } for row in cur.execute(statement) }
             self.debug(__name__, 'loaded energy from database: %s' % tmp)
             self.energy.update(tmp)
+            for index, energy in tmp.items():
+                if index<len(self._energy_integrators):
+                    self._energy_integrators[index].reset(energy['ei'], energy['ep'])
 
         except Exception as e:
             self.error(__name__, 'failed to load energy: %s', e)
@@ -250,7 +864,7 @@ class Sensor(Mqtt.Mqtt):
         for channel, data in self.energy.items():
             if isinstance(data, dict):
                 values.append('(%u, %.16f, %.16f, %u)' % (channel, data['ei'], data['ep'], timestamp))
-        statement = 'INSERT INTO energy VALUES %s' % (','.join(values))
+        statement = 'INSERT OR REPLACE INTO energy VALUES %s' % (','.join(values))
         self.debug(__name__, statement)
         try:
             cur = self._conn.cursor()
@@ -266,174 +880,190 @@ class Sensor(Mqtt.Mqtt):
         except Exception as e:
             self.error(__name__, 'failed to store energy in database: %s: %s', statement, e)
 
-    def reset_avg(self):
-        self.averages = np.zeros((4, 3))
+    # timestamp     time of the trigger
+    def db_store_capture(self, trace, timestamp):
+        if not self._conn:
+            return
+        values = trace.values.copy()
+        values[:, 0] = trace.get_time()
+        try:
+            cur = self._conn.cursor()
+            cur.execute('INSERT INTO captures VALUES (?, ?, ?, ?, ?, ?)', (timestamp, trace.channel, trace.trigger.value, trace.peak_current, values.shape[1], values.astype(np.float32).tobytes()))
+            cur.execute('DELETE FROM captures WHERE rowid NOT IN (SELECT rowid FROM captures ORDER BY captured_ts DESC LIMIT %u)' % AppConfig.capture.max_stored)
+            self._conn.commit()
 
-    def _get_array_len(self):
-        min_l = len(self.values._t)
-        max_l = min_l
-        for index, channel in enumerate(self.channels):
-            min_l = min(min_l, len(self.values[index].U), len(self.values[index].I), len(self.values[index].P))
-            max_l = max(max_l, len(self.values[index].U), len(self.values[index].I), len(self.values[index].P))
-        return (min_l, max_l)
+        except Exception as e:
+            self.error(__name__, 'failed to store capture in database: %s', e)
 
-    def _validate_array_len(self, test_id):
-        min_l, max_l = self._get_array_len()
-        if min_l==max_l:
-            return
-        self.error(__name__, 'array length mismatch: id=%s min=%u max=%u', test_id, min_l, max_l)
+    # sliding windows of the readings for the labels, y limits and MQTT
+    def reset_window_stats(self):
+        self.window_stats = WindowStats((len(AppConfig.channels), 3))
+        self.window_stats.set_window('labels', max(1.0, AppConfig.plot.display_top_values_mean_time))
+        self.window_stats.set_window('mqtt', AppConfig.mqtt.update_interval)
 
     def aggregate_sensor_values(self):
         try:
             t = time.monotonic()
-            tmp = []
             self._data_lock.acquire()
             try:
-                tmp = copy.deepcopy(self.data)
-                self.reset_data()
+                views, dropped = self.data.read()
+                # the views point into the ring buffer and are valid until the sensor thread has added DATA_BUFFER_SIZE readings
+                for view in views:
+                    self.values.append(view, self.channels)
             finally:
                 self._data_lock.release()
 
-            n = len(tmp[0])
+            if dropped:
+                self.add_stats('data_dropped', dropped)
+            n = sum([len(view) for view in views])
             if n==0:
                 return
 
             self.compressed_min_records += n
-            self.values.time().extend(tmp[0])
-            for channel in self.channels:
-                ch = int(channel)
-                tmp2 = tmp[1][ch]
-                self.values[channel].U.extend(tmp2[0])
-                self.values[channel].I.extend(tmp2[1])
-                self.values[channel].P.extend(tmp2[2])
 
             if t>=self._compress_data_timeout:
                 self._compress_data_timeout = t + 5
                 self._scheduler.enter(1.0, Enums.SCHEDULER_PRIO.COMPRESS_DATA, self.compress_values)
 
-            min_l, max_l = self._get_array_len()
-            if min_l!=max_l:
-                if min_l==0:
-                    return
-
-                tmp = {'t': len(self.values._t)}
-                self.values._t = self.values._t[0:min_l]
-                for index, channel in enumerate(self.channels):
-                    tmp[index] = {
-                        'U': len(self.values[index].U),
-                        'I': len(self.values[index].I),
-                        'P': len(self.values[index].P),
-                    }
-                    self.values[index].U = self.values[index].U[0:min_l]
-                    self.values[index].I = self.values[index].I[0:min_l]
-                    self.values[index].P = self.values[index].P[0:min_l]
-
             return True
         except Exception as e:
             AppConfig._debug_exception(e)
 
-    def min_max_downsample(self, x, y, num_bins, do_x=True):
-        pts_per_bin = y.size // num_bins
-
-        if do_x:
-            x_view = x.reshape(num_bins, pts_per_bin)
-        y_view = y.reshape(num_bins, pts_per_bin)
-        i_min = np.argmin(y_view, axis=1)
-        i_max = np.argmax(y_view, axis=1)
+    # returns the allocated bytes of the plot values and sensor buffers and the bytes of the plot values
+    def get_memory_usage(self):
+        history = self.values.nbytes
+        used = history
+        for buffer in (self.data, self._acquisition_buffer, self._capture):
+            if buffer!=None:
+                used += buffer.nbytes
+        return (used, history)
+
+    # raise the retention level if the memory usage is getting close to the budget, see RetentionManager
+    #
+    # the compressed values are only modified by the main thread and can be read without lock
+    def apply_retention(self):
+        if self._retention==None:
+            config = AppConfig.plot.compression
+            self._retention = RetentionManager(AppConfig.retention.memory_budget, (config.voltage, config.current, config.power))
+            used, history = self.get_memory_usage()
+            if used - history>=self._retention.budget:
+                self.warning(__name__, 'sensor buffers use %u KB, retention.memory_budget=%u KB', (used - history) // 1024, self._retention.budget // 1024)
+        retention = self._retention
+        values = self.values
+
+        used, history = self.get_memory_usage()
+        if retention.update(used)!=Enums.RETENTION_LEVEL.NORMAL:
+            # release the memory of removed rows before reducing the values
+            self._data_lock.acquire()
+            try:
+                values.compact()
+            finally:
+                self._data_lock.release()
+            used, history = self.get_memory_usage()
+
+        level = retention.update(used)
+        if level.value>=Enums.RETENTION_LEVEL.REDUCE.value:
+            items_t, items = values.get_compressed()
+            result = retention.reduce(items_t, items)
+            if result!=None:
+                n, reduced_t, reduced_values = result
+                self._data_lock.acquire()
+                try:
+                    values.reduce(n, reduced_t, reduced_values)
+                finally:
+                    self._data_lock.release()
+                self.add_stats('mem_reduced', n - len(reduced_t))
+                used, history = self.get_memory_usage()
 
-        r_index = np.repeat(np.arange(num_bins), 2)
-        c_index = np.sort(np.stack((i_min, i_max), axis=1)).ravel()
+        if level==Enums.RETENTION_LEVEL.TRIM:
+            n = retention.get_trim_rows(used, history, len(values))
+            if n:
+                self._data_lock.acquire()
+                try:
+                    values.trim(n)
+                    values.compact()
+                finally:
+                    self._data_lock.release()
+                self.add_stats('mem_trimmed', n)
+                used, history = self.get_memory_usage()
 
-        if do_x:
-            return x_view[r_index, c_index]
-        return y_view[r_index, c_index]
+        self.debug(__name__, 'retention level=%s used=%u history=%u budget=%u', level.name, used, history, retention.budget)
+        self.stats['mem_kb'] = used // 1024
+        self.stats['mem_plot_kb'] = history // 1024
+        self.stats['mem_pct'] = round(retention.get_usage(used) * 100, 1)
+        self.stats['mem_level'] = level.name
 
     def compress_values(self):
 
         try:
-            t = time.monotonic()
+            values = self.values
 
             # remove old data
-            diff_t = self.values.timeframe()
+            diff_t = values.timeframe()
             if diff_t>AppConfig.plot.max_time:
-                idx = self.values.find_time_index(AppConfig.plot.max_time)
-                # self.debug(__name__, 'discard 0:%u' % (idx + 1))
-                # discard from all lists
-                self._plot_lock.acquire()
+                idx = values.find_time_index(AppConfig.plot.max_time)
                 self._data_lock.acquire()
                 try:
-
-                    for type, ch, items in self.values.all():
-                        self.values.set_items(type, ch, items[idx + 1:])
+                    values.trim(idx + 1)
                 finally:
                     self._data_lock.release()
-                    self._plot_lock.release()
-
 
-            # compress data if min records have been added
-            if self.compressed_min_records<AppConfig.plot.compression.min_records:
+            if self._compress_plot_values() or not AppConfig.retention.memory_budget:
                 return
 
-            start_idx = self.values.find_time_index(self.compressed_ts, True)
-            if start_idx==None:
-                return
-            end_idx = self.values.find_time_index(AppConfig.plot.compression.uncompressed_time)
-            if end_idx==None:
-                return
-            values_per_second = AppConfig.plot.max_values / float(AppConfig.plot.max_time)
-            count = end_idx - start_idx
-            timeframe = self.values.timeframe(start_idx, end_idx)
-            groups = timeframe * values_per_second
-            if groups==0:
-                return
-            # split data into groups of group_size
-            group_size = int(count / groups)
-            if group_size>=4 and count>group_size*2:
-                # find even count
-                while count % group_size != 0:
-                    count -= 1
-                    end_idx -= 1
-                n = count / group_size
-
-                self.debug(__name__, 'compress group_size=%u data=%u:%u cnt=%u vps=%.2f total=%u' % (group_size, start_idx, end_idx, count, values_per_second, len(self.values._t)))
-
-                old_timestamp = self.compressed_ts
-                # store timestamp
-                self.compressed_ts = self.values.time()[end_idx]
-                self.compressed_min_records = 0
-
-                before = len(self.values._t)
-
-                self._plot_lock.acquire()
-                self._data_lock.acquire()
-                try:
-
-                    # split array into 3 array and one of them into groups and generate mean values for each group concatenation the flattened result
-                    for type, ch, items in self.values.all():
-
-                        self.add_stats('ud', len(items))
+            # keep the memory usage within the budget after the values have been compressed
+            self.apply_retention()
 
-                        items = np.array_split(items[:], [start_idx, end_idx])
-                        items[1] = np.array(items[1])
-                        # from scipy import signal
-                        # n = group_size // 2 ** 2
-                        # signal.resample(items[1].tolist, 6000)
-                        items[1] = self.min_max_downsample(items[1], items[1], group_size, type=='t')
-                        items[1] = np.array(items[1]).reshape(-1, group_size).mean(axis=0)
-                        # tmp = np.array(items).ravel().tolist()
-                        tmp = np.concatenate(np.array(items, dtype=object).flatten()).tolist()
-                        self.values.set_items(type, ch, tmp)
+        except Exception as e:
+            AppConfig._debug_exception(e)
 
-                        self.add_stats('cd', len(tmp))
+    # compress the next chunk of the plot values
+    #
+    # returns True if another chunk has been scheduled
+    def _compress_plot_values(self):
+        t = time.monotonic()
+        values = self.values
 
-                finally:
-                    self._data_lock.release()
-                    self._plot_lock.release()
+        # values are compressed earlier if the memory usage is getting close to the budget
+        uncompressed_time = AppConfig.plot.compression.uncompressed_time
+        if self._retention!=None:
+            uncompressed_time = self._retention.get_uncompressed_time(uncompressed_time)
 
-                diff = time.monotonic() - t
+        # compress data if min records have been added
+        if self.compressed_min_records<AppConfig.plot.compression.min_records and uncompressed_time==AppConfig.plot.compression.uncompressed_time:
+            return False
 
-                self.add_stats('cr', before - len(self.values._t))
-                self.add_stats('ct', diff)
+        # the views of the uncompressed values are not modified by appending new values
+        self._data_lock.acquire()
+        try:
+            time_limit = values.max_time() - uncompressed_time
+            items_t, items = values.get_uncompressed(time_limit)
+        finally:
+            self._data_lock.release()
+
+        # each interval is reduced to 2 values
+        if self._plot_downsampler==None:
+            config = AppConfig.plot.compression
+            self._plot_downsampler = StreamingDownsampler(AppConfig.plot.max_time * 2.0 / AppConfig.plot.max_values, Sensor.COMPRESS_CHUNK_SIZE, (config.voltage, config.current, config.power))
+        result = self._plot_downsampler.process(items_t, items, time_limit)
+        if result==None:
+            return False
+        n, compressed_t, compressed_values = result
 
-        except Exception as e:
-            AppConfig._debug_exception(e)
+        self._data_lock.acquire()
+        try:
+            values.compress(n, compressed_t, compressed_values)
+        finally:
+            self._data_lock.release()
+
+        self.debug(__name__, 'compress rows=%u buckets=%u compressed=%u total=%u', n, len(compressed_t), values.compressed_len(), len(values))
+        self.add_stats('cd', len(compressed_t))
+        self.add_stats('cr', n - len(compressed_t))
+        self.add_stats('ct', time.monotonic() - t)
+
+        if n<len(items_t):
+            # continue with the next chunk
+            self._scheduler.enter(0.1, Enums.SCHEDULER_PRIO.COMPRESS_DATA, self.compress_values)
+            return True
+        self.compressed_min_records = 0
+        return False
@@ -0,0 +1,153 @@
+#
+# Author: sascha_lammers@gmx.de
+#
+
+from SDL_Pi_INA3221.Calibration import Calibration as InaCalibration
+import numpy as np
+
+# block of raw sensor readings that is converted with the channel calibration in a single pass
+#
+# the raw register values are stored as int16 per read cycle and channel, channels that have not been read are 0. the
+# timestamps of the channels are integer nanoseconds of the bus, see INA3221.monotonic_ns()
+#
+# registers that are not read every cycle hold the last value. the max. age of the held values is tracked per channel.
+# after the sensor has been initialized the held values are invalid until the register has been read after the first
+# conversion has been completed
+class SensorBlock(object):
+
+    # capacity      max. number of read cycles
+    # channels      number of channels
+    def __init__(self, capacity, channels):
+        self._capacity = capacity
+        self._channels = channels
+        self._t = np.zeros(capacity, dtype=np.float64)
+        self._ts = np.zeros((capacity, channels), dtype=np.int64)
+        self._vbus = np.zeros((capacity, channels), dtype=np.int16)
+        self._vshunt = np.zeros((capacity, channels), dtype=np.int16)
+        self._enabled = np.zeros(channels, dtype=bool)
+        # last values of vbus and vshunt, the time they have been read and the max. age when used
+        self._held = np.zeros((2, channels), dtype=np.int16)
+        self._read_ts = np.zeros((2, channels), dtype=np.int64)
+        self._max_age = np.zeros((2, channels), dtype=np.int64)
+        self._valid = np.zeros((2, channels), dtype=bool)
+        self._valid_ts = 0
+        self._count = 0
+        self._row_started = False
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    def full(self):
+        return self._count>=self._capacity
+
+    # time of the first read cycle
+    def start_time(self):
+        if self._count==0:
+            return None
+        return self._t[0]
+
+    # number of channels that have been read
+    def enabled_channels(self):
+        return int(np.count_nonzero(self._enabled))
+
+    def clear(self):
+        # including the incomplete row
+        n = min(self._capacity, self._count + 1)
+        self._ts[0:n] = 0
+        self._vbus[0:n] = 0
+        self._vshunt[0:n] = 0
+        self._enabled[:] = False
+        self._count = 0
+        self._row_started = False
+
+    # add raw values to the current read cycle. a read cycle can be filled by multiple devices
+    #
+    # t             time of the read cycle, the time of the first update is used
+    # channels      list of channel numbers
+    # values        list of (vbus_raw, vshunt_raw, ts) for each channel, see INA3221.read_channels_raw(). None for
+    #               registers that have not been read
+    # ts            timestamp in nanoseconds for all channels instead of the timestamp of the values
+    def update(self, t, channels, values, ts=None):
+        n = self._count
+        if not self._row_started:
+            self._row_started = True
+            self._t[n] = t
+        for channel, (vbus_raw, vshunt_raw, channel_ts) in zip(channels, values):
+            channel_ts = ts==None and channel_ts or ts
+            self._vbus[n, channel] = self._hold(0, channel, vbus_raw, channel_ts)
+            self._vshunt[n, channel] = self._hold(1, channel, vshunt_raw, channel_ts)
+            self._ts[n, channel] = channel_ts
+            self._enabled[channel] = True
+
+    # returns the value or the last value of the register if it has not been read
+    def _hold(self, index, channel, value, ts):
+        if value==None:
+            self._max_age[index, channel] = max(self._max_age[index, channel], ts - self._read_ts[index, channel])
+            return self._held[index, channel]
+        self._held[index, channel] = value
+        self._read_ts[index, channel] = ts
+        if ts>=self._valid_ts:
+            self._valid[index, channel] = True
+        return value
+
+    # invalidate the held values after the sensor has been initialized
+    #
+    # valid_ts      time in nanoseconds when the first conversion has been completed
+    def invalidate_held(self, valid_ts):
+        self._valid[:] = False
+        self._valid_ts = valid_ts
+
+    # returns True if the held value of vbus (index=0) or vshunt (index=1) can be used instead of reading the register
+    def is_held_valid(self, index, channel):
+        return self._valid[index, channel]
+
+    # returns the max. age of the held vbus and vshunt values (2 x channels) in seconds since the last call
+    def get_max_age(self):
+        max_age = self._max_age / 1.0e9
+        self._max_age[:] = 0
+        return max_age
+
+    # complete the current read cycle
+    def next_row(self):
+        if self._row_started:
+            self._row_started = False
+            self._count += 1
+
+    # add the raw values of a complete read cycle
+    def append(self, t, channels, values, ts=None):
+        self.update(t, channels, values, ts)
+        self.next_row()
+
+    # convert the raw values with the channel calibration and clear the block
+    #
+    # calibration   channel number to AppConfig.Calibration
+    #
+    # returns a tuple of time (n), timestamps in nanoseconds, load voltage, current, power (n x channels) and the sums of
+    # the read cycles, load voltage, current and power (4 x channels)
+    def convert(self, calibration):
+        n = self._count
+        channels = range(0, self._channels)
+        vbus_mul = np.array([calibration[channel]._multipliers['V'] for channel in channels])
+        current_mul = np.array([calibration[channel]._multipliers['A'] for channel in channels])
+        raw_offset = np.array([calibration[channel].vshunt_raw_offset for channel in channels], dtype=np.float64)
+
+        vbus_raw = self._vbus[0:n]
+        vshunt_raw = self._vshunt[0:n]
+        busvoltage = vbus_raw * vbus_mul
+        current = (vshunt_raw + raw_offset) * (current_mul * self._enabled)
+        loadvoltage = busvoltage - vshunt_raw * InaCalibration.RAW_VSHUNT_TO_VOLT
+        power = current * busvoltage
+
+        sums = np.empty((4, self._channels))
+        sums[0] = n
+        sums[1] = loadvoltage.sum(axis=0)
+        sums[2] = current.sum(axis=0)
+        sums[3] = power.sum(axis=0)
+
+        result = (self._t[0:n].copy(), self._ts[0:n].copy(), loadvoltage, current, power, sums)
+        self.clear()
+        return result
@@ -0,0 +1,160 @@
+#
+# Author: sascha_lammers@gmx.de
+#
+
+from .RingBuffer import RingBuffer
+from multiprocessing import shared_memory
+import numpy as np
+import time
+
+# ring buffer in shared memory for a writer and a reader in different processes
+#
+# the header contains the write position, the heartbeat and the quit flag of the writer, a copy of its stats and the
+# state of the energy integrators. the read position is local to the reader
+#
+# the writer copies the rows into the buffer and publishes them with a single aligned int64 store of the new write
+# position, see RingBuffer.extend(). the reader loads the write position once, copies the rows and loads it again to
+# drop the rows that have been overwritten while copying. the energy is written with a sequence number that is odd
+# while the writer updates it, the reader retries until it gets a consistent copy
+#
+# CPython has no memory barriers. the protocol relies on the stores of the writer becoming visible to the reader in
+# program order, which x86 guarantees. on weakly ordered CPUs like ARM, the write position might become visible shortly
+# before the last rows. the reader polls once per sensor block, a row read too early contains the values that have been
+# written capacity rows before
+#
+# the buffer is created before forking the writer and the mapping is inherited by the child process. the name is
+# removed after creating the shared memory and it is released when both processes have ended
+class SharedRingBuffer(RingBuffer):
+
+    # write position, heartbeat in ns, quit flag and the sequence number of the energy
+    HEADER_SIZE = 4
+    # max. number of attempts to read the energy while the writer updates it
+    ENERGY_RETRIES = 1000
+    # stats of the writer that are passed to the reader
+    STATS = (
+        'sensor', 'senerr', 'cvrf', 'cvrf_miss', 'cvrf_dup', 'late_avg_us', 'late_max_us', 'jitter_rms_us', 'jitter_max_us',
+        'overruns', 'skipped', 'vbus_age_ms', 'vshunt_age_ms'
+    )
+
+    # capacity      max. number of rows
+    # columns       number of columns per row
+    # energy_shape  shape of the energy state, see set_energy()
+    def __init__(self, capacity, columns, energy_shape=(0,)):
+        stats_offset = SharedRingBuffer.HEADER_SIZE * 8
+        energy_offset = stats_offset + len(SharedRingBuffer.STATS) * 8
+        buffer_offset = energy_offset + int(np.prod(energy_shape)) * 8
+        self._shm = shared_memory.SharedMemory(create=True, size=buffer_offset + capacity * columns * 8)
+        self._shm.unlink()
+        self._header = np.ndarray((SharedRingBuffer.HEADER_SIZE,), dtype=np.int64, buffer=self._shm.buf)
+        self._stats = np.ndarray((len(SharedRingBuffer.STATS),), dtype=np.float64, buffer=self._shm.buf,
+            offset=stats_offset)
+        self._energy = np.ndarray(energy_shape, dtype=np.float64, buffer=self._shm.buf, offset=energy_offset)
+        self._capacity = capacity
+        self._buffer = np.ndarray((capacity, columns), dtype=np.float64, buffer=self._shm.buf, offset=buffer_offset)
+        self._header[:] = 0
+        self._stats[:] = np.nan
+        self._read = 0
+
+    @property
+    def _write(self):
+        return int(self._header[0])
+
+    # the header is at the start of the shared memory, the write position is stored with a single aligned store
+    @_write.setter
+    def _write(self, value):
+        self._header[0] = value
+
+    # size of the shared memory
+    @property
+    def nbytes(self):
+        return self._shm.size
+
+    def close(self):
+        self._header = None
+        self._stats = None
+        self._energy = None
+        self._buffer = None
+        self._shm.close()
+
+    # called by the writer to show that it is alive
+    def heartbeat(self):
+        self._header[1] = time.monotonic_ns()
+
+    # seconds since the last heartbeat, None if the writer has not started yet
+    def get_heartbeat_age(self):
+        heartbeat = int(self._header[1])
+        if heartbeat==0:
+            return None
+        return (time.monotonic_ns() - heartbeat) / 1.0e9
+
+    # request the writer to quit
+    def quit(self):
+        self._header[2] = 1
+
+    def is_quit(self):
+        return self._header[2]!=0
+
+    # restart with an empty buffer, the reader and writer must not be active
+    def reset(self):
+        self._header[:] = 0
+        self._stats[:] = np.nan
+        self._read = 0
+
+    # called by the writer to pass the state of the energy integrators
+    def set_energy(self, state):
+        self._header[3] += 1
+        self._energy[:] = state
+        self._header[3] += 1
+
+    # returns a copy of the state of the energy integrators or None if the writer has not set it yet. if the writer has
+    # been stopped while updating the state, None is returned as well
+    def get_energy(self):
+        for retry in range(0, SharedRingBuffer.ENERGY_RETRIES):
+            sequence = int(self._header[3])
+            if sequence==0:
+                return None
+            if sequence & 1:
+                time.sleep(0)
+                continue
+            state = self._energy.copy()
+            if int(self._header[3])==sequence:
+                return state
+        return None
+
+    # copy the stats of the writer
+    def set_stats(self, stats):
+        for index, name in enumerate(SharedRingBuffer.STATS):
+            if name in stats:
+                self._stats[index] = stats[name]
+
+    # returns the stats of the writer
+    def get_stats(self):
+        stats = {}
+        for name, value in zip(SharedRingBuffer.STATS, self._stats):
+            if np.isnan(value):
+                continue
+            if value.is_integer():
+                stats[name] = int(value)
+            else:
+                stats[name] = float(value)
+        return stats
+
+    # returns a list of copies of the rows since the last read and the number of rows that have been dropped
+    def read(self):
+        start = self._read
+        end = self._write
+        dropped = 0
+        if end - start>self._capacity:
+            dropped = end - start - self._capacity
+            start = end - self._capacity
+        self._read = end
+        if end==start:
+            return ([], dropped)
+        rows = self._buffer.take(np.arange(start, end) % self._capacity, axis=0)
+        # the writer may have overwritten the oldest rows while copying
+        overwritten = self._write - self._capacity - start
+        if overwritten>0:
+            overwritten = min(overwritten, len(rows))
+            rows = rows[overwritten:]
+            dropped += overwritten
+        return ([rows], dropped)
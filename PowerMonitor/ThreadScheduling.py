@@ -0,0 +1,79 @@
+#
+# Author: sascha_lammers@gmx.de
+#
+
+# CPU affinity and scheduling policy of threads
+#
+# on Linux the affinity, nice level and policy are per thread. pid 0 refers to the calling thread and new threads
+# inherit the settings of the thread that creates them
+
+from .Enums import THREAD_POLICY
+import threading
+import os
+
+# returns the CPUs available to the calling thread or None if not supported
+def get_cpus():
+    if not hasattr(os, 'sched_getaffinity'):
+        return None
+    return os.sched_getaffinity(0)
+
+# returns a list of the native thread ids of the process
+def get_thread_ids():
+    try:
+        return [int(tid) for tid in os.listdir('/proc/self/task')]
+    except OSError:
+        return []
+
+# pin the calling thread to cpus
+#
+# cpus          set of CPU numbers
+# isolate       move the other threads of the process to the remaining CPUs
+#
+# returns the set of CPUs of the other threads or None if they have not been moved
+def set_thread_affinity(cpus, isolate=False):
+    if not hasattr(os, 'sched_setaffinity'):
+        raise OSError('CPU affinity not supported on %s' % os.name)
+    # the calling thread may have been moved off the CPUs already
+    available = set(range(0, os.cpu_count()))
+    if not cpus or not cpus.issubset(available):
+        raise ValueError('invalid CPUs %s, available %s' % (sorted(cpus), sorted(available)))
+    others = None
+    if isolate:
+        others = move_threads(cpus, threading.get_native_id())
+    os.sched_setaffinity(0, cpus)
+    return others
+
+# move the threads of the process to the CPUs that are not in cpus
+#
+# exclude       native id of a thread that is not moved
+#
+# returns the set of CPUs of the threads
+def move_threads(cpus, exclude=None):
+    if not hasattr(os, 'sched_setaffinity'):
+        raise OSError('CPU affinity not supported on %s' % os.name)
+    others = os.sched_getaffinity(0) - cpus
+    if not others:
+        raise ValueError('no CPU left for the other threads')
+    for tid in get_thread_ids():
+        if tid!=exclude:
+            try:
+                os.sched_setaffinity(tid, others)
+            except OSError:
+                # the thread has ended
+                pass
+    return others
+
+# set the scheduling policy of the calling thread
+#
+# policy        THREAD_POLICY
+# priority      real-time priority for FIFO and RR
+# nice          nice level for OTHER, None to keep it
+def set_thread_policy(policy, priority, nice=None):
+    if policy==THREAD_POLICY.OTHER:
+        if nice!=None:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), nice)
+        return
+    if not hasattr(os, 'sched_setscheduler'):
+        raise OSError('scheduling policy not supported on %s' % os.name)
+    value = policy==THREAD_POLICY.FIFO and os.SCHED_FIFO or os.SCHED_RR
+    os.sched_setscheduler(0, value, os.sched_param(priority))
@@ -0,0 +1,148 @@
+#
+# Author: sascha_lammers@gmx.de
+#
+
+from collections import (deque, namedtuple)
+import threading
+import numpy as np
+
+# mean, min., max. and number of values of a window. timeframe is the time that is covered by the values, it is shorter
+# than the length of the window until the window has been filled
+WindowSnapshot = namedtuple('WindowSnapshot', ['mean', 'min', 'max', 'count', 'timeframe'])
+
+# sliding window with sum, min., max. and count of multiple columns
+#
+# the values are combined into slots of 1/SLOTS of the length of the window. the sum and count are updated when slots
+# are added and removed, min. and max. are the first item of a monotonic deque per column. the slot that is currently
+# filled is included in the results
+class SlidingWindow(object):
+
+    SLOTS = 64
+
+    def __init__(self, length, columns):
+        self.length = length
+        self._resolution = length / SlidingWindow.SLOTS
+        self._columns = columns
+        self.clear()
+
+    def clear(self):
+        self._slots = deque()
+        self._min = [deque() for column in range(0, self._columns)]
+        self._max = [deque() for column in range(0, self._columns)]
+        self._sum = np.zeros(self._columns)
+        self._count = 0
+        self._pushed = 0
+        # slot number, sum, min., max. and count of the slot that is filled
+        self._open = None
+        self._first_time = None
+        self._last_time = None
+
+    # t             time of the rows
+    # values        array with the shape (n, columns)
+    def add(self, t, values):
+        slots = np.floor(t / self._resolution).astype(np.int64)
+        starts = np.flatnonzero(np.concatenate(([True], slots[1:]!=slots[:-1])))
+        sums = np.add.reduceat(values, starts, axis=0, dtype=np.float64)
+        mins = np.minimum.reduceat(values, starts, axis=0)
+        maxs = np.maximum.reduceat(values, starts, axis=0)
+        counts = np.diff(np.append(starts, len(t)))
+        for index, start in enumerate(starts):
+            slot = int(slots[start])
+            if self._open!=None and self._open[0]==slot:
+                self._open[1] += sums[index]
+                self._open[2] = np.minimum(self._open[2], mins[index])
+                self._open[3] = np.maximum(self._open[3], maxs[index])
+                self._open[4] += counts[index]
+                continue
+            if self._open!=None:
+                self._push(*self._open)
+            self._open = [slot, sums[index], mins[index], maxs[index], int(counts[index])]
+        self._expire(int(slots[-1]) - SlidingWindow.SLOTS + 1)
+        if self._first_time==None:
+            self._first_time = float(t[0])
+        self._last_time = float(t[-1])
+
+    def _push(self, slot, vsum, vmin, vmax, count):
+        self._slots.append((slot, vsum, count))
+        self._sum += vsum
+        self._count += count
+        for column in range(0, self._columns):
+            queue = self._min[column]
+            value = vmin[column]
+            while queue and queue[-1][1]>=value:
+                queue.pop()
+            queue.append((slot, value))
+            queue = self._max[column]
+            value = vmax[column]
+            while queue and queue[-1][1]<=value:
+                queue.pop()
+            queue.append((slot, value))
+        # the sum is calculated again once per window to avoid accumulating rounding errors
+        self._pushed += 1
+        if self._pushed>=SlidingWindow.SLOTS:
+            self._pushed = 0
+            self._sum = np.sum([item[1] for item in self._slots], axis=0)
+
+    # remove the slots before first
+    def _expire(self, first):
+        while self._slots and self._slots[0][0]<first:
+            slot, vsum, count = self._slots.popleft()
+            self._sum -= vsum
+            self._count -= count
+        for queue in self._min + self._max:
+            while queue and queue[0][0]<first:
+                queue.popleft()
+
+    def get(self):
+        if self._open==None:
+            return None
+        vsum = self._sum + self._open[1]
+        count = self._count + self._open[4]
+        vmin = np.array([queue[0][1] if queue else np.inf for queue in self._min])
+        vmax = np.array([queue[0][1] if queue else -np.inf for queue in self._max])
+        return WindowSnapshot(mean=vsum / count, min=np.minimum(vmin, self._open[2]), max=np.maximum(vmax, self._open[3]), count=count, timeframe=min(self.length, self._last_time - self._first_time))
+
+# sliding window statistics of the readings for multiple named windows
+#
+# the windows are updated by the sensor thread and read by the GUI and MQTT threads
+class WindowStats(object):
+
+    # shape         shape of the values of a row
+    def __init__(self, shape):
+        self._shape = tuple(shape)
+        self._columns = int(np.prod(self._shape))
+        self._lock = threading.Lock()
+        self._windows = {}
+
+    # add a window or change its length
+    def set_window(self, name, length):
+        with self._lock:
+            window = self._windows.get(name)
+            if window==None or window.length!=length:
+                self._windows[name] = SlidingWindow(length, self._columns)
+
+    def has_window(self, name):
+        return name in self._windows
+
+    def remove_window(self, name):
+        with self._lock:
+            self._windows.pop(name, None)
+
+    # t             time of the rows
+    # values        array with the shape (n, shape)
+    def add(self, t, values):
+        if len(t)==0:
+            return
+        values = values.reshape(len(t), self._columns)
+        with self._lock:
+            for window in self._windows.values():
+                window.add(t, values)
+
+    # returns a WindowSnapshot with arrays of shape or None if the window has no values
+    def get(self, name):
+        with self._lock:
+            window = self._windows.get(name)
+            snapshot = window and window.get()
+        if snapshot==None:
+            return None
+        return snapshot._replace(mean=snapshot.mean.reshape(self._shape), min=snapshot.min.reshape(self._shape), max=snapshot.max.reshape(self._shape))
@@ -10,6 +10,6 @@ from . import FormatFloat
 from .AppConfig import (Channels, ChannelCalibration)
 from .GuiConfig import GuiConfig
 from .Config import Config
-from .Enums import (PLOT_PRIMARY_DISPLAY, DISPLAY_ENERGY, PLOT_VISIBILITY, SCHEDULER_PRIO, KEY_BINDINGS)
+from .Enums import (PLOT_PRIMARY_DISPLAY, DISPLAY_ENERGY, PLOT_VISIBILITY, SCHEDULER_PRIO, KEY_BINDINGS, SAMPLING_MODE, OVERRUN_POLICY, THREAD_POLICY, CAPTURE_TRIGGER, DECIMATION_FILTER, ENERGY_GAP_POLICY, DOWNSAMPLING_MODE, RETENTION_LEVEL)
 from .Animation import Animation
 from . import (BaseApp, Idle, Influxdb, Mqtt, Sensor, Plot, MainApp, Gui)
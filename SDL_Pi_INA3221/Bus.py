@@ -0,0 +1,194 @@
+#
+# Author: sascha_lammers@gmx.de
+#
+
+# I2C bus backends for the INA3221 driver
+#
+# read_registers() returns the raw register contents as bytes in bus order (MSB first), 2 bytes per register
+
+from enum import Enum
+import ctypes
+import errno
+import struct
+import sys
+import os
+import time
+try:
+    import fcntl
+except:
+    fcntl = None
+try:
+    import smbus
+except:
+    if 'win' in sys.platform:
+        # dummy class
+        class smbus:
+            class SMBus:
+                def __init__(self, twi):
+                    pass
+                def write_word_data(self, addr, register, switchdata):
+                    pass
+                def read_word_data(self, addr, register):
+                    return 0
+                def close(self):
+                    pass
+
+class BUS_BACKEND(Enum):
+    SMBUS = 0               # smbus module, one transaction per register
+    I2C_RDWR = 1            # combined I2C_RDWR messages, all registers in a single ioctl()
+    SIMULATED = 2           # in-memory register model, see Simulator.SimulatedBus
+
+class BusBackend(object):
+
+    # True if the bus controls the timing of the reads, i.e. replaying a recording
+    paced = False
+
+    # clock used for the timestamps of the readings
+    def monotonic(self):
+        return time.monotonic()
+
+    # same clock in integer nanoseconds
+    def monotonic_ns(self):
+        return time.monotonic_ns()
+
+    def close(self):
+        pass
+
+    # write buffered data, i.e. of a recording
+    def flush(self):
+        pass
+
+class SMBusBackend(BusBackend):
+
+    def __init__(self, twi=1):
+        self._bus = smbus.SMBus(twi)
+
+    def close(self):
+        self._bus.close()
+
+    def read_byte_data(self, addr, register):
+        return self._bus.read_byte_data(addr, register)
+
+    def write_byte_data(self, addr, register, data):
+        self._bus.write_byte_data(addr, register, data)
+
+    def read_word_data(self, addr, register):
+        return self._bus.read_word_data(addr, register)
+
+    def write_word_data(self, addr, register, data):
+        self._bus.write_word_data(addr, register, data)
+
+    def read_registers(self, addr, registers):
+        # the word is little endian, packing it as such restores the bus order
+        return b''.join([struct.pack('<H', self._bus.read_word_data(addr, register) & 0xffff) for register in registers])
+
+# linux/i2c.h and linux/i2c-dev.h
+class I2C_MSG(ctypes.Structure):
+    _fields_ = [
+        ('addr', ctypes.c_uint16),
+        ('flags', ctypes.c_uint16),
+        ('len', ctypes.c_uint16),
+        ('buf', ctypes.POINTER(ctypes.c_uint8))
+    ]
+
+class I2C_RDWR_IOCTL_DATA(ctypes.Structure):
+    _fields_ = [
+        ('msgs', ctypes.POINTER(I2C_MSG)),
+        ('nmsgs', ctypes.c_uint32)
+    ]
+
+class I2CRdwrBackend(BusBackend):
+
+    I2C_FUNCS = 0x0705
+    I2C_RDWR = 0x0707
+    I2C_FUNC_I2C = 0x00000001
+    I2C_M_RD = 0x0001
+    I2C_RDWR_IOCTL_MAX_MSGS = 42
+
+    # if the adapter does not support combined messages, the backend falls back to SMBusBackend
+    def __init__(self, twi=1):
+        self._fd = None
+        self._fallback = None
+        self._twi = twi
+        if fcntl==None:
+            self._fallback = SMBusBackend(twi)
+            return
+        self._fd = os.open('/dev/i2c-%u' % twi, os.O_RDWR)
+        funcs = ctypes.c_ulong()
+        fcntl.ioctl(self._fd, I2CRdwrBackend.I2C_FUNCS, funcs)
+        if not funcs.value & I2CRdwrBackend.I2C_FUNC_I2C:
+            self._set_fallback()
+
+    @property
+    def combined(self):
+        return self._fallback==None
+
+    def _set_fallback(self):
+        self.close()
+        self._fallback = SMBusBackend(self._twi)
+
+    def close(self):
+        if self._fd!=None:
+            os.close(self._fd)
+            self._fd = None
+        if self._fallback:
+            self._fallback.close()
+
+    def _transfer(self, msgs):
+        data = I2C_RDWR_IOCTL_DATA(msgs=ctypes.cast(msgs, ctypes.POINTER(I2C_MSG)), nmsgs=len(msgs))
+        fcntl.ioctl(self._fd, I2CRdwrBackend.I2C_RDWR, data)
+
+    def read_word_data(self, addr, register):
+        return struct.unpack('<H', self.read_registers(addr, (register,)))[0]
+
+    def write_word_data(self, addr, register, data):
+        if self._fallback:
+            return self._fallback.write_word_data(addr, register, data)
+        # same byte order as SMBus.write_word_data()
+        buf = (ctypes.c_uint8 * 3)(register, data & 0xff, (data >> 8) & 0xff)
+        msgs = (I2C_MSG * 1)(I2C_MSG(addr=addr, flags=0, len=3, buf=buf))
+        self._transfer(msgs)
+
+    # each register is a write message with the register pointer followed by a read message of 2 bytes, joined by repeated starts
+    def read_registers(self, addr, registers):
+        if self._fallback:
+            return self._fallback.read_registers(addr, registers)
+
+        count = len(registers)
+        pointers = (ctypes.c_uint8 * count)(*registers)
+        buf = (ctypes.c_uint8 * (count * 2))()
+        max_registers = I2CRdwrBackend.I2C_RDWR_IOCTL_MAX_MSGS // 2
+        for start in range(0, count, max_registers):
+            end = min(count, start + max_registers)
+            msgs = (I2C_MSG * ((end - start) * 2))()
+            for n in range(start, end):
+                idx = (n - start) * 2
+                msgs[idx] = I2C_MSG(addr=addr, flags=0, len=1, buf=ctypes.cast(ctypes.addressof(pointers) + n, ctypes.POINTER(ctypes.c_uint8)))
+                msgs[idx + 1] = I2C_MSG(addr=addr, flags=I2CRdwrBackend.I2C_M_RD, len=2, buf=ctypes.cast(ctypes.addressof(buf) + n * 2, ctypes.POINTER(ctypes.c_uint8)))
+            try:
+                self._transfer(msgs)
+            except OSError as e:
+                if e.errno not in (errno.EOPNOTSUPP, errno.EINVAL):
+                    raise e
+                # the adapter rejected the combined transfer
+                self._set_fallback()
+                return self._fallback.read_registers(addr, registers)
+
+        return bytes(buf)
+
+# create bus object for the given backend
+#
+# backend       BUS_BACKEND
+# twi           I2C bus number
+# i2c_clock     bus clock in Hz for simulating the transfer time with BUS_BACKEND.SIMULATED
+#
+# devices need to be added to the simulated bus with add_device()
+def create_bus(backend=BUS_BACKEND.SMBUS, twi=1, i2c_clock=None):
+    if backend==BUS_BACKEND.SMBUS:
+        return SMBusBackend(twi)
+    if backend==BUS_BACKEND.I2C_RDWR:
+        return I2CRdwrBackend(twi)
+    if backend==BUS_BACKEND.SIMULATED:
+        from .Simulator import SimulatedBus
+        return SimulatedBus(twi, i2c_clock)
+    raise ValueError('invalid bus backend: %s' % backend)
@@ -7,22 +7,12 @@
 #encoding: utf-8
 
 from .Calibration import Calibration
+from .Bus import (SMBusBackend)
 from datetime import datetime
 from enum import Enum
+import struct
 import sys
-try:
-    import smbus
-except:
-    if 'win' in sys.platform:
-        # dummy class
-        class smbus:
-            class SMBus:
-                def __init__(self, twi):
-                    pass
-                def write_word_data(self, addr, register, switchdata):
-                    pass
-                def read_word_data(self, addr, register):
-                    return 0
+import time
 
 # constants
 
@@ -156,6 +146,35 @@ INA3221_REG_SHUNTVOLTAGE_1   =             (0x01)
 INA3221_REG_BUSVOLTAGE_1     =             (0x02)
 #/*=========================================================================*/
 
+#/*=========================================================================
+#    MASK/ENABLE REGISTER (R/W)
+#    -----------------------------------------------------------------------*/
+INA3221_REG_MASK_ENABLE      =             (0x0F)
+
+# Bit 0
+# Conversion-ready flag. Set after all conversions, averaging and
+# multiplications are complete. Cleared by reading the mask/enable
+# register or writing the configuration register
+INA3221_MASK_ENABLE_CVRF     =             (1 << 0)
+
+# Bit 9-7
+# Critical alert flags of channel 1-3
+INA3221_MASK_ENABLE_CF1      =             (1 << 9)
+INA3221_MASK_ENABLE_CF_ALL   =             (0b111 << 7)
+
+# Bit 10
+# Critical alert latch enable. The flags remain set until the mask/enable
+# register is read
+INA3221_MASK_ENABLE_CEN      =             (1 << 10)
+#/*=========================================================================*/
+
+#/*=========================================================================
+#    CRITICAL ALERT LIMIT REGISTER (R/W)
+#    -----------------------------------------------------------------------*/
+INA3221_REG_CRITICAL_ALERT_1 =             (0x07)
+INA3221_CRITICAL_ALERT_MAX   =             (0x7ff8)
+#/*=========================================================================*/
+
 SHUNT_RESISTOR_VALUE         = (0.1)   # default shunt resistor value of 0.1 Ohm
 
 
@@ -167,8 +186,11 @@ class INA3221Base(object):
     ###########################
     # INA3221 Code
     ###########################
-    def __init__(self, twi=1, addr=INA3221_ADDRESS, channels=INA3211_CONFIG.ENABLE_ALL_CHANNELS, avg=INA3211_CONFIG.AVERAGING_MODE.DEFAULT, vbus_ct=INA3211_CONFIG.VBUS_CONVERSION_TIME, vshunt_ct=INA3211_CONFIG.VSHUNT_CONVERSION_TIME.DEFAULT, shunt=SHUNT_RESISTOR_VALUE):
-        self._bus = smbus.SMBus(twi)
+    # bus         bus backend object, see Bus.create_bus(). None for SMBusBackend(twi)
+    def __init__(self, twi=1, addr=INA3221_ADDRESS, channels=INA3211_CONFIG.ENABLE_ALL_CHANNELS, avg=INA3211_CONFIG.AVERAGING_MODE.DEFAULT, vbus_ct=INA3211_CONFIG.VBUS_CONVERSION_TIME, vshunt_ct=INA3211_CONFIG.VSHUNT_CONVERSION_TIME.DEFAULT, shunt=SHUNT_RESISTOR_VALUE, bus=None):
+        if bus==None:
+            bus = SMBusBackend(twi)
+        self._bus = bus
         self._addr = addr
         self._shunt = shunt
         # min. current that can be measured
@@ -180,8 +202,33 @@ class INA3221Base(object):
     def settings(self, channels, avg, vbus_ct, vshunt_ct):
         self._config = channels | vbus_ct._value_ | vshunt_ct._value_ | INA3211_CONFIG.MODE | avg._value_
         self._calibration = {}
+        self._critical_alerts = 0
         self._write_register_little_endian(INA3221_REG_CONFIG, self._config)
         self._channel_read_time = INA3221.get_interval(avg, vbus_ct, vshunt_ct)
+        self._conversion_time = INA3221.get_conversion_time(avg, vbus_ct, vshunt_ct)
+
+    def close(self):
+        self._bus.close()
+
+    # write buffered data of the bus, i.e. of a recording
+    def flush(self):
+        self._bus.flush()
+
+    # writing the configuration register restarts the conversion cycle
+    def restart_conversion(self):
+        self._write_register_little_endian(INA3221_REG_CONFIG, self._config)
+
+    # time source of the bus for timestamps
+    def monotonic(self):
+        return self._bus.monotonic()
+
+    def monotonic_ns(self):
+        return self._bus.monotonic_ns()
+
+    # True if the timing is controlled by the bus
+    @property
+    def paced(self):
+        return self._bus.paced
 
     def get_min_current(self, shunt=1):
         return self._minI / shunt
@@ -190,7 +237,15 @@ class INA3221Base(object):
         return self._maxI / shunt
 
     def get_interval(avg, vbus_ct, vshunt_ct):
-        return ((int(str(avg).split('.')[-1][1:]) * (int(str(vbus_ct).split('.')[-1].split('_')[1]) + int(str(vshunt_ct).split('.')[-1].split('_')[1]))) / 1000000.0) * 0.95
+        return INA3221.get_conversion_time(avg, vbus_ct, vshunt_ct) * 0.95
+
+    # time to convert bus and shunt voltage of a single channel including averaging
+    def get_conversion_time(avg, vbus_ct, vshunt_ct):
+        return (int(str(avg).split('.')[-1][1:]) * (int(str(vbus_ct).split('.')[-1].split('_')[1]) + int(str(vshunt_ct).split('.')[-1].split('_')[1]))) / 1000000.0
+
+    # time of a full conversion cycle. the enabled channels are converted sequentially
+    def get_cycle_time(self):
+        return self._conversion_time * max(1, len(self.get_enabled_channels()))
 
     # get parameters for given interval
     # from  0.000266s (0.266ms) 3760/sec
@@ -243,6 +298,11 @@ class INA3221Base(object):
         return switchresult
 
 
+    # read multiple registers and decode them as signed 16 bit integers
+    def _read_registers(self, registers):
+        data = self._bus.read_registers(self._addr, registers)
+        return struct.unpack('>%uh' % len(registers), data)
+
     def _write_register_little_endian(self, register, data):
 
         data = data & 0xFFFF
@@ -263,34 +323,106 @@ class INA3221Base(object):
         self._validate(channel)
 	#Gets the raw bus voltage (16-bit signed integer, so +-32767)
 
-        value = self._read_register_little_endian(INA3221_REG_BUSVOLTAGE_1 + channel * 2)
-        if value > 32767:
-            value -= 65536
-        return value
+        return self._read_registers((INA3221_REG_BUSVOLTAGE_1 + channel * 2,))[0]
 
     def _getShuntVoltage_raw(self, channel):
         self._validate(channel)
 	#Gets the raw shunt voltage (16-bit signed integer, so +-32767)
 
-        value = self._read_register_little_endian(INA3221_REG_SHUNTVOLTAGE_1 + channel * 2)
-        if value > 32767:
-            value -= 65536
-        return value
+        return self._read_registers((INA3221_REG_SHUNTVOLTAGE_1 + channel * 2,))[0]
 
     # public functions
 
+    # returns the enable bits of the configuration register for a list of channel numbers
+    def get_channel_bits(channels):
+        bits = 0
+        for channel in channels:
+            bits |= (INA3211_CONFIG.ENABLE_CHANNEL1, INA3211_CONFIG.ENABLE_CHANNEL2, INA3211_CONFIG.ENABLE_CHANNEL3)[channel]
+        return bits
+
+    # returns a list of the channels enabled in the configuration register
+    def get_enabled_channels(self):
+        channels = []
+        for channel, bit in enumerate((INA3211_CONFIG.ENABLE_CHANNEL1, INA3211_CONFIG.ENABLE_CHANNEL2, INA3211_CONFIG.ENABLE_CHANNEL3)):
+            if self._config & bit:
+                channels.append(channel)
+        return channels
+
+    # returns True if a new conversion cycle has been completed since the last call
+    # reading the mask/enable register clears the flag
+    def conversion_ready(self):
+        return (self._read_mask_enable() & INA3221_MASK_ENABLE_CVRF)!=0
+
+    # reading the mask/enable register clears all flags, the critical alert flags are kept for get_critical_alerts()
+    def _read_mask_enable(self):
+        value = self._read_register_little_endian(INA3221_REG_MASK_ENABLE)
+        self._critical_alerts |= value & INA3221_MASK_ENABLE_CF_ALL
+        return value
+
+    # set the critical alert limit of a channel. each conversion of the shunt voltage is compared with the limit
+    #
+    # vshunt_raw    limit as raw shunt voltage, None to disable
+    def set_critical_alert(self, channel, vshunt_raw):
+        self._validate(channel)
+        if vshunt_raw==None:
+            value = INA3221_CRITICAL_ALERT_MAX
+        else:
+            value = max(-INA3221_CRITICAL_ALERT_MAX, min(INA3221_CRITICAL_ALERT_MAX, int(vshunt_raw))) & 0xfff8
+        self._write_register_little_endian(INA3221_REG_CRITICAL_ALERT_1 + channel * 2, value)
+
+    # keep the critical alert flags set until they have been read
+    def set_critical_alert_latch(self, enable=True):
+        self._write_register_little_endian(INA3221_REG_MASK_ENABLE, enable and INA3221_MASK_ENABLE_CEN or 0)
+
+    # returns a list of channels that exceeded the critical alert limit since the last call
+    def get_critical_alerts(self):
+        flags = self._critical_alerts | (self._read_mask_enable() & INA3221_MASK_ENABLE_CF_ALL)
+        self._critical_alerts = 0
+        return [channel for channel in range(0, 3) if flags & (INA3221_MASK_ENABLE_CF1 >> channel)]
+
+    # read the raw bus and shunt voltage of multiple channels in a single pass. each register is read once
+    #
+    # returns a list with a tuple (vbus_raw, vshunt_raw, timestamp) for each channel. the timestamp is the time of the
+    # bus in integer nanoseconds, see monotonic_ns(). registers that have not been read are None
+    #
+    # channels      list of channel numbers or None for all enabled channels
+    # quantities    list of tuples (read_vbus, read_vshunt) for each channel or None to read both registers
+    def read_channels_raw(self, channels=None, quantities=None):
+        if channels==None:
+            channels = self.get_enabled_channels()
+        if quantities==None:
+            quantities = [(True, True)] * len(channels)
+        registers = []
+        for channel, (read_vbus, read_vshunt) in zip(channels, quantities):
+            self._validate(channel)
+            if read_vshunt:
+                registers.append(INA3221_REG_SHUNTVOLTAGE_1 + channel * 2)
+            if read_vbus:
+                registers.append(INA3221_REG_BUSVOLTAGE_1 + channel * 2)
+        # depending on the bus backend, all registers are transferred with a single ioctl()
+        values = iter(self._read_registers(registers))
+        ts = self._bus.monotonic_ns()
+        result = []
+        for read_vbus, read_vshunt in quantities:
+            vshunt_raw = next(values) if read_vshunt else None
+            vbus_raw = next(values) if read_vbus else None
+            result.append((vbus_raw, vshunt_raw, ts))
+        return result
+
+    # read shunt and bus voltage registers 0x01-0x06 of all channels
+    #
+    # returns a tuple (vshunt1_raw, vbus1_raw, vshunt2_raw, vbus2_raw, vshunt3_raw, vbus3_raw)
+    def read_snapshot_raw(self):
+        return self._read_registers(range(INA3221_REG_SHUNTVOLTAGE_1, INA3221_REG_BUSVOLTAGE_1 + 5))
+
     def setCalibration(self, channel, obj):
         self._validate(channel)
         self._calibration[channel] = obj
 
+    # enable or disable the conversion of a channel. disabled channels are skipped and shorten the conversion cycle
     def setChannel(self, channel, enable=True):
         self._validate(channel)
-        if channel==0:
-            bit = INA3211Config.ENABLE_CHANNEL1
-        elif channel==1:
-            bit = INA3211Config.ENABLE_CHANNEL2
-        elif channel==2:
-            bit = INA3211Config.ENABLE_CHANNEL3
+        bit = INA3221.get_channel_bits((channel,))
         if enable:
             self._config |= bit
         else:
@@ -323,20 +455,24 @@ if 'win' in sys.platform:
 
     class INA3221(INA3221Base):
 
-        def __init__(self, twi=1, addr=INA3221_ADDRESS, channels=INA3211_CONFIG.ENABLE_ALL_CHANNELS, avg=INA3211_CONFIG.AVERAGING_MODE.DEFAULT, vbus_ct=INA3211_CONFIG.VBUS_CONVERSION_TIME, vshunt_ct=INA3211_CONFIG.VSHUNT_CONVERSION_TIME.DEFAULT, shunt=SHUNT_RESISTOR_VALUE):
-            INA3221Base.__init__(self, twi, addr, channels, avg, vbus_ct, vshunt_ct, shunt)
-
-        def _getBusVoltage_raw(self, channel):
-            l = 4000
-            u = 8000
-            if random.randint(0, 100)==0:
-                l -= random.randint(0, 3000)
-            if random.randint(0, 100)==1:
-                u += random.randint(0, 3000)
-            return random.randint(l, u)
-
-        def _getShuntVoltage_raw(self, channel):
-            return random.randint(11000, 12000)
+        def __init__(self, twi=1, addr=INA3221_ADDRESS, channels=INA3211_CONFIG.ENABLE_ALL_CHANNELS, avg=INA3211_CONFIG.AVERAGING_MODE.DEFAULT, vbus_ct=INA3211_CONFIG.VBUS_CONVERSION_TIME, vshunt_ct=INA3211_CONFIG.VSHUNT_CONVERSION_TIME.DEFAULT, shunt=SHUNT_RESISTOR_VALUE, bus=None):
+            INA3221Base.__init__(self, twi, addr, channels, avg, vbus_ct, vshunt_ct, shunt, bus)
+
+        def _read_registers(self, registers):
+            values = []
+            for register in registers:
+                if (register - INA3221_REG_SHUNTVOLTAGE_1) % 2:
+                    # bus voltage
+                    l = 4000
+                    u = 8000
+                    if random.randint(0, 100)==0:
+                        l -= random.randint(0, 3000)
+                    if random.randint(0, 100)==1:
+                        u += random.randint(0, 3000)
+                    values.append(random.randint(l, u))
+                else:
+                    values.append(random.randint(11000, 12000))
+            return values
 
 else:
 
@@ -0,0 +1,209 @@
+#
+# Author: sascha_lammers@gmx.de
+#
+
+# recording and replay of raw register transfers
+#
+# file format, all values little endian
+#
+#   header      8 byte magic, uint16 version
+#   record      uint64 monotonic_ns, uint8 type, uint8 addr, uint8 register, uint16 value
+#
+# value is the register content in register order (MSB first) for reads and writes and the errno for errors
+
+from .Bus import BusBackend
+from enum import Enum
+import errno
+import os
+import struct
+import time
+
+class RECORD_TYPE(Enum):
+    READ = 0
+    WRITE = 1
+    ERROR = 2
+
+MAGIC = b'INA3221R'
+VERSION = 1
+HEADER = struct.Struct('<8sH')
+RECORD = struct.Struct('<QBBBH')
+
+# wraps another bus and appends all transfers to a file
+#
+# existing files are continued, i.e. reinitializing the sensor does not truncate the recording. the records are
+# buffered until flush() is called, the sensor flushes the recording after each block of readings
+class RecordingBus(BusBackend):
+
+    # bus           bus backend to record
+    # filename      name of the recording
+    def __init__(self, bus, filename):
+        self._bus = bus
+        self._filename = filename
+        self._file = open(filename, 'ab')
+        if self._file.tell()==0:
+            self._file.write(HEADER.pack(MAGIC, VERSION))
+            self._file.flush()
+
+    @property
+    def filename(self):
+        return self._filename
+
+    def monotonic(self):
+        return self._bus.monotonic()
+
+    def monotonic_ns(self):
+        return self._bus.monotonic_ns()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+        self._bus.close()
+
+    def flush(self):
+        file = self._file
+        if file:
+            file.flush()
+
+    def _write(self, type, addr, register, value):
+        ts = time.monotonic_ns()
+        self._file.write(RECORD.pack(ts, type.value, addr, register, value & 0xffff))
+
+    def _write_error(self, addr, register, error):
+        self._write(RECORD_TYPE.ERROR, addr, register, error.errno or errno.EIO)
+
+    def read_word_data(self, addr, register):
+        try:
+            data = self._bus.read_word_data(addr, register)
+        except OSError as e:
+            self._write_error(addr, register, e)
+            raise e
+        # SMBus byte order
+        self._write(RECORD_TYPE.READ, addr, register, ((data & 0xff) << 8) | ((data >> 8) & 0xff))
+        return data
+
+    def write_word_data(self, addr, register, data):
+        try:
+            self._bus.write_word_data(addr, register, data)
+        except OSError as e:
+            self._write_error(addr, register, e)
+            raise e
+        self._write(RECORD_TYPE.WRITE, addr, register, ((data & 0xff) << 8) | ((data >> 8) & 0xff))
+
+    def read_registers(self, addr, registers):
+        try:
+            data = self._bus.read_registers(addr, registers)
+        except OSError as e:
+            self._write_error(addr, registers[0], e)
+            raise e
+        ts = time.monotonic_ns()
+        values = struct.unpack('>%uH' % len(registers), data)
+        self._file.write(b''.join([RECORD.pack(ts, RECORD_TYPE.READ.value, addr, register, value) for register, value in zip(registers, values)]))
+        return data
+
+# bus backend that returns the values of a recording
+#
+# reads consume the records in order. records that do not match the requested register are skipped and counted in
+# mismatches, writes are ignored. recorded errors are raised as OSError. EOFError is raised at the end of the recording
+#
+# monotonic() returns the recorded time, the sensor readings get the same timestamps as during the recording
+class ReplayBus(BusBackend):
+
+    paced = True
+
+    # number of records read from the file at once
+    CHUNK_SIZE = 4096
+
+    # filename      name of the recording
+    # realtime      True to reproduce the timing of the recording, False to replay as fast as possible
+    def __init__(self, filename, realtime=True):
+        self._filename = filename
+        self._realtime = realtime
+        self._file = open(filename, 'rb')
+        magic, version = HEADER.unpack(self._file.read(HEADER.size))
+        if magic!=MAGIC:
+            raise ValueError('%s: not a recording' % filename)
+        if version!=VERSION:
+            raise ValueError('%s: unsupported version %u' % (filename, version))
+        self._records = iter(())
+        self._next = None
+        self._ts = None
+        self._start = None
+        self.reads = 0
+        self.mismatches = 0
+        self._peek()
+        if self._next==None:
+            raise EOFError('%s: empty recording' % filename)
+        self._first_ts = self._next[0]
+
+    @property
+    def filename(self):
+        return self._filename
+
+    @property
+    def realtime(self):
+        return self._realtime
+
+    # recorded time of the last consumed record
+    def monotonic(self):
+        return self.monotonic_ns() / 1.0e9
+
+    def monotonic_ns(self):
+        return self._ts==None and self._first_ts or self._ts
+
+    # time since the first record
+    @property
+    def duration(self):
+        return ((self._ts or self._first_ts) - self._first_ts) / 1.0e9
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def _peek(self):
+        self._next = next(self._records, None)
+        if self._next==None and self._file:
+            data = self._file.read(RECORD.size * ReplayBus.CHUNK_SIZE)
+            # ignore incomplete records at the end of the file
+            data = data[0:len(data) - len(data) % RECORD.size]
+            if data:
+                self._records = RECORD.iter_unpack(data)
+                self._next = next(self._records, None)
+
+    def _pop(self):
+        if self._next==None:
+            raise EOFError('%s: end of recording' % self._filename)
+        record = self._next
+        self._peek()
+        self._ts = record[0]
+        if self._realtime:
+            if self._start==None:
+                self._start = time.monotonic_ns()
+            sleep_time = (self._start + self._ts - self._first_ts - time.monotonic_ns()) / 1.0e9
+            if sleep_time>0:
+                time.sleep(sleep_time)
+        return record
+
+    # returns the recorded value of the next read of the register
+    def _read(self, addr, register):
+        while True:
+            ts, type, rec_addr, rec_register, value = self._pop()
+            if type==RECORD_TYPE.ERROR.value and rec_addr==addr:
+                raise OSError(value, '%s (replay)' % os.strerror(value))
+            if type==RECORD_TYPE.READ.value and rec_addr==addr and rec_register==register:
+                self.reads += 1
+                return value
+            if type!=RECORD_TYPE.WRITE.value:
+                self.mismatches += 1
+
+    def read_word_data(self, addr, register):
+        value = self._read(addr, register)
+        # swap bytes like SMBus
+        return ((value & 0xff) << 8) | (value >> 8)
+
+    def write_word_data(self, addr, register, data):
+        pass
+
+    def read_registers(self, addr, registers):
+        return struct.pack('>%uH' % len(registers), *[self._read(addr, register) for register in registers])
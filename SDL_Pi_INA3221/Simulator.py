@@ -0,0 +1,304 @@
+#
+# Author: sascha_lammers@gmx.de
+#
+
+# in-memory register model of the INA3221 that can be used as bus backend
+#
+# the model honors the configuration register (reset, channel enable, averaging, conversion times and operating mode),
+# the conversion timing and the conversion ready flag of the mask/enable register. the measured values are generated
+# from programmable waveforms for each channel
+
+from .Bus import BusBackend
+from enum import Enum
+import errno
+import math
+import random
+import struct
+import time
+
+class WAVEFORM(Enum):
+    DC = 0
+    SINE = 1
+    SQUARE = 2                  # current +/- amplitude
+    TRIANGLE = 3
+    PULSE = 4                   # current + amplitude for duty * period
+
+class Waveform(object):
+
+    # voltage           bus voltage in V
+    # current           current in A
+    # shape             WAVEFORM
+    # amplitude         amplitude of the current in A
+    # period            period in seconds
+    # duty              duty cycle 0-1.0 for SQUARE and PULSE
+    # noise             noise of the current for a single conversion in A (standard deviation)
+    # voltage_noise     noise of the bus voltage in V
+    def __init__(self, voltage=5.0, current=0.5, shape=WAVEFORM.DC, amplitude=0.0, period=1.0, duty=0.5, noise=0.0, voltage_noise=0.0):
+        self.voltage = voltage
+        self.current = current
+        self.shape = shape
+        self.amplitude = amplitude
+        self.period = period
+        self.duty = duty
+        self.noise = noise
+        self.voltage_noise = voltage_noise
+
+    def current_at(self, t):
+        if self.shape==WAVEFORM.DC or self.period<=0:
+            return self.current
+        phase = (t % self.period) / self.period
+        if self.shape==WAVEFORM.SINE:
+            return self.current + self.amplitude * math.sin(2 * math.pi * phase)
+        if self.shape==WAVEFORM.SQUARE:
+            return self.current + (phase<self.duty and self.amplitude or -self.amplitude)
+        if self.shape==WAVEFORM.TRIANGLE:
+            return self.current + self.amplitude * (1 - 4 * abs(phase - 0.5))
+        if self.shape==WAVEFORM.PULSE:
+            return self.current + (phase<self.duty and self.amplitude or 0)
+        raise ValueError('invalid waveform: %s' % self.shape)
+
+    def voltage_at(self, t):
+        return self.voltage
+
+class INA3221Model(object):
+
+    CONFIG_DEFAULT = 0x7127
+    REG_CONFIG = 0x00
+    REG_MASK_ENABLE = 0x0f
+    REG_MANUFACTURER_ID = 0xfe
+    REG_DIE_ID = 0xff
+
+    # writable registers besides the configuration
+    WRITABLE = (0x07, 0x08, 0x09, 0x0a, 0x0b, 0x0c, 0x0e, 0x0f, 0x10, 0x11)
+
+    CVRF = 1 << 0
+    CF1 = 1 << 9
+    CEN = 1 << 10
+
+    VSHUNT_LSB = 0.00004        # 40uV
+    VBUS_LSB = 0.008            # 8mV
+
+    AVERAGING = (1, 4, 16, 64, 128, 256, 512, 1024)
+    CONVERSION_TIME = (0.000140, 0.000204, 0.000332, 0.000588, 0.001100, 0.002116, 0.004156, 0.008244)
+
+    # max. number of points to calculate the mean of the waveform during a conversion
+    MAX_SUB_SAMPLES = 16
+
+    # waveforms     list of Waveform objects, one per channel
+    # shunts        list of shunt resistor values in Ohm
+    # clock         callable returning the time in seconds
+    def __init__(self, waveforms, shunts=(0.1, 0.1, 0.1), clock=time.monotonic, seed=None):
+        self._waveforms = list(waveforms)
+        self._shunts = list(shunts)
+        self._clock = clock
+        self._seed = seed==None and random.getrandbits(32) or seed
+        self._registers = {}
+        self._reset()
+
+    def _reset(self):
+        self._registers = {
+            0x0d: 0x0000,           # shunt voltage sum
+            0x0e: 0x7ff8,           # shunt voltage sum limit
+            INA3221Model.REG_MASK_ENABLE: 0x0002,
+            0x10: 0x2710,           # power valid upper limit
+            0x11: 0x2328,           # power valid lower limit
+            INA3221Model.REG_MANUFACTURER_ID: 0x5449,
+            INA3221Model.REG_DIE_ID: 0x3220
+        }
+        for register in range(0x01, 0x07):
+            self._registers[register] = 0
+        # critical and warning alert limits
+        for register in range(0x07, 0x0d):
+            self._registers[register] = 0x7ff8
+        self._write_config(INA3221Model.CONFIG_DEFAULT)
+
+    def _write_config(self, value):
+        if value & 0x8000:
+            self._reset()
+            return
+        self._config = value
+        self._start = self._clock()
+        self._cvrf_cycle = 0
+        self._critical_flags = 0
+        self._registers[INA3221Model.REG_CONFIG] = value
+
+    @property
+    def channels(self):
+        return [channel for channel in range(3) if self._config & (1 << (14 - channel))]
+
+    @property
+    def averaging(self):
+        return INA3221Model.AVERAGING[(self._config >> 9) & 0b111]
+
+    @property
+    def vbus_conversion_time(self):
+        return INA3221Model.CONVERSION_TIME[(self._config >> 6) & 0b111]
+
+    @property
+    def vshunt_conversion_time(self):
+        return INA3221Model.CONVERSION_TIME[(self._config >> 3) & 0b111]
+
+    @property
+    def mode(self):
+        return self._config & 0b111
+
+    # returns the time for converting a single channel and the time of the shunt conversion within it
+    def _conversion_times(self):
+        mode = self.mode
+        vshunt = (mode & 0b001) and self.vshunt_conversion_time * self.averaging or 0
+        vbus = (mode & 0b010) and self.vbus_conversion_time * self.averaging or 0
+        return (vshunt + vbus, vshunt)
+
+    def get_cycle_time(self):
+        return self._conversion_times()[0] * len(self.channels)
+
+    # number of completed conversions of the channel with the given position in the cycle
+    def _completed_conversions(self, position, now):
+        conv_time = self._conversion_times()[0]
+        cycle_time = conv_time * len(self.channels)
+        mode = self.mode
+        if cycle_time==0 or mode in (0b000, 0b100):
+            return 0
+        n = math.floor((now - self._start - (position + 1) * conv_time) / cycle_time) + 1
+        if n<=0:
+            return 0
+        if not mode & 0b100:
+            # single-shot
+            return min(1, n)
+        return n
+
+    def _completed_cycles(self, now):
+        if not self.channels:
+            return 0
+        return self._completed_conversions(len(self.channels) - 1, now)
+
+    # mean of the waveform during the conversion window with noise reduced by averaging
+    def _convert(self, func, noise, start, duration, rnd):
+        n = max(1, min(self.averaging, INA3221Model.MAX_SUB_SAMPLES))
+        value = 0
+        for i in range(n):
+            value += func(start + duration * (i + 0.5) / n)
+        value /= n
+        if noise:
+            value += rnd.gauss(0, noise / math.sqrt(self.averaging))
+        return value
+
+    def _update_channel(self, channel, now):
+        channels = self.channels
+        if not channel in channels:
+            return
+        position = channels.index(channel)
+        n = self._completed_conversions(position, now)
+        if n==0:
+            return
+        conv_time, vshunt_time = self._conversion_times()
+        # start of the last completed conversion
+        start = self._start + (n - 1) * conv_time * len(channels) + position * conv_time
+        waveform = self._waveforms[channel]
+        # the same conversion returns the same noise
+        rnd = random.Random(hash((self._seed, channel, n, self._start)))
+        mode = self.mode
+        if mode & 0b001:
+            current = self._convert(waveform.current_at, waveform.noise, start, vshunt_time, rnd)
+            vshunt = current * self._shunts[channel]
+            self._registers[0x01 + channel * 2] = self._to_register(vshunt, INA3221Model.VSHUNT_LSB)
+            self._check_critical_alert(channel)
+        if mode & 0b010:
+            vbus = self._convert(waveform.voltage_at, waveform.voltage_noise, start + vshunt_time, conv_time - vshunt_time, rnd)
+            self._registers[0x02 + channel * 2] = self._to_register(vbus, INA3221Model.VBUS_LSB)
+
+    # the limit is only compared with the conversions that have been read. the real device compares every conversion
+    def _check_critical_alert(self, channel):
+        flag = INA3221Model.CF1 >> channel
+        if self._to_signed(self._registers[0x01 + channel * 2])>=self._to_signed(self._registers[0x07 + channel * 2]):
+            self._critical_flags |= flag
+        elif not self._registers[INA3221Model.REG_MASK_ENABLE] & INA3221Model.CEN:
+            self._critical_flags &= ~flag
+
+    def _to_signed(self, value):
+        return value>=0x8000 and value - 0x10000 or value
+
+    # 13 bit value + sign, the lower 3 bits are always 0
+    def _to_register(self, value, lsb):
+        value = int(round(value / lsb))
+        value = max(-4096, min(4095, value))
+        return (value << 3) & 0xffff
+
+    def read(self, register):
+        now = self._clock()
+        if register in (0x01, 0x02, 0x03, 0x04, 0x05, 0x06):
+            self._update_channel((register - 1) // 2, now)
+        elif register==INA3221Model.REG_MASK_ENABLE:
+            cycles = self._completed_cycles(now)
+            value = (self._registers[register] & ~INA3221Model.CVRF) | self._critical_flags
+            if cycles>self._cvrf_cycle:
+                value |= INA3221Model.CVRF
+            self._cvrf_cycle = cycles
+            if value & INA3221Model.CEN:
+                self._critical_flags = 0
+            return value
+        if not register in self._registers:
+            raise OSError(errno.EREMOTEIO, 'invalid register 0x%02x' % register)
+        return self._registers[register]
+
+    def write(self, register, value):
+        value &= 0xffff
+        if register==INA3221Model.REG_CONFIG:
+            self._write_config(value)
+        elif register in INA3221Model.WRITABLE:
+            self._registers[register] = value
+        else:
+            raise OSError(errno.EREMOTEIO, 'register 0x%02x is read only' % register)
+
+class SimulatedBus(BusBackend):
+
+    # bits transferred per register read, start, address + W, register, repeated start, address + R, 2 bytes, stop
+    READ_BITS = 1 + 9 + 9 + 1 + 9 + 18 + 1
+
+    # i2c_clock     clock of the simulated bus in Hz. the transfer time is added to each read. None to disable
+    # clock         callable returning the time in seconds
+    def __init__(self, twi=1, i2c_clock=None, clock=time.monotonic):
+        self._devices = {}
+        self._clock = clock
+        self._bit_time = i2c_clock and (1.0 / i2c_clock) or 0
+
+    # add an INA3221 to the bus
+    #
+    # addr          I2C address
+    # waveforms     list of Waveform objects for each channel
+    # shunts        list of shunt values in Ohm
+    def add_device(self, addr, waveforms, shunts=(0.1, 0.1, 0.1), seed=None):
+        device = INA3221Model(waveforms, shunts, self._clock, seed)
+        self._devices[addr] = device
+        return device
+
+    def get_device(self, addr):
+        if not addr in self._devices:
+            # no ACK from the device
+            raise OSError(errno.EREMOTEIO, 'no device at address 0x%02x' % addr)
+        return self._devices[addr]
+
+    def monotonic(self):
+        return self._clock()
+
+    def monotonic_ns(self):
+        return int(round(self._clock() * 1.0e9))
+
+    def _transfer_delay(self, registers):
+        if self._bit_time:
+            time.sleep(SimulatedBus.READ_BITS * registers * self._bit_time)
+
+    def read_word_data(self, addr, register):
+        self._transfer_delay(1)
+        value = self.get_device(addr).read(register)
+        # swap bytes like SMBus
+        return ((value & 0xff) << 8) | (value >> 8)
+
+    def write_word_data(self, addr, register, data):
+        self._transfer_delay(1)
+        self.get_device(addr).write(register, ((data & 0xff) << 8) | ((data >> 8) & 0xff))
+
+    def read_registers(self, addr, registers):
+        self._transfer_delay(len(registers))
+        device = self.get_device(addr)
+        return struct.pack('>%uH' % len(registers), *[device.read(register) for register in registers])
@@ -4,3 +4,6 @@
 
 from .INA3221 import (INA3221, INA3211_CONFIG)
 from .Calibration import Calibration
+from .Bus import (BUS_BACKEND, create_bus)
+from .Simulator import (WAVEFORM, Waveform, SimulatedBus)
+from .Recorder import (RecordingBus, ReplayBus)
@@ -14,7 +14,7 @@ from Config import (JsonWriter, YamlWriter)
 from PowerMonitor.MainApp import MainApp
 from PowerMonitor import AppConfig
 from PowerMonitor.Config import Config
-from SDL_Pi_INA3221 import INA3211_CONFIG
+from SDL_Pi_INA3221 import (INA3211_CONFIG, BUS_BACKEND)
 
 if 'win' in sys.platform:
     home_dir = os.environ.get('APPDATA')
@@ -35,6 +35,11 @@ parser.add_argument('--print', help='check and display configuration', choices=[
 parser.add_argument('--section', help='config section to display', type=str, default=None)
 parser.add_argument('--key', help='config key(s) to display', action="append", nargs='*', default=None)
 parser.add_argument('--debug', help='enable debug mode', action='store_true', default=None)
+parser.add_argument('--bus-backend', help='override I2C bus backend', choices=['smbus', 'i2c_rdwr', 'simulated'], default=None)
+parser.add_argument('--record', help='record sensor register reads to file', type=str, default=None)
+parser.add_argument('--replay', help='replay recorded sensor register reads from file', type=str, default=None)
+parser.add_argument('--replay-fast', help='replay as fast as possible', action='store_true', default=None)
+parser.add_argument('--auto-tune', help='measure the sensor noise and store the fastest settings that meet the target noise', action='store_true', default=None)
 parser.add_argument('--ignore-warnings', help='number of warnings to ignore and continue', type=int, default=0)
 
 args = parser.parse_args()
@@ -58,7 +63,8 @@ except Exception as e:
 
 setattr(sys.modules[AppConfig.App.__module__], AppConfig.App.__class__.__qualname__, root_object)
 AppConfig = root_object
-AppConfig.channels = dict(zip(range(0, 3), list(AppConfig.channels)))
+# 3 channels per INA3221
+AppConfig.channels = dict(zip(range(0, AppConfig.ina3221.get_channel_count()), list(AppConfig.channels)))
 setattr(AppConfig, 'get_filename', config.get_filename)
 
 AppConfig.ignore_warnings = args.ignore_warnings
@@ -72,6 +78,14 @@ if args.display!=None:
     AppConfig.gui.display = args.display
 if args.fullscreen!=None:
     AppConfig.gui.fullscreen = args.fullscreen
+if args.bus_backend!=None:
+    AppConfig.ina3221.bus_backend = BUS_BACKEND[args.bus_backend.upper()]
+if args.record!=None:
+    AppConfig.ina3221.record_file = os.path.realpath(args.record)
+if args.replay!=None:
+    AppConfig.ina3221.replay_file = os.path.realpath(args.replay)
+if args.replay_fast:
+    AppConfig.ina3221.replay_realtime = False
 if args.fast_mode:
     AppConfig.ignore_warnings += 1
     AppConfig.ina3221.averaging_mode = INA3211_CONFIG.AVERAGING_MODE.x1
@@ -110,6 +124,17 @@ if args.check:
         config.print_config(args.print, (args.section, args.key and args.key[0] or None))
     sys.exit(0)
 
+if args.auto_tune:
+    from PowerMonitor.AutoTune import AutoTune
+    auto_tune = AutoTune(logger, AppConfig)
+    result = auto_tune.run()
+    if result==None:
+        sys.exit(1)
+    logger.info('selected %s' % result)
+    if AppConfig.auto_tune.file:
+        auto_tune.store(result)
+    sys.exit(0)
+
 
 app = MainApp(logger, AppConfig)
 
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from PowerMonitor.BurstCapture import BurstCapture
+from PowerMonitor.Enums import CAPTURE_TRIGGER
+
+CHANNELS = 2
+INTERVAL = 0.001
+
+# readings of 2s with a current pulse of 10ms on channel 1 at 0.5s
+def create_readings(n=2000):
+    t = 1000.0 + np.arange(0, n) * INTERVAL
+    current = np.full((n, CHANNELS), 0.1)
+    current[500:510, 1] = 2.0
+    loadvoltage = np.full((n, CHANNELS), 5.0)
+    return (t, loadvoltage, current, loadvoltage * current)
+
+def capture(burst, readings, blocks, alerts={}):
+    traces = []
+    for block, rows in enumerate(np.array_split(np.arange(0, len(readings[0])), blocks)):
+        trace = burst.add(*[values[rows] for values in readings], alerts=alerts.get(block))
+        if trace!=None:
+            traces.append(trace)
+    return traces
+
+def test_current():
+    burst = BurstCapture(CAPTURE_TRIGGER.CURRENT, 1.0, 0.1, 0.2, 1.0, CHANNELS, 1000)
+    readings = create_readings()
+    traces = capture(burst, readings, 40)
+    assert len(traces)==1
+    trace = traces[0]
+    assert (trace.trigger, trace.channel, trace.t)==(CAPTURE_TRIGGER.CURRENT, 1, readings[0][500])
+    # the rows from pre_trigger before to post_trigger after the trigger
+    np.testing.assert_allclose(trace.get_time(), np.arange(-100, 201) * INTERVAL, atol=1e-9)
+    assert trace.duration==pytest.approx(0.3)
+    assert trace.peak_current==2.0
+    np.testing.assert_array_equal(trace.get_values(1, 'I'), readings[2][400:701, 1])
+    np.testing.assert_array_equal(trace.get_values(0, 'P'), readings[3][400:701, 0])
+    assert not burst.pending
+
+def test_latency():
+    # the trace is returned with the first block after the post trigger time
+    burst = BurstCapture(CAPTURE_TRIGGER.CURRENT, 1.0, 0.1, 0.2, 1.0, CHANNELS, 1000)
+    t, loadvoltage, current, power = create_readings()
+    assert burst.add(t[0:505], loadvoltage[0:505], current[0:505], power[0:505])==None
+    assert burst.pending
+    assert burst.add(t[505:700], loadvoltage[505:700], current[505:700], power[505:700])==None
+    trace = burst.add(t[700:710], loadvoltage[700:710], current[700:710], power[700:710])
+    assert len(trace)==301
+
+def test_holdoff():
+    # triggers during the holdoff time are ignored
+    readings = create_readings(3000)
+    readings[2][800:805, 0] = -3.0
+    readings[2][2000:2005, 0] = 3.0
+    burst = BurstCapture(CAPTURE_TRIGGER.CURRENT, 1.0, 0.1, 0.2, 1.0, CHANNELS, 1000)
+    traces = capture(burst, readings, 30)
+    assert [(trace.channel, trace.t) for trace in traces]==[(1, readings[0][500]), (0, readings[0][2000])]
+    assert traces[1].peak_current==3.0
+
+def test_di_dt():
+    # the rate of change is calculated across blocks
+    readings = create_readings()
+    burst = BurstCapture(CAPTURE_TRIGGER.DI_DT, 1000.0, 0.1, 0.2, 1.0, CHANNELS, 1000)
+    traces = capture(burst, readings, 40)
+    assert len(traces)==1
+    assert (traces[0].channel, traces[0].t)==(1, readings[0][500])
+    # 1.9A in 1ms is below the threshold
+    burst = BurstCapture(CAPTURE_TRIGGER.DI_DT, 2000.0, 0.1, 0.2, 1.0, CHANNELS, 1000)
+    assert capture(burst, readings, 40)==[]
+
+def test_critical_alert():
+    # the highest reading of the channel with the alert flag is the trigger
+    readings = create_readings()
+    burst = BurstCapture(CAPTURE_TRIGGER.CRITICAL_ALERT, 1.0, 0.1, 0.2, 1.0, CHANNELS, 1000)
+    traces = capture(burst, readings, 4, {1: [1]})
+    assert len(traces)==1
+    assert (traces[0].channel, traces[0].t)==(1, readings[0][500])
+    burst.clear()
+    assert capture(burst, readings, 4)==[]
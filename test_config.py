@@ -0,0 +1,31 @@
+import json
+import os
+import pytest
+from PowerMonitor.Config import Config
+
+DIR = os.path.dirname(os.path.realpath(__file__))
+
+def test_example_config():
+    config = Config(DIR).load(os.path.join(DIR, 'config.example.json'))
+    assert config.sensor_thread.cpu_affinity==None
+    assert config.sensor_thread.get_cpu_affinity()==None
+    assert config.auto_tune.target_voltage_noise==None
+
+def write_config(tmp_path, config):
+    filename = str(tmp_path / 'config.json')
+    with open(filename, 'w') as f:
+        f.write(json.dumps(config))
+    return filename
+
+def test_null(tmp_path):
+    # null is allowed for parameters that have None in their types
+    config = Config(str(tmp_path)).load(write_config(tmp_path, {'sensor_thread': {'cpu_affinity': None, 'nice': None}}))
+    assert config.sensor_thread.cpu_affinity==None
+    assert config.sensor_thread.nice==None
+    with pytest.raises(KeyError):
+        Config(str(tmp_path)).load(write_config(tmp_path, {'sensor_thread': {'priority': None}}))
+
+def test_auto_tune_target_noise(tmp_path):
+    config = Config(str(tmp_path)).load(write_config(tmp_path, {'auto_tune': {'target_current_noise': None, 'target_voltage_noise': 2}}))
+    assert config.auto_tune.target_current_noise==None
+    assert config.auto_tune.target_voltage_noise==2.0
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from PowerMonitor.Decimator import (BoxcarDecimator, FirDecimator, create_decimator)
+from PowerMonitor.Enums import DECIMATION_FILTER
+
+COLUMNS = 4
+INPUT_PERIOD = 0.001
+PERIOD = 0.01
+
+# readings with time in the first column
+def create_rows(n, seed=1, irregular=False):
+    rnd = np.random.RandomState(seed)
+    if irregular:
+        t = 1000.0 + np.cumsum(rnd.uniform(0.0001, 0.003, n))
+    else:
+        t = 1000.0 + np.arange(0, n) * INPUT_PERIOD
+    return np.column_stack((t, rnd.normal(0, 1, (n, COLUMNS - 1))))
+
+def process(decimator, rows, blocks):
+    return np.concatenate([decimator.process(block) for block in np.array_split(rows, blocks)])
+
+def test_boxcar():
+    rows = create_rows(5000, irregular=True)
+    result = process(BoxcarDecimator(PERIOD, COLUMNS), rows, 37)
+    bins = np.floor(rows[:, 0] / PERIOD)
+    # the rows of the last interval are kept
+    expected = np.array([rows[bins==b].mean(axis=0) for b in np.unique(bins)[:-1]])
+    np.testing.assert_allclose(result, expected, rtol=1e-12)
+
+# filter with the taps and return every factor-th sample
+def fir_reference(rows, taps, factor):
+    windows = np.array([rows[n:n + len(taps)] for n in range(0, len(rows) - len(taps) + 1, factor)])
+    return np.einsum('nkc,k->nc', windows, taps)
+
+@pytest.mark.parametrize('filter', [DECIMATION_FILTER.CIC, DECIMATION_FILTER.FIR])
+def test_fir(filter):
+    rows = create_rows(3000)
+    decimator = create_decimator(filter, PERIOD, INPUT_PERIOD, COLUMNS)
+    assert decimator.factor==10
+    result = process(decimator, rows, 41)
+    expected = fir_reference(rows, decimator._taps, 10)
+    assert len(result)==len(expected)
+    np.testing.assert_allclose(result, expected, rtol=1e-9, atol=1e-9)
+
+def test_cic_taps():
+    # cascaded moving averages of factor samples
+    taps = FirDecimator.get_cic_taps(10, 3)
+    assert len(taps)==28
+    assert taps.sum()==pytest.approx(1.0)
+    x = np.random.RandomState(1).normal(0, 1, 200)
+    y = x
+    for n in range(0, 3):
+        y = np.convolve(y, np.full(10, 0.1), mode='valid')
+    np.testing.assert_allclose(np.convolve(x, taps, mode='valid'), y, rtol=1e-9, atol=1e-12)
+
+def test_fir_taps():
+    # the gain is 1 at DC, 0.5 at the nyquist frequency of the output and the output sample rate, which aliases to DC,
+    # is attenuated
+    taps = FirDecimator.get_fir_taps(10)
+    assert len(taps)==41
+    assert taps.sum()==pytest.approx(1.0)
+    n = np.arange(0, len(taps)) - 20
+    assert np.sum(taps * np.cos(np.pi * n / 10))==pytest.approx(0.5, abs=0.05)
+    assert abs(np.sum(taps * np.cos(np.pi * n / 5)))<0.01
+
+def test_interpolation():
+    # irregular readings are interpolated to the grid of the input period
+    rows = create_rows(3000, irregular=True)
+    rows[:, 1] = rows[:, 0] * 2.0
+    decimator = create_decimator(DECIMATION_FILTER.FIR, PERIOD, INPUT_PERIOD, COLUMNS)
+    result = process(decimator, rows, 23)
+    np.testing.assert_allclose(np.diff(result[:, 0]), PERIOD, rtol=1e-6)
+    np.testing.assert_allclose(result[:, 1], result[:, 0] * 2.0, rtol=1e-9)
+
+def test_gap():
+    # the interpolation does not bridge gaps longer than the output interval
+    rows = create_rows(1000)
+    rows[500:, 0] += 1.0
+    decimator = create_decimator(DECIMATION_FILTER.CIC, PERIOD, INPUT_PERIOD, COLUMNS)
+    first = decimator.process(rows[0:500])
+    second = decimator.process(rows[500:])
+    assert first[-1, 0]<rows[499, 0]
+    assert second[0, 0]>rows[500, 0]
+    np.testing.assert_allclose(second, fir_reference(rows[500:], decimator._taps, 10), rtol=1e-9, atol=1e-9)
+
+def test_invalid_filter():
+    with pytest.raises(ValueError):
+        create_decimator(None, PERIOD, INPUT_PERIOD, COLUMNS)
+    assert isinstance(create_decimator(DECIMATION_FILTER.BOXCAR, PERIOD, INPUT_PERIOD, COLUMNS), BoxcarDecimator)
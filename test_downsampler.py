@@ -0,0 +1,133 @@
+import numpy as np
+import pytest
+from PowerMonitor.Downsampler import StreamingDownsampler
+from PowerMonitor.Enums import DOWNSAMPLING_MODE
+
+CHANNELS = 3
+INTERVAL = 0.5
+
+def create_rows(n, seed=1):
+    rnd = np.random.RandomState(seed)
+    # irregular intervals
+    t = 1000.0 + np.cumsum(rnd.uniform(0.001, 0.1, n))
+    values = rnd.normal(0, 1, (n, CHANNELS, 3)).astype(np.float32)
+    return (t, values)
+
+# returns the start and end of each bucket of the rows
+def get_buckets(t):
+    buckets = np.floor(t / INTERVAL)
+    edges = np.flatnonzero(np.diff(buckets)) + 1
+    return list(zip(np.concatenate(([0], edges)), np.concatenate((edges, [len(t)]))))
+
+# process the rows in blocks like the plot values are compressed
+def downsample(downsampler, t, values, blocks):
+    out_t = []
+    out_values = []
+    pos = 0
+    for time_limit in np.linspace(t[0], t[-1], blocks + 1)[1:]:
+        result = downsampler.process(t[pos:], values[pos:], time_limit)
+        if result!=None:
+            pos += result[0]
+            out_t.append(result[1])
+            out_values.append(result[2])
+    return (pos, np.concatenate(out_t), np.concatenate(out_values))
+
+def test_buckets():
+    t, values = create_rows(2000)
+    end, out_t, out_values = downsample(StreamingDownsampler(INTERVAL, 1000), t, values, 13)
+    buckets = get_buckets(t[0:end])
+    # only complete buckets are reduced
+    assert np.floor(t[end] / INTERVAL)==np.floor(t[-1] / INTERVAL)
+    assert len(out_t)==len(buckets) * 2
+    np.testing.assert_array_equal(out_t.reshape(-1, 2), [(t[a], t[b - 1]) for a, b in buckets])
+
+def test_max_rows():
+    t, values = create_rows(2000)
+    downsampler = StreamingDownsampler(INTERVAL, 100)
+    result = downsampler.process(t, values, t[-1])
+    assert result[0]<=100
+    assert np.floor(t[result[0] - 1] / INTERVAL)!=np.floor(t[result[0]] / INTERVAL)
+    # a single bucket with more rows is reduced at once
+    downsampler = StreamingDownsampler(INTERVAL, 2)
+    result = downsampler.process(t, values, t[-1])
+    assert result[0]==get_buckets(t)[0][1]
+
+def test_mean_first_last():
+    t, values = create_rows(2000)
+    modes = (DOWNSAMPLING_MODE.MEAN, DOWNSAMPLING_MODE.FIRST_LAST, DOWNSAMPLING_MODE.MEAN)
+    end, out_t, out_values = downsample(StreamingDownsampler(INTERVAL, 1000, modes), t, values, 7)
+    out_values = out_values.reshape((-1, 2, CHANNELS, 3))
+    for (a, b), bucket in zip(get_buckets(t[0:end]), out_values):
+        mean = values[a:b, :, 0].mean(axis=0, dtype=np.float64)
+        np.testing.assert_allclose(bucket[:, :, 0], [mean, mean], rtol=1e-5, atol=1e-6)
+        np.testing.assert_array_equal(bucket[:, :, 1], [values[a, :, 1], values[b - 1, :, 1]])
+
+def test_min_max():
+    t, values = create_rows(3000)
+    # repeated values
+    values[::7] = np.round(values[::7])
+    modes = (DOWNSAMPLING_MODE.MIN_MAX,) * 3
+    end, out_t, out_values = downsample(StreamingDownsampler(INTERVAL, 500, modes), t, values, 11)
+    out_values = out_values.reshape((-1, 2, CHANNELS, 3))
+    for (a, b), bucket in zip(get_buckets(t[0:end]), out_values):
+        for channel in range(CHANNELS):
+            for type in range(3):
+                column = values[a:b, channel, type]
+                imin = np.argmin(column)
+                imax = np.argmax(column)
+                # min. and max. value in the order they occurred
+                expected = imin<=imax and (column[imin], column[imax]) or (column[imax], column[imin])
+                assert tuple(bucket[:, channel, type])==expected
+
+# straightforward implementation for a single column
+#
+# prev          time and value of the point selected before
+#
+# returns the selected values and the last selected point
+def lttb_reference(t, column, buckets, prev):
+    segments = []
+    for a, b in buckets:
+        half = (b - a + 1) // 2
+        segments.append((a, a + half))
+        # the empty second segment of a bucket with a single row gets the same point
+        segments.append((b - 1, b) if half==b - a else (a + half, b))
+    means = [(np.mean(t[a:b]), np.mean(column[a:b], dtype=np.float64)) for a, b in segments]
+    prev_t, prev_v = prev
+    result = []
+    for k, (a, b) in enumerate(segments):
+        # the last segment uses its own mean
+        mean_t, mean_v = means[min(k + 1, len(segments) - 1)]
+        best = None
+        for i in range(a, b):
+            area = abs((prev_t - mean_t) * (column[i] - prev_v) - (prev_t - t[i]) * (mean_v - prev_v))
+            if best==None or area>best[0]:
+                best = (area, i)
+        prev_t, prev_v = t[best[1]], float(column[best[1]])
+        result.append(column[best[1]])
+    return (np.array(result, dtype=np.float32), (prev_t, prev_v))
+
+def test_lttb():
+    t, values = create_rows(3000)
+    modes = (DOWNSAMPLING_MODE.MEAN, DOWNSAMPLING_MODE.LTTB, DOWNSAMPLING_MODE.LTTB)
+    downsampler = StreamingDownsampler(INTERVAL, 400, modes)
+    prev = {}
+    pos = 0
+    for time_limit in np.linspace(t[0], t[-1], 9)[1:]:
+        result = downsampler.process(t[pos:], values[pos:], time_limit)
+        if result==None:
+            continue
+        end = pos + result[0]
+        buckets = get_buckets(t[pos:end])
+        out_values = result[2].reshape((-1, 2, CHANNELS, 3))
+        assert len(out_values)==len(buckets)
+        # the selected values get the time of the first and last row of the bucket
+        np.testing.assert_array_equal(result[1].reshape(-1, 2), [(t[pos + a], t[pos + b - 1]) for a, b in buckets])
+        for channel in range(CHANNELS):
+            for type in (1, 2):
+                column = values[pos:end, channel, type]
+                # the last selected point is kept for the next call
+                key = (channel, type)
+                expected, prev[key] = lttb_reference(t[pos:end], column, buckets, prev.get(key, (t[0], float(values[0, channel, type]))))
+                np.testing.assert_array_equal(out_values[:, :, channel, type].reshape(-1), expected)
+        pos = end
+    assert pos>0
@@ -0,0 +1,146 @@
+import math
+import numpy as np
+import pytest
+from PowerMonitor.EnergyIntegrator import EnergyIntegrator
+from PowerMonitor.Enums import ENERGY_GAP_POLICY
+
+VOLTAGE = 5.0
+INTERVAL = 0.01
+LIMIT = INTERVAL * 3
+# a timestamp of 0 marks a channel that has not been read
+START = 100.0
+
+def ramp(t):
+    return 0.5 + 0.1 * (t - START)
+
+# integral of ramp() from START + t0 to START + t1
+def ramp_integral(t0, t1):
+    return 0.5 * (t1 - t0) + 0.05 * (t1 * t1 - t0 * t0)
+
+# timestamps in nanoseconds
+def to_ns(t):
+    return np.rint(t * 1.0e9).astype(np.int64)
+
+def integrate(integrator, t, current, blocks=1):
+    for ts, values in zip(np.array_split(to_ns(t), blocks), np.array_split(current, blocks)):
+        integrator.add(ts, values, values * VOLTAGE, LIMIT)
+    return integrator
+
+def test_sine():
+    a, b, w = 0.5, 0.3, 2 * np.pi / 1.7
+    t = np.arange(0, 100001) * INTERVAL + 1.0
+    integrator = integrate(EnergyIntegrator(ENERGY_GAP_POLICY.SKIP, 1.0), t, a + b * np.sin(w * t), 97)
+    T0, T1 = t[0], t[-1]
+    expected = a * (T1 - T0) - b / w * (np.cos(w * T1) - np.cos(w * T0))
+    assert integrator.ei * 3600==pytest.approx(expected, rel=1e-7)
+    assert integrator.ep * 3600==pytest.approx(expected * VOLTAGE, rel=1e-7)
+    assert integrator.t==pytest.approx(t[-1], abs=1e-9)
+    assert (integrator.gaps, integrator.gap_time, integrator.bridged_time)==(0, 0, 0)
+
+def test_blocks():
+    # the result does not depend on how the readings are split into blocks
+    t = np.arange(0, 10000) * INTERVAL + START
+    current = ramp(t)
+    single = integrate(EnergyIntegrator(ENERGY_GAP_POLICY.SKIP, 1.0), t, current)
+    blocks = integrate(EnergyIntegrator(ENERGY_GAP_POLICY.SKIP, 1.0), t, current, 123)
+    assert blocks.ei==pytest.approx(single.ei, rel=1e-12)
+    assert single.ei * 3600==pytest.approx(ramp_integral(0, t[-1] - START), rel=1e-9)
+
+def test_long_uptime():
+    # the intervals are calculated with integer nanoseconds
+    t = np.arange(0, 10000) * INTERVAL + START
+    current = ramp(t)
+    start = integrate(EnergyIntegrator(ENERGY_GAP_POLICY.SKIP, 1.0), t, current, 100)
+    later = integrate(EnergyIntegrator(ENERGY_GAP_POLICY.SKIP, 1.0), t + 3.0e7, current, 100)
+    assert later.ei==pytest.approx(start.ei, rel=1e-9)
+
+def test_block_sum():
+    # the sum of a large block is close to the exactly rounded sum of the areas
+    rnd = np.random.RandomState(1)
+    n = 1000000
+    ts = 1000000000 + np.cumsum(rnd.randint(9000000, 11000000, n)).astype(np.int64)
+    current = rnd.uniform(0, 10, n)
+    integrator = EnergyIntegrator(ENERGY_GAP_POLICY.SKIP, 1.0)
+    integrator.add(ts, current, current, LIMIT)
+    areas = (current[1:] + current[:-1]) * 0.5 * (np.diff(ts) / 1.0e9)
+    assert integrator.get_state()[0]==pytest.approx(math.fsum(areas), rel=1e-14)
+
+def test_compensated_sum():
+    # small increments are not lost if the total is large
+    integrator = EnergyIntegrator(ENERGY_GAP_POLICY.SKIP, 1.0)
+    integrator.reset(ei=1.0e9)
+    t = np.arange(0, 20000) * INTERVAL + START
+    integrate(integrator, t, np.full(len(t), 0.001), len(t))
+    state = integrator.get_state()
+    assert (state[0] - 3.6e12) + state[2]==pytest.approx(0.001 * (t[-1] - t[0]), rel=1e-6)
+
+def test_invalid_readings():
+    t = np.arange(0, 1000) * INTERVAL + START
+    current = ramp(t)
+    ts = t.copy()
+    ts[1::2] = 0
+    integrator = EnergyIntegrator(ENERGY_GAP_POLICY.SKIP, 1.0)
+    integrator.add(to_ns(ts), current, current * VOLTAGE, LIMIT)
+    assert integrator.ei * 3600==pytest.approx(ramp_integral(0, t[-2] - START), rel=1e-9)
+    assert integrator.gaps==0
+    assert integrator.add(np.zeros(10, dtype=np.int64), current[0:10], current[0:10], LIMIT)==0
+
+# readings of 10s after START with a gap from 2 to 3s
+def integrate_gap(policy, max_gap=5.0):
+    t = np.arange(0, 1001) * INTERVAL
+    t = t[(t<=2.0 + 1e-9) | (t>=3.0 - 1e-9)] + START
+    integrator = EnergyIntegrator(policy, max_gap)
+    skipped = 0
+    for ts in np.array_split(t, 7):
+        current = ramp(ts)
+        skipped = max(skipped, integrator.add(to_ns(ts), current, current * VOLTAGE, LIMIT))
+    return (integrator, skipped)
+
+def test_gap_interpolate():
+    integrator, skipped = integrate_gap(ENERGY_GAP_POLICY.INTERPOLATE)
+    assert skipped==0
+    assert integrator.ei * 3600==pytest.approx(ramp_integral(0, 10), rel=1e-9)
+    assert integrator.ep * 3600==pytest.approx(ramp_integral(0, 10) * VOLTAGE, rel=1e-9)
+    assert (integrator.gaps, integrator.gap_time)==(0, 0)
+    assert integrator.bridged_time==pytest.approx(1.0e9, abs=1000)
+
+def test_gap_hold():
+    integrator, skipped = integrate_gap(ENERGY_GAP_POLICY.HOLD)
+    assert skipped==0
+    expected = ramp_integral(0, 2) + ramp(START + 2.0) * 1.0 + ramp_integral(3, 10)
+    assert integrator.ei * 3600==pytest.approx(expected, rel=1e-9)
+    assert (integrator.gaps, integrator.gap_time)==(0, 0)
+    assert integrator.bridged_time==pytest.approx(1.0e9, abs=1000)
+
+def test_gap_skip():
+    integrator, skipped = integrate_gap(ENERGY_GAP_POLICY.SKIP)
+    assert skipped==pytest.approx(1.0)
+    expected = ramp_integral(0, 2) + ramp_integral(3, 10)
+    assert integrator.ei * 3600==pytest.approx(expected, rel=1e-9)
+    assert integrator.gaps==1
+    assert integrator.gap_time==pytest.approx(1.0e9, abs=1000)
+    assert integrator.bridged_time==0
+
+def test_gap_max():
+    # gaps longer than max_gap are not added with the gap policy
+    for policy in ENERGY_GAP_POLICY:
+        integrator, skipped = integrate_gap(policy, 0.5)
+        assert skipped==pytest.approx(1.0)
+        assert integrator.ei * 3600==pytest.approx(ramp_integral(0, 2) + ramp_integral(3, 10), rel=1e-9)
+        assert integrator.gaps==1
+        assert integrator.bridged_time==0
+
+def test_state():
+    # the integration continues with the state of another integrator
+    t = np.arange(0, 2000) * INTERVAL + 1.0e6
+    current = ramp(t - t[0] + START)
+    continuous = integrate(EnergyIntegrator(ENERGY_GAP_POLICY.SKIP, 1.0), t, current)
+    first = integrate(EnergyIntegrator(ENERGY_GAP_POLICY.SKIP, 1.0), t[0:1000], current[0:1000])
+    state = first.get_state()
+    assert state.shape==(EnergyIntegrator.STATE_SIZE,)
+    second = EnergyIntegrator(ENERGY_GAP_POLICY.SKIP, 1.0)
+    second.set_state(state)
+    assert second.t==first.t
+    integrate(second, t[1000:], current[1000:])
+    assert second.ei==pytest.approx(continuous.ei, rel=1e-12)
+    assert second.ep==pytest.approx(continuous.ep, rel=1e-12)
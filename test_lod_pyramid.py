@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from PowerMonitor.LodPyramid import LodPyramid
+
+SHAPE = (3, 3)
+
+def create_rows(n, seed=1):
+    rnd = np.random.RandomState(seed)
+    # integer times, the rows of a bucket can be found by their time
+    t = np.arange(0, n, dtype=np.float64) + 1000.0
+    values = rnd.normal(0, 1, (n,) + SHAPE).astype(np.float32)
+    return (t, values)
+
+def create_pyramid(t, values, first=0, blocks=1):
+    pyramid = LodPyramid(SHAPE)
+    for end in np.linspace(0, len(t), blocks + 1).astype(int)[1:]:
+        pyramid.update(t[0:end], values[0:end], first)
+    return pyramid
+
+# check the min. and max. values of each bucket against the rows
+def check_min_max(t, values, start, end, out_t, out_values):
+    bucket_t = out_t.reshape(-1, 2)
+    bucket_values = out_values.reshape((-1, 2) + SHAPE)
+    index = np.searchsorted(t, bucket_t)
+    # the buckets cover all rows without gaps
+    assert index[0, 0]==start
+    assert index[-1, 1]==end - 1
+    assert np.all(index[1:, 0]==index[:-1, 1] + 1)
+    for (a, b), (vmin, vmax) in zip(index, bucket_values):
+        np.testing.assert_array_equal(vmin, values[a:b + 1].min(axis=0))
+        np.testing.assert_array_equal(vmax, values[a:b + 1].max(axis=0))
+
+@pytest.mark.parametrize('start,end,max_points', [(0, 10000, 100), (123, 9876, 500), (5000, 5300, 20), (17, 4000, 1000), (0, 10000, 3)])
+def test_min_max(start, end, max_points):
+    t, values = create_rows(10000)
+    pyramid = create_pyramid(t, values, blocks=37)
+    out_t, out_values = pyramid.query(t, values, 0, start, end, max_points)
+    assert len(out_t)<=max_points * 2 + 4
+    check_min_max(t, values, start, end, out_t, out_values)
+
+@pytest.mark.parametrize('start,end,max_points', [(0, 10000, 100), (123, 9876, 500), (5000, 5300, 20)])
+def test_mean(start, end, max_points):
+    t, values = create_rows(10000)
+    pyramid = create_pyramid(t, values, blocks=37)
+    out_t, out_values = pyramid.query(t, values, 0, start, end, max_points, True)
+    assert len(out_t)<=max_points + 2
+    # the time is the center of the bucket
+    a = start
+    for center, mean in zip(out_t, out_values):
+        b = int(round((center - t[0]) * 2)) - a + 1
+        np.testing.assert_allclose(mean, values[a:b].mean(axis=0, dtype=np.float64), rtol=1e-5, atol=1e-6)
+        a = b
+    assert a==end
+
+def test_small():
+    # time frames with less rows than max_points are returned without reduction
+    t, values = create_rows(1000)
+    pyramid = create_pyramid(t, values)
+    out_t, out_values = pyramid.query(t, values, 0, 100, 300, 200)
+    assert np.shares_memory(out_t, t)
+    np.testing.assert_array_equal(out_values, values[100:300])
+
+def test_incremental():
+    # appending rows in blocks creates the same buckets
+    t, values = create_rows(5000)
+    single = create_pyramid(t, values)
+    blocks = create_pyramid(t, values, blocks=101)
+    assert len(single)==len(blocks)
+    for mean in (False, True):
+        for a, b in zip(single.query(t, values, 0, 0, 5000, 50, mean), blocks.query(t, values, 0, 0, 5000, 50, mean)):
+            np.testing.assert_array_equal(a, b)
+
+def test_trim():
+    # rows are removed from the start and appended, the absolute row numbers do not change
+    t, values = create_rows(8000)
+    pyramid = create_pyramid(t[0:4000], values[0:4000], blocks=10)
+    for removed, end in ((1000, 5000), (2345, 6543), (5001, 8000)):
+        pyramid.trim(removed)
+        pyramid.compact(0.5)
+        rows_t, rows = t[removed:end], values[removed:end]
+        pyramid.update(rows_t, rows, removed)
+        out_t, out_values = pyramid.query(rows_t, rows, removed, 0, len(rows_t), 100)
+        check_min_max(rows_t, rows, 0, len(rows_t), out_t, out_values)
+        out_t, out_values = pyramid.query(rows_t, rows, removed, 10, len(rows_t) - 10, 40)
+        check_min_max(rows_t, rows, 10, len(rows_t) - 10, out_t, out_values)
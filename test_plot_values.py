@@ -0,0 +1,191 @@
+import numpy as np
+from PowerMonitor.Downsampler import StreamingDownsampler
+from PowerMonitor.Enums import DOWNSAMPLING_MODE
+from PowerMonitor.PlotValues import (PlotValuesBuffer, PlotValuesContainer)
+
+CHANNELS = 2
+
+# rows with the columns t, U, I, P of each channel
+def create_rows(start, n, seed=1):
+    rnd = np.random.RandomState(seed)
+    t = 1000.0 + np.arange(start, start + n) * 0.1
+    return np.column_stack((t, rnd.uniform(0, 10, (n, CHANNELS * 3))))
+
+def test_buffer_append():
+    buffer = PlotValuesBuffer(CHANNELS)
+    assert (len(buffer), buffer.max_time())==(0, 0)
+    rows = create_rows(0, 10000)
+    values = rows[:, 1:].reshape(-1, CHANNELS, 3)
+    for block in np.array_split(np.arange(0, len(rows)), 17):
+        buffer.append(rows[block, 0], values[block])
+    assert len(buffer)==len(rows)
+    np.testing.assert_array_equal(buffer.time(), rows[:, 0])
+    # the values are stored as float32
+    assert buffer.all_values().dtype==np.float32
+    np.testing.assert_array_equal(buffer.all_values(), values.astype(np.float32))
+    assert buffer.max_time()==rows[-1, 0]
+
+def test_buffer_views():
+    # views that have been returned before stay valid when rows are appended or removed
+    buffer = PlotValuesBuffer(CHANNELS)
+    rows = create_rows(0, 20000)
+    values = rows[:, 1:].reshape(-1, CHANNELS, 3)
+    buffer.append(rows[0:3000, 0], values[0:3000])
+    t = buffer.time()
+    v = buffer.all_values()
+    buffer.trim(1000)
+    buffer.append(rows[3000:20000, 0], values[3000:20000])
+    buffer.trim(15000)
+    buffer.compact(0.25)
+    np.testing.assert_array_equal(t, rows[0:3000, 0])
+    np.testing.assert_array_equal(v, values[0:3000].astype(np.float32))
+    np.testing.assert_array_equal(buffer.time(), rows[16000:20000, 0])
+    np.testing.assert_array_equal(buffer.all_values(), values[16000:20000].astype(np.float32))
+
+def test_buffer_capacity():
+    # appending grows the arrays to twice the needed size, compact() releases the memory of removed rows
+    buffer = PlotValuesBuffer(CHANNELS)
+    rows = create_rows(0, 10000)
+    values = rows[:, 1:].reshape(-1, CHANNELS, 3)
+    buffer.append(rows[:, 0], values)
+    assert len(buffer._t)==20000
+    buffer.trim(9000)
+    buffer.compact(0.25)
+    assert len(buffer._t)==PlotValuesBuffer.INITIAL_CAPACITY
+    assert buffer.nbytes>=PlotValuesBuffer.INITIAL_CAPACITY * (8 + CHANNELS * 3 * 4)
+    buffer.clear()
+    assert len(buffer)==0
+
+def test_sum_values():
+    buffer = PlotValuesBuffer(CHANNELS)
+    rows = create_rows(0, 1000)
+    values = rows[:, 1:].reshape(-1, CHANNELS, 3)
+    buffer.append(rows[:, 0], values)
+    total, count = buffer.get_sum_values(rows[400, 0])
+    assert count==600
+    np.testing.assert_allclose(total, values[400:].astype(np.float32).sum(axis=0, dtype=np.float64), rtol=1e-12)
+
+def test_container():
+    container = PlotValuesContainer(range(0, CHANNELS))
+    assert container.timeframe()==0
+    rows = create_rows(0, 1000)
+    container.append(rows[0:600])
+    container.append(rows[600:])
+    assert len(container)==1000
+    assert container[1].index==1
+    assert (container.min_time(), container.max_time())==(rows[0, 0], rows[-1, 0])
+    np.testing.assert_allclose(container.get_mean_values(rows[900, 0]), rows[900:, 1:].reshape(-1, CHANNELS, 3).mean(axis=0), rtol=1e-6)
+    # the channels of the container are selected from the rows
+    container = PlotValuesContainer((1,))
+    container.append(rows, (1,))
+    values = container.all_values()
+    assert values.shape==(1000, 1, 3)
+    np.testing.assert_array_equal(values[:, 0], rows[:, 4:7].astype(np.float32))
+
+def test_compress():
+    # the oldest uncompressed rows are replaced by compressed rows, the rows are returned in order
+    container = PlotValuesContainer(range(0, CHANNELS))
+    rows = create_rows(0, 1000)
+    container.append(rows)
+    t, values = container.get_uncompressed(rows[500, 0])
+    assert len(t)==500
+    bucket_t = t[0:500].reshape(-1, 10)[:, [0, -1]].reshape(-1)
+    bucket_values = values[0:500].reshape(-1, 10, CHANNELS, 3)[:, [0, -1]].reshape(-1, CHANNELS, 3)
+    container.compress(500, bucket_t, bucket_values)
+    assert container.compressed_len()==100
+    assert len(container)==600
+    np.testing.assert_array_equal(container.time(), np.concatenate((bucket_t, rows[500:, 0])))
+    assert container.min_time()==rows[0, 0]
+    # reduce the resolution of the oldest compressed rows
+    compressed_t, compressed_values = container.get_compressed()
+    container.reduce(50, compressed_t[0:50:5], compressed_values[0:50:5])
+    assert container.compressed_len()==60
+    np.testing.assert_array_equal(container.time()[0:10], compressed_t[0:50:5])
+    # trim removes the compressed rows first
+    container.trim(70)
+    assert container.compressed_len()==0
+    np.testing.assert_array_equal(container.time(), rows[510:, 0])
+    container.compact()
+    assert len(container)==490
+
+def test_plot_values():
+    # the points are divided between the compressed and uncompressed rows
+    container = PlotValuesContainer(range(0, CHANNELS))
+    rows = create_rows(0, 20000)
+    container.append(rows)
+    t, values = container.get_uncompressed(rows[10000, 0])
+    container.compress(10000, t, values)
+    t, values = container.get_plot_values(rows[5000, 0], 1000)
+    assert t[0]==rows[5000, 0]
+    assert t[-1]==rows[-1, 0]
+    assert len(t)<=2 * 1000 + 8
+    assert np.all(np.diff(t)>=0)
+    t, values = container.get_plot_values(rows[19000, 0])
+    np.testing.assert_array_equal(t, rows[19000:, 0])
+    t, values = container.get_plot_values(rows[-1, 0] + 1)
+    assert values.shape==(0, CHANNELS, 3)
+
+def test_streaming_compression():
+    # rows older than the uncompressed time are compressed in chunks while new rows are appended, like
+    # Sensor._compress_plot_values() does
+    modes = (DOWNSAMPLING_MODE.MEAN, DOWNSAMPLING_MODE.MIN_MAX, DOWNSAMPLING_MODE.FIRST_LAST)
+    uncompressed_time = 5.0
+    container = PlotValuesContainer(range(0, CHANNELS))
+    downsampler = StreamingDownsampler(0.5, 300, modes)
+    rows = create_rows(0, 10000)
+    chunks = 0
+    for block in np.array_split(rows, 20):
+        container.append(block)
+        while True:
+            time_limit = container.max_time() - uncompressed_time
+            items_t, items = container.get_uncompressed(time_limit)
+            result = downsampler.process(items_t, items, time_limit)
+            if result==None:
+                break
+            n, compressed_t, compressed_values = result
+            assert n<=300
+            container.compress(n, compressed_t, compressed_values)
+            chunks += 1
+            if n==len(items_t):
+                break
+    assert chunks>20
+    compressed_t, compressed_values = container.get_compressed()
+    uncompressed = len(container) - container.compressed_len()
+    # the uncompressed rows are the newest rows and not older than the uncompressed time plus a bucket
+    np.testing.assert_array_equal(container.time()[container.compressed_len():], rows[-uncompressed:, 0])
+    assert rows[-uncompressed, 0]>=rows[-1, 0] - uncompressed_time - 0.5
+    assert compressed_t[-1]<rows[-uncompressed, 0]
+    # the result does not depend on the chunks, the values are compressed as float32
+    end = len(rows) - uncompressed
+    expected = StreamingDownsampler(0.5, len(rows), modes).process(rows[0:end + 1, 0], rows[0:end + 1, 1:].astype(np.float32).reshape(-1, CHANNELS, 3), rows[end, 0])
+    assert expected[0]==end
+    np.testing.assert_array_equal(compressed_t, expected[1])
+    np.testing.assert_array_equal(compressed_values, expected[2])
+
+# linear search of the first matching time
+def find_time_index_reference(t, time_val, timestamp):
+    for index, value in enumerate(t):
+        if (timestamp and value>time_val) or (not timestamp and t[-1] - value<=time_val):
+            return index
+    return None
+
+def test_find_time_index():
+    # the binary search finds the same rows as the linear search, with and without compressed rows
+    container = PlotValuesContainer(range(0, CHANNELS))
+    rows = create_rows(0, 2000)
+    # repeated times
+    rows[1000:1010, 0] = rows[1000, 0]
+    container.append(rows)
+    for compressed in (0, 700):
+        if compressed:
+            t, values = container.get_uncompressed(rows[compressed, 0])
+            container.compress(len(t), t, values)
+        t = container.time()
+        for time_val in np.concatenate((t[[0, 1, 699, 700, 701, 1000, 1005, -1]], t[[0, 699, 1000, -1]] + 0.05, [t[0] - 1, t[-1] + 1])):
+            assert container.find_time_index(time_val, True)==find_time_index_reference(t, time_val, True)
+        # the time frames are not a multiple of the interval, the difference of two times may be rounded differently
+        for time_val in (0, 0.05, 0.15, 99.95, 100.05, 130.03, t[-1] - t[0] + 0.05, 1.0e6, -1):
+            assert container.find_time_index(time_val)==find_time_index_reference(t, time_val, False)
+    indices = container.find_time_indices(t[[5, 800, 1500]], True)
+    np.testing.assert_array_equal(indices, [6, 801, 1501])
+    assert container.find_time_indices((t[-1],), True)[0]==len(container)
@@ -0,0 +1,94 @@
+import errno
+import pytest
+import struct
+from SDL_Pi_INA3221 import (INA3221, INA3211_CONFIG, SimulatedBus, Waveform, WAVEFORM, RecordingBus, ReplayBus)
+
+ADDR = 0x40
+
+def create_device(bus):
+    return INA3221(addr=ADDR, bus=bus, avg=INA3211_CONFIG.AVERAGING_MODE.x1, vbus_ct=INA3211_CONFIG.VBUS_CONVERSION_TIME.time_140_us, vshunt_ct=INA3211_CONFIG.VSHUNT_CONVERSION_TIME.time_140_us)
+
+def record(filename, reads):
+    bus = SimulatedBus()
+    bus.add_device(ADDR, [Waveform(5.0, 0.5, WAVEFORM.SINE, 0.4, 0.01, noise=0.01)] * 3, seed=1)
+    recording = RecordingBus(bus, filename)
+    ina3221 = create_device(recording)
+    readings = []
+    for n in range(reads):
+        ina3221.conversion_ready()
+        readings.append(ina3221.read_channels_raw())
+    ina3221.flush()
+    return (recording, ina3221, readings)
+
+def test_round_trip(tmp_path):
+    filename = str(tmp_path / 'sensor.rec')
+    recording, ina3221, readings = record(filename, 50)
+    recording.close()
+
+    replay = ReplayBus(filename, realtime=False)
+    ina3221 = create_device(replay)
+    last_ts = 0
+    for reading in readings:
+        ina3221.conversion_ready()
+        replayed = ina3221.read_channels_raw()
+        assert [item[0:2] for item in replayed]==[item[0:2] for item in reading]
+        assert replayed[0][2]>=last_ts
+        last_ts = replayed[0][2]
+    assert replay.reads==50 * 7
+    assert replay.mismatches==0
+    with pytest.raises(EOFError):
+        ina3221.read_channels_raw()
+
+def test_flush(tmp_path):
+    # the records are readable after flush() while the recording continues
+    filename = str(tmp_path / 'sensor.rec')
+    recording, ina3221, readings = record(filename, 10)
+    replay = ReplayBus(filename, realtime=False)
+    for reading in readings:
+        replay.read_word_data(ADDR, 0x0f)
+        values = struct.unpack('>6h', replay.read_registers(ADDR, (0x01, 0x02, 0x03, 0x04, 0x05, 0x06)))
+        assert values==tuple(value for vbus_raw, vshunt_raw, ts in reading for value in (vshunt_raw, vbus_raw))
+    recording.close()
+
+def test_continue(tmp_path):
+    # an existing recording is continued
+    filename = str(tmp_path / 'sensor.rec')
+    record(filename, 5)[0].close()
+    record(filename, 5)[0].close()
+    replay = ReplayBus(filename, realtime=False)
+    ina3221 = create_device(replay)
+    for n in range(10):
+        ina3221.conversion_ready()
+        ina3221.read_channels_raw()
+    assert replay.mismatches==0
+
+def test_mismatch(tmp_path):
+    filename = str(tmp_path / 'sensor.rec')
+    record(filename, 2)[0].close()
+    replay = ReplayBus(filename, realtime=False)
+    # skips the mask/enable register and the registers of channel 1 and 2
+    replay.read_registers(ADDR, (0x01,))
+    assert replay.mismatches==1
+    replay.read_registers(ADDR, (0x01,))
+    assert replay.mismatches==1 + 5 + 1
+
+def test_error(tmp_path):
+    filename = str(tmp_path / 'sensor.rec')
+    recording = RecordingBus(SimulatedBus(), filename)
+    with pytest.raises(OSError):
+        recording.read_registers(0x41, (0x01, 0x02))
+    recording.close()
+    replay = ReplayBus(filename, realtime=False)
+    with pytest.raises(OSError) as e:
+        replay.read_registers(0x41, (0x01, 0x02))
+    assert e.value.errno==errno.EREMOTEIO
+
+def test_invalid_file(tmp_path):
+    filename = tmp_path / 'sensor.rec'
+    filename.write_bytes(b'INVALID\x00\x01\x00')
+    with pytest.raises(ValueError):
+        ReplayBus(str(filename))
+    filename.write_bytes(b'')
+    RecordingBus(SimulatedBus(), str(filename)).close()
+    with pytest.raises(EOFError):
+        ReplayBus(str(filename))
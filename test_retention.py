@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+from PowerMonitor.Downsampler import StreamingDownsampler
+from PowerMonitor.Enums import (DOWNSAMPLING_MODE, RETENTION_LEVEL)
+from PowerMonitor.PlotValues import PlotValuesContainer
+from PowerMonitor.Retention import RetentionManager
+
+BUDGET = 1000000
+MODES = (DOWNSAMPLING_MODE.MEAN, DOWNSAMPLING_MODE.MIN_MAX, DOWNSAMPLING_MODE.MIN_MAX)
+CHANNELS = 2
+
+def test_levels():
+    retention = RetentionManager(BUDGET, MODES)
+    assert retention.update(0.5 * BUDGET)==RETENTION_LEVEL.NORMAL
+    assert retention.update(0.7 * BUDGET)==RETENTION_LEVEL.COMPRESS
+    assert retention.update(0.9 * BUDGET)==RETENTION_LEVEL.REDUCE
+    assert retention.update(1.1 * BUDGET)==RETENTION_LEVEL.TRIM
+    # the level is lowered when the usage is HYSTERESIS below the limit
+    assert retention.update(0.96 * BUDGET)==RETENTION_LEVEL.TRIM
+    assert retention.update(0.94 * BUDGET)==RETENTION_LEVEL.REDUCE
+    assert retention.update(0.81 * BUDGET)==RETENTION_LEVEL.REDUCE
+    assert retention.update(0.79 * BUDGET)==RETENTION_LEVEL.COMPRESS
+    assert retention.update(0.66 * BUDGET)==RETENTION_LEVEL.COMPRESS
+    assert retention.update(0.64 * BUDGET)==RETENTION_LEVEL.NORMAL
+    assert retention.get_usage(0.64 * BUDGET)==pytest.approx(0.64)
+
+def test_uncompressed_time():
+    retention = RetentionManager(BUDGET, MODES)
+    assert retention.get_uncompressed_time(60.0)==60.0
+    retention.update(0.9 * BUDGET)
+    assert retention.get_uncompressed_time(60.0)==15.0
+    retention.update(1.0 * BUDGET)
+    assert retention.get_uncompressed_time(60.0)==pytest.approx(3.0)
+
+def test_reduce():
+    # the oldest half of the compressed rows is reduced to about half of the rows
+    retention = RetentionManager(BUDGET, MODES)
+    rnd = np.random.RandomState(1)
+    t = 1000.0 + np.arange(0, 1000) * 0.1
+    values = rnd.normal(0, 1, (1000, CHANNELS, 3)).astype(np.float32)
+    n, reduced_t, reduced_values = retention.reduce(t, values)
+    assert n<=500
+    assert n>=490
+    assert len(reduced_t)==pytest.approx(n / 2, abs=4)
+    assert reduced_t[0]==t[0]
+    assert reduced_t[-1]==t[n - 1]
+    # the min. and max. values are kept
+    assert reduced_values[:, :, 1].max()==values[0:n, :, 1].max()
+    assert reduced_values[:, :, 2].min()==values[0:n, :, 2].min()
+    # too few rows
+    assert retention.reduce(t[0:100], values[0:100])==None
+
+def test_trim_rows():
+    retention = RetentionManager(BUDGET, MODES)
+    assert retention.get_trim_rows(0.5 * BUDGET, 0.4 * BUDGET, 1000)==0
+    assert retention.get_trim_rows(BUDGET, 0.8 * BUDGET, 0)==0
+    # 800 bytes per row, 200KB have to be removed to get to TRIM_TARGET
+    assert retention.get_trim_rows(BUDGET, 0.8 * BUDGET, 1000)==250
+    # at least one row is kept
+    assert retention.get_trim_rows(10 * BUDGET, 0.8 * BUDGET, 1000)==999
+
+# the plot values with the compression and retention of Sensor.compress_values() and Sensor.apply_retention()
+#
+# with the larger budget the old values are reduced, with the smaller budget the oldest values are removed
+@pytest.mark.parametrize('budget,trimmed', [(BUDGET, False), (300000, True)])
+def test_budget(budget, trimmed):
+    retention = RetentionManager(budget, MODES)
+    container = PlotValuesContainer(range(0, CHANNELS))
+    downsampler = StreamingDownsampler(0.1, 1000, MODES)
+    rnd = np.random.RandomState(1)
+    levels = set()
+    for block in range(0, 1000):
+        t = 1000.0 + (block * 200 + np.arange(0, 200)) * 0.01
+        container.append(np.column_stack((t, rnd.normal(0, 1, (200, CHANNELS * 3)))))
+
+        time_limit = container.max_time() - retention.get_uncompressed_time(10.0)
+        while True:
+            items_t, items = container.get_uncompressed(time_limit)
+            result = downsampler.process(items_t, items, time_limit)
+            if result==None:
+                break
+            container.compress(*result)
+            if result[0]==len(items_t):
+                break
+
+        if retention.update(container.nbytes)!=RETENTION_LEVEL.NORMAL:
+            container.compact()
+        level = retention.update(container.nbytes)
+        levels.add(level)
+        if level.value>=RETENTION_LEVEL.REDUCE.value:
+            result = retention.reduce(*container.get_compressed())
+            if result!=None:
+                container.reduce(*result)
+        if level==RETENTION_LEVEL.TRIM:
+            container.trim(retention.get_trim_rows(container.nbytes, container.nbytes, len(container)))
+            container.compact()
+        assert container.nbytes<=budget
+        # the latest values are kept
+        assert container.max_time()==t[-1]
+    assert RETENTION_LEVEL.REDUCE in levels
+    assert (container.min_time()>1000.0)==trimmed
+    assert np.all(np.diff(container.time())>=0)
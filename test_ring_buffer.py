@@ -0,0 +1,67 @@
+import numpy as np
+from PowerMonitor.RingBuffer import RingBuffer
+
+COLUMNS = 3
+
+def create_rows(start, count):
+    return np.arange(start, start + count, dtype=np.float64).repeat(COLUMNS).reshape(count, COLUMNS)
+
+def read_rows(buffer):
+    blocks, dropped = buffer.read()
+    if not blocks:
+        return (np.zeros((0,)), dropped)
+    return (np.concatenate(blocks)[:, 0], dropped)
+
+def test_append():
+    buffer = RingBuffer(8, COLUMNS)
+    assert (buffer.capacity, buffer.columns, len(buffer))==(8, COLUMNS, 0)
+    assert buffer.nbytes==8 * COLUMNS * 8
+    assert buffer.read()==([], 0)
+    for row in create_rows(0, 5):
+        buffer.append(row)
+    assert len(buffer)==5
+    rows, dropped = read_rows(buffer)
+    np.testing.assert_array_equal(rows, np.arange(0, 5))
+    assert (dropped, len(buffer))==(0, 0)
+
+def test_wrap_around():
+    # the rows are returned in up to 2 views without copying
+    buffer = RingBuffer(8, COLUMNS)
+    buffer.extend(create_rows(0, 6))
+    read_rows(buffer)
+    buffer.extend(create_rows(6, 5))
+    blocks, dropped = buffer.read()
+    assert len(blocks)==2
+    assert all(np.shares_memory(block, buffer._buffer) for block in blocks)
+    np.testing.assert_array_equal(np.concatenate(blocks)[:, 0], np.arange(6, 11))
+
+def test_overflow():
+    # rows that have been overwritten before reading are dropped
+    buffer = RingBuffer(8, COLUMNS)
+    start = 0
+    expected = 0
+    for count in (3, 7, 1, 20, 8, 5, 9):
+        buffer.extend(create_rows(start, count))
+        start += count
+        if count % 2:
+            continue
+        rows, dropped = read_rows(buffer)
+        assert dropped==max(0, start - expected - 8)
+        np.testing.assert_array_equal(rows, np.arange(max(expected, start - 8), start))
+        expected = start
+    rows, dropped = read_rows(buffer)
+    assert dropped==start - expected - 8
+    np.testing.assert_array_equal(rows, np.arange(start - 8, start))
+
+def test_tail():
+    # the last rows are copied without changing the read position
+    buffer = RingBuffer(8, COLUMNS)
+    assert buffer.tail(3).shape==(0, COLUMNS)
+    buffer.extend(create_rows(0, 11))
+    np.testing.assert_array_equal(buffer.tail(4)[:, 0], np.arange(7, 11))
+    np.testing.assert_array_equal(buffer.tail(100)[:, 0], np.arange(3, 11))
+    assert not np.shares_memory(buffer.tail(2), buffer._buffer)
+    assert len(buffer)==8
+    buffer.clear()
+    assert len(buffer)==0
+    assert buffer.read()==([], 0)
@@ -0,0 +1,92 @@
+import pytest
+from PowerMonitor.Enums import OVERRUN_POLICY
+from PowerMonitor.SampleScheduler import SampleScheduler
+
+PERIOD = 0.001
+MS = 1000000
+
+# clock in nanoseconds that is advanced by the test
+class Clock(object):
+
+    def __init__(self):
+        self.t = 0
+
+    def __call__(self):
+        return self.t
+
+def create_scheduler(policy=OVERRUN_POLICY.CATCH_UP, max_catch_up=10):
+    clock = Clock()
+    return (SampleScheduler(PERIOD, policy, max_catch_up, clock), clock)
+
+def test_deadlines():
+    # delays do not shift the following deadlines
+    scheduler, clock = create_scheduler()
+    assert scheduler.start()==0
+    assert scheduler.sleep_time()==pytest.approx(PERIOD)
+    clock.t = 1.2 * MS
+    assert scheduler.start()==pytest.approx(0.0002)
+    assert scheduler.sleep_time()==pytest.approx(0.0008)
+    clock.t = 2 * MS
+    assert scheduler.start()==0
+    clock.t = 3.5 * MS
+    assert scheduler.sleep_time()==pytest.approx(-0.0005)
+    stats = scheduler.get_stats()
+    assert (stats['overruns'], stats['skipped'])==(0, 0)
+    assert stats['late_avg_us']==pytest.approx(66.7)
+    assert stats['late_max_us']==200.0
+    # the periods have been 1.2 and 0.8ms
+    assert stats['jitter_rms_us']==200.0
+    assert stats['jitter_max_us']==200.0
+
+def test_catch_up():
+    # missed deadlines are read without delay
+    scheduler, clock = create_scheduler()
+    scheduler.start()
+    clock.t = 4.5 * MS
+    assert scheduler.start()==pytest.approx(0.0035)
+    assert scheduler.sleep_time()<0
+    deadlines = []
+    while scheduler.sleep_time()<0:
+        scheduler.start()
+        deadlines.append(clock.t + scheduler.sleep_time() * 1.0e9)
+    assert deadlines==pytest.approx([3 * MS, 4 * MS, 5 * MS])
+    assert scheduler.get_stats()['overruns']==3
+    assert scheduler.get_stats()['skipped']==0
+
+def test_catch_up_limit():
+    # the schedule is restarted if more than max_catch_up deadlines have been missed
+    scheduler, clock = create_scheduler(max_catch_up=2)
+    scheduler.start()
+    clock.t = 10.5 * MS
+    scheduler.start()
+    assert scheduler.sleep_time()==pytest.approx(-0.001)
+    scheduler.start()
+    assert scheduler.sleep_time()==pytest.approx(0)
+    scheduler.start()
+    assert scheduler.sleep_time()==pytest.approx(0.001)
+    assert scheduler.get_stats()['skipped']==7
+
+def test_skip():
+    # missed deadlines are skipped, the schedule continues with the next deadline
+    scheduler, clock = create_scheduler(OVERRUN_POLICY.SKIP)
+    scheduler.start()
+    clock.t = 4.5 * MS
+    scheduler.start()
+    assert scheduler.sleep_time()==pytest.approx(0.0005)
+    clock.t = 5 * MS
+    assert scheduler.start()==0
+    stats = scheduler.get_stats()
+    assert (stats['overruns'], stats['skipped'])==(1, 3)
+
+def test_reset():
+    scheduler, clock = create_scheduler(OVERRUN_POLICY.SKIP)
+    scheduler.start()
+    clock.t = 4.5 * MS
+    scheduler.start()
+    scheduler.reset()
+    assert scheduler.get_stats()=={'late_avg_us': 0, 'late_max_us': 0, 'jitter_rms_us': 0, 'jitter_max_us': 0, 'overruns': 0, 'skipped': 0}
+    # the schedule starts again at the current time
+    clock.t = 7.3 * MS
+    assert scheduler.start()==0
+    assert scheduler.sleep_time()==pytest.approx(PERIOD)
+    assert scheduler.period==PERIOD
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from PowerMonitor.AppConfig import Calibration
+from PowerMonitor.SensorBlock import SensorBlock
+from SDL_Pi_INA3221.Calibration import Calibration as InaCalibration
+
+CHANNELS = 3
+
+def create_calibration():
+    calibration = []
+    for shunt, offset, vshunt_mul, vbus_mul in ((100.0, 0, 1.0, 1.0), (50.0, -3, 1.02, 0.99), (20.0, 7, 0.97, 1.01)):
+        channel = Calibration()
+        channel.shunt = shunt
+        channel.vshunt_raw_offset = offset
+        channel.vshunt_multiplier = vshunt_mul
+        channel.vbus_multiplier = vbus_mul
+        channel._update_multipliers()
+        calibration.append(channel)
+    return calibration
+
+# conversion of a single reading like the sensor thread did before the readings were converted in blocks
+def convert_reading(calibration, vbus_raw, vshunt_raw):
+    busvoltage = calibration.get_vbus_voltage(vbus_raw)
+    current = calibration.get_current_from_shunt(vshunt_raw, 'A')
+    loadvoltage = busvoltage - vshunt_raw * InaCalibration.RAW_VSHUNT_TO_VOLT
+    return (loadvoltage, current, current * busvoltage)
+
+def test_convert():
+    rnd = np.random.RandomState(1)
+    calibration = create_calibration()
+    n = 100
+    vbus = rnd.randint(0, 32767, (n, CHANNELS))
+    vshunt = rnd.randint(-32768, 32767, (n, CHANNELS))
+    block = SensorBlock(128, CHANNELS)
+    for row in range(0, n):
+        ts = 1000000000 + row * 1000000
+        block.append(1.0 + row * 0.001, range(0, CHANNELS), [(int(vbus[row, channel]), int(vshunt[row, channel]), ts + channel) for channel in range(0, CHANNELS)])
+    assert len(block)==n
+    assert block.start_time()==1.0
+    t, ts, loadvoltage, current, power, sums = block.convert(calibration)
+    assert len(block)==0
+    np.testing.assert_array_equal(t, 1.0 + np.arange(0, n) * 0.001)
+    assert ts.dtype==np.int64
+    np.testing.assert_array_equal(ts[:, 2], 1000000002 + np.arange(0, n) * 1000000)
+    expected = np.array([[convert_reading(calibration[channel], vbus[row, channel], vshunt[row, channel]) for channel in range(0, CHANNELS)] for row in range(0, n)])
+    np.testing.assert_allclose(loadvoltage, expected[:, :, 0], rtol=1e-12)
+    np.testing.assert_allclose(current, expected[:, :, 1], rtol=1e-12)
+    np.testing.assert_allclose(power, expected[:, :, 2], rtol=1e-12)
+    np.testing.assert_array_equal(sums[0], [n] * CHANNELS)
+    np.testing.assert_allclose(sums[1:], expected.sum(axis=0).T, rtol=1e-12)
+
+def test_disabled_channel():
+    # channels that have not been read have no current
+    calibration = create_calibration()
+    calibration[1].vshunt_raw_offset = 10
+    block = SensorBlock(4, CHANNELS)
+    block.append(1.0, (0, 2), [(5000, 100, 1000), (6000, 200, 1000)])
+    assert block.enabled_channels()==2
+    t, ts, loadvoltage, current, power, sums = block.convert(calibration)
+    assert (current[0, 1], power[0, 1], ts[0, 1])==(0, 0, 0)
+    assert current[0, 0]==pytest.approx(convert_reading(calibration[0], 5000, 100)[1])
+
+def test_held_values():
+    # registers that have not been read hold the last value and the max. age is tracked
+    calibration = create_calibration()
+    block = SensorBlock(8, 1)
+    block.invalidate_held(2000)
+    block.append(1.0, (0,), [(5000, 100, 1000)])
+    assert not block.is_held_valid(0, 0)
+    block.append(1.1, (0,), [(5100, None, 3000)])
+    assert block.is_held_valid(0, 0)
+    assert not block.is_held_valid(1, 0)
+    block.append(1.2, (0,), [(None, 120, 4500)])
+    block.append(1.3, (0,), [(None, None, 0)], 6000)
+    assert not block.full()
+    np.testing.assert_array_equal(block.get_max_age(), [[3.0e-6], [2.0e-6]])
+    np.testing.assert_array_equal(block.get_max_age(), [[0], [0]])
+    t, ts, loadvoltage, current, power, sums = block.convert(calibration[0:1])
+    np.testing.assert_array_equal(ts[:, 0], [1000, 3000, 4500, 6000])
+    expected = [convert_reading(calibration[0], vbus, vshunt) for vbus, vshunt in ((5000, 100), (5100, 100), (5100, 120), (5100, 120))]
+    np.testing.assert_allclose(np.column_stack((loadvoltage, current, power)), expected, rtol=1e-12)
@@ -0,0 +1,123 @@
+import multiprocessing
+import os
+import signal
+import time
+import numpy as np
+from PowerMonitor.SharedRingBuffer import SharedRingBuffer
+
+COLUMNS = 4
+ENERGY_SHAPE = (3, 2)
+
+def create_rows(start, count):
+    return np.arange(start, start + count, dtype=np.float64).repeat(COLUMNS).reshape(count, COLUMNS)
+
+# writes blocks of rows until the quit flag is set
+def writer_main(buffer, blocks, block_size):
+    for block in range(0, blocks):
+        buffer.heartbeat()
+        buffer.extend(create_rows(block * block_size, block_size))
+        buffer.set_energy(np.full(ENERGY_SHAPE, float(block)))
+        buffer.set_stats({'sensor': block + 1, 'late_avg_us': 0.5})
+    while not buffer.is_quit():
+        buffer.heartbeat()
+        time.sleep(0.01)
+
+def start_writer(buffer, blocks, block_size):
+    process = multiprocessing.get_context('fork').Process(target=writer_main, args=(buffer, blocks, block_size), daemon=True)
+    process.start()
+    return process
+
+def wait_for(condition, timeout=10.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic()<end
+        time.sleep(0.01)
+
+# read all rows until count rows have been received or dropped
+def read_all(buffer, count, timeout=10.0):
+    rows = []
+    dropped = 0
+    end = time.monotonic() + timeout
+    while len(rows) + dropped<count and time.monotonic()<end:
+        blocks, num = buffer.read()
+        dropped += num
+        for block in blocks:
+            rows.extend(block[:, 0])
+        time.sleep(0.001)
+    return (np.array(rows), dropped)
+
+def test_fork_round_trip():
+    buffer = SharedRingBuffer(1000, COLUMNS, ENERGY_SHAPE)
+    assert buffer.get_energy()==None
+    assert buffer.get_heartbeat_age()==None
+    assert buffer.get_stats()=={}
+    process = start_writer(buffer, 50, 10)
+    try:
+        rows, dropped = read_all(buffer, 500)
+        assert dropped==0
+        np.testing.assert_array_equal(rows, np.arange(0, 500))
+        np.testing.assert_array_equal(buffer.get_energy(), np.full(ENERGY_SHAPE, 49.0))
+        assert buffer.get_stats()=={'sensor': 50, 'late_avg_us': 0.5}
+        assert buffer.get_heartbeat_age()<5.0
+    finally:
+        buffer.quit()
+        process.join(5.0)
+    assert process.exitcode==0
+    buffer.close()
+
+def test_fork_overflow():
+    # the writer is faster than the reader, the rows that have been overwritten are reported as dropped
+    buffer = SharedRingBuffer(100, COLUMNS, ENERGY_SHAPE)
+    process = start_writer(buffer, 20, 30)
+    try:
+        # wait until the writer has finished
+        wait_for(lambda: buffer.get_energy() is not None and buffer.get_energy()[0, 0]==19.0)
+        blocks, dropped = buffer.read()
+        assert dropped==500
+        np.testing.assert_array_equal(np.concatenate(blocks)[:, 0], np.arange(500, 600))
+        assert buffer.read()==([], 0)
+    finally:
+        buffer.quit()
+        process.join(5.0)
+    assert process.exitcode==0
+    buffer.close()
+
+def test_heartbeat_age():
+    # the watchdog detects a writer that has stopped
+    buffer = SharedRingBuffer(100, COLUMNS)
+    process = start_writer(buffer, 0, 0)
+    try:
+        wait_for(lambda: buffer.get_heartbeat_age()!=None)
+        os.kill(process.pid, signal.SIGSTOP)
+        time.sleep(0.3)
+        assert buffer.get_heartbeat_age()>=0.25
+        os.kill(process.pid, signal.SIGCONT)
+        time.sleep(0.1)
+        assert buffer.get_heartbeat_age()<0.25
+    finally:
+        buffer.quit()
+        process.join(5.0)
+    assert process.exitcode==0
+    # restart with an empty buffer
+    buffer.reset()
+    assert not buffer.is_quit()
+    assert buffer.get_heartbeat_age()==None
+    process = start_writer(buffer, 1, 10)
+    try:
+        rows, dropped = read_all(buffer, 10)
+        np.testing.assert_array_equal(rows, np.arange(0, 10))
+    finally:
+        buffer.quit()
+        process.join(5.0)
+    buffer.close()
+
+def test_extend():
+    # blocks larger than the capacity keep the last rows
+    buffer = SharedRingBuffer(10, COLUMNS)
+    buffer.extend(create_rows(0, 7))
+    buffer.extend(create_rows(7, 25))
+    blocks, dropped = buffer.read()
+    assert dropped==22
+    np.testing.assert_array_equal(np.concatenate(blocks)[:, 0], np.arange(22, 32))
+    np.testing.assert_array_equal(buffer.tail(3)[:, 0], [29, 30, 31])
+    buffer.close()
@@ -0,0 +1,132 @@
+import errno
+import pytest
+from SDL_Pi_INA3221 import (INA3221, INA3211_CONFIG, SimulatedBus, Waveform, WAVEFORM)
+from SDL_Pi_INA3221.Simulator import INA3221Model
+
+ADDR = 0x40
+SHUNT = 0.1
+
+class Clock(object):
+
+    def __init__(self):
+        self.t = 100.0
+
+    def __call__(self):
+        return self.t
+
+def create_device(waveforms=None, avg=INA3211_CONFIG.AVERAGING_MODE.x1):
+    clock = Clock()
+    bus = SimulatedBus(clock=clock)
+    bus.add_device(ADDR, waveforms or [Waveform(5.0, 0.5), Waveform(12.0, -0.25), Waveform(3.3, 0.1)], (SHUNT, SHUNT, SHUNT), seed=1)
+    ina3221 = INA3221(addr=ADDR, bus=bus, avg=avg, vbus_ct=INA3211_CONFIG.VBUS_CONVERSION_TIME.time_1100_us, vshunt_ct=INA3211_CONFIG.VSHUNT_CONVERSION_TIME.time_1100_us, shunt=SHUNT)
+    return (clock, bus, ina3221)
+
+def test_id_registers():
+    clock, bus, ina3221 = create_device()
+    # SMBus byte order
+    assert bus.read_word_data(ADDR, INA3221Model.REG_MANUFACTURER_ID)==0x4954
+    assert bus.read_word_data(ADDR, INA3221Model.REG_DIE_ID)==0x2032
+    assert bus.read_registers(ADDR, (INA3221Model.REG_MANUFACTURER_ID, INA3221Model.REG_DIE_ID))==b'\x54\x49\x32\x20'
+
+def test_reset():
+    clock, bus, ina3221 = create_device()
+    device = bus.get_device(ADDR)
+    device.write(INA3221Model.REG_CONFIG, 0x4007)
+    device.write(0x07, 0x1000)
+    assert device.channels==[0]
+    device.write(INA3221Model.REG_CONFIG, 0x8000)
+    assert device.read(INA3221Model.REG_CONFIG)==INA3221Model.CONFIG_DEFAULT
+    assert device.read(0x07)==0x7ff8
+
+def test_bus_errors():
+    clock, bus, ina3221 = create_device()
+    with pytest.raises(OSError) as e:
+        bus.read_word_data(0x41, 0x00)
+    assert e.value.errno==errno.EREMOTEIO
+    with pytest.raises(OSError) as e:
+        bus.write_word_data(ADDR, INA3221Model.REG_DIE_ID, 0)
+    assert e.value.errno==errno.EREMOTEIO
+
+def test_cycle_time():
+    clock, bus, ina3221 = create_device(avg=INA3211_CONFIG.AVERAGING_MODE.x4)
+    device = bus.get_device(ADDR)
+    assert device.get_cycle_time()==pytest.approx(ina3221.get_cycle_time())
+    assert device.get_cycle_time()==pytest.approx(3 * 4 * 0.0022)
+    ina3221.setChannel(2, False)
+    assert device.channels==[0, 1]
+    assert device.get_cycle_time()==pytest.approx(ina3221.get_cycle_time())
+    assert device.get_cycle_time()==pytest.approx(2 * 4 * 0.0022)
+
+def test_dc_readings():
+    clock, bus, ina3221 = create_device()
+    # no conversion has been completed
+    for vbus_raw, vshunt_raw, ts in ina3221.read_channels_raw():
+        assert (vbus_raw, vshunt_raw)==(0, 0)
+    clock.t += ina3221.get_cycle_time() * 1.5
+    readings = ina3221.read_channels_raw()
+    for (vbus_raw, vshunt_raw, ts), voltage, current in zip(readings, (5.0, 12.0, 3.3), (0.5, -0.25, 0.1)):
+        assert ts==int(round(clock.t * 1.0e9))
+        # 8mV and 40uV LSB
+        assert vbus_raw / 1000.0==pytest.approx(voltage, abs=0.008)
+        assert vshunt_raw * 0.000005 / SHUNT==pytest.approx(current, abs=0.0004)
+
+def test_conversion_window():
+    # the reading is the mean of the waveform during the shunt conversion of the channel
+    period = 1.0
+    clock, bus, ina3221 = create_device([Waveform(5.0, 0.0, WAVEFORM.TRIANGLE, 1.0, period)] * 3)
+    conv_time = ina3221.get_cycle_time() / 3
+    start = bus.get_device(ADDR)._start
+    clock.t = start + period * 0.25 + conv_time
+    vbus_raw, vshunt_raw, ts = ina3221.read_channels_raw((0,), ((False, True),))[0]
+    assert vbus_raw==None
+    cycles = int(period * 0.25 / (conv_time * 3))
+    t = start + cycles * conv_time * 3 + 0.0011 / 2
+    assert vshunt_raw * 0.000005 / SHUNT==pytest.approx(Waveform(5.0, 0.0, WAVEFORM.TRIANGLE, 1.0, period).current_at(t), abs=0.0004)
+
+def test_conversion_ready():
+    clock, bus, ina3221 = create_device()
+    cycle_time = ina3221.get_cycle_time()
+    assert not ina3221.conversion_ready()
+    clock.t += cycle_time * 0.9
+    assert not ina3221.conversion_ready()
+    clock.t += cycle_time * 0.2
+    assert ina3221.conversion_ready()
+    # reading the mask/enable register clears the flag
+    assert not ina3221.conversion_ready()
+    clock.t += cycle_time
+    assert ina3221.conversion_ready()
+    # restarting the conversion resets the cycle
+    ina3221.restart_conversion()
+    clock.t += cycle_time * 0.5
+    assert not ina3221.conversion_ready()
+    clock.t += cycle_time * 0.6
+    assert ina3221.conversion_ready()
+
+def test_critical_alert():
+    clock, bus, ina3221 = create_device()
+    cycle_time = ina3221.get_cycle_time()
+    # 0.5A and 0.1 Ohm, raw 10000
+    ina3221.set_critical_alert(0, 8000)
+    ina3221.set_critical_alert(1, None)
+    clock.t += cycle_time * 1.5
+    ina3221.read_channels_raw()
+    assert ina3221.get_critical_alerts()==[0]
+    # the flag follows the conversions that have been read
+    ina3221.set_critical_alert(0, 12000)
+    clock.t += cycle_time
+    ina3221.read_channels_raw()
+    assert ina3221.get_critical_alerts()==[]
+
+def test_critical_alert_latch():
+    clock, bus, ina3221 = create_device()
+    cycle_time = ina3221.get_cycle_time()
+    ina3221.set_critical_alert_latch(True)
+    ina3221.set_critical_alert(0, 8000)
+    clock.t += cycle_time * 1.5
+    ina3221.read_channels_raw()
+    ina3221.set_critical_alert(0, 12000)
+    clock.t += cycle_time
+    ina3221.read_channels_raw()
+    # the flag is kept until the mask/enable register has been read
+    assert ina3221.get_critical_alerts()==[0]
+    assert ina3221.get_critical_alerts()==[]
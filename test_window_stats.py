@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from PowerMonitor.WindowStats import (SlidingWindow, WindowStats)
+
+LENGTH = 10.0
+COLUMNS = 4
+
+def create_blocks(n, seed=1):
+    rnd = np.random.RandomState(seed)
+    t = 1000.0 + np.cumsum(rnd.uniform(0.001, 0.2, n))
+    # a gap that is longer than the window
+    t[n // 2:] += LENGTH * 2
+    values = rnd.normal(0, 1, (n, COLUMNS)).astype(np.float32)
+    edges = np.sort(rnd.choice(np.arange(1, n), n // 20, replace=False))
+    return (t, values, edges)
+
+# the window contains the slots of the last row and the SLOTS - 1 slots before
+def rescan(t, values, end):
+    slots = np.floor(t[0:end] / (LENGTH / SlidingWindow.SLOTS))
+    rows = values[0:end][slots>=slots[-1] - SlidingWindow.SLOTS + 1]
+    return (rows.mean(axis=0, dtype=np.float64), rows.min(axis=0), rows.max(axis=0), len(rows))
+
+def test_sliding_window():
+    t, values, edges = create_blocks(5000)
+    window = SlidingWindow(LENGTH, COLUMNS)
+    assert window.get()==None
+    for start, end in zip(np.concatenate(([0], edges)), np.concatenate((edges, [len(t)]))):
+        window.add(t[start:end], values[start:end])
+        snapshot = window.get()
+        mean, vmin, vmax, count = rescan(t, values, end)
+        assert snapshot.count==count
+        np.testing.assert_allclose(snapshot.mean, mean, rtol=1e-9, atol=1e-9)
+        np.testing.assert_array_equal(snapshot.min, vmin)
+        np.testing.assert_array_equal(snapshot.max, vmax)
+        assert snapshot.timeframe==pytest.approx(min(LENGTH, t[end - 1] - t[0]))
+
+def test_clear():
+    t, values, edges = create_blocks(500)
+    window = SlidingWindow(LENGTH, COLUMNS)
+    window.add(t[0:100], values[0:100])
+    window.clear()
+    assert window.get()==None
+    window.add(t[100:200], values[100:200])
+    assert window.get().count==rescan(t[100:200], values[100:200], 100)[3]
+
+def test_window_stats():
+    shape = (2, 3)
+    rnd = np.random.RandomState(1)
+    t = 1000.0 + np.arange(0, 1000) * 0.05
+    values = rnd.normal(0, 1, (1000,) + shape)
+    stats = WindowStats(shape)
+    stats.set_window('short', 1.0)
+    stats.set_window('long', LENGTH)
+    assert stats.get('short')==None
+    for start in range(0, 1000, 100):
+        stats.add(t[start:start + 100], values[start:start + 100])
+    for name, length in (('short', 1.0), ('long', LENGTH)):
+        snapshot = stats.get(name)
+        slots = np.floor(t / (length / SlidingWindow.SLOTS))
+        rows = values[slots>=slots[-1] - SlidingWindow.SLOTS + 1]
+        assert snapshot.mean.shape==shape
+        assert snapshot.count==len(rows)
+        np.testing.assert_allclose(snapshot.mean, rows.mean(axis=0), rtol=1e-9)
+        np.testing.assert_array_equal(snapshot.min, rows.min(axis=0))
+        np.testing.assert_array_equal(snapshot.max, rows.max(axis=0))
+    # changing the length starts a new window
+    stats.set_window('long', LENGTH * 2)
+    assert stats.get('long')==None
+    stats.remove_window('short')
+    assert not stats.has_window('short')
+    assert stats.get('short')==None